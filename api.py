@@ -0,0 +1,352 @@
+# api.py
+#
+# Local HTTP JSON API over db.py for handheld scanners and integrations that
+# should not pay for a Streamlit rerun per movement:
+#
+#     python api.py                      # host/port from the api: section of config.yaml
+#     curl -u manager:secret 'http://127.0.0.1:8502/api/inventory?hub=HUB1'
+#
+# Every request authenticates with HTTP Basic against the users table (the
+# same check as the Streamlit login). Connections are HTTP/1.1 keep-alive, and
+# POST /api/batch runs many calls in one round trip.
+
+import argparse
+import base64
+import binascii
+import json
+import re
+import sys
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import yaml
+
+import auth
+import db
+
+DEFAULT_API_SETTINGS = {
+    "host": "127.0.0.1",
+    "port": 8502,
+    "max_body_kb": 2048,
+    "max_batch": 200,
+}
+
+# Movement actions each role may post; SUPPLIER-IN only comes in through
+# /api/shipments and TRANSFER-OUT/IN through /api/transfers.
+ROLE_ACTIONS = {
+    "admin": {"IN", "OUT", "COUNT", "ADMIN-ADD", "ADMIN-REMOVE"},
+    "manager": {"IN", "OUT", "COUNT"},
+    "retail": {"IN", "OUT", "COUNT"},
+}
+MAX_LOG_PAGE = 1000
+
+def load_api_settings(config_path=db.CONFIG_PATH):
+    settings = dict(DEFAULT_API_SETTINGS)
+    try:
+        with open(config_path) as f:
+            config = yaml.safe_load(f) or {}
+        settings.update(config.get("api") or {})
+    except FileNotFoundError:
+        pass
+    return settings
+
+API_SETTINGS = load_api_settings()
+
+class ApiError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message, **extra}
+
+ROUTES = []
+
+def route(method, pattern):
+    def decorator(func):
+        ROUTES.append((method, re.compile(pattern), func))
+        return func
+    return decorator
+
+def _param(query, name, default=None, required=False):
+    values = query.get(name)
+    if not values or values[0] == "":
+        if required:
+            raise ApiError(400, f"Missing query parameter: {name}")
+        return default
+    return values[0]
+
+def _object(body, shape):
+    """Return a JSON body that must be an object, or raise 400 describing `shape`."""
+    if not isinstance(body, dict):
+        raise ApiError(400, f"Body must be a JSON object: {shape}")
+    return body
+
+def _require_hub(user, hub):
+    if user["role"] == "admin" or "ALL" in user["hubs"] or hub in user["hubs"]:
+        return
+    raise ApiError(403, f"No access to hub {hub}")
+
+# --- ROUTES ---
+
+@route("GET", r"/api/inventory")
+def get_inventory(user, query, body, match):
+    hub = _param(query, "hub", required=True)
+    _require_hub(user, hub)
+    return 200, {"hub": hub, "items": [{"sku": sku, "quantity": qty} for sku, qty in db.get_skus_for_hub(hub)]}
+
+@route("GET", r"/api/skus/(?P<sku>[^/]+)")
+def get_sku(user, query, body, match):
+    info = db.get_sku(unquote(match["sku"]))
+    if info is None:
+        raise ApiError(404, f"Unknown SKU: {unquote(match['sku'])}")
+    sku, name, barcode = info
+    stock = [
+        {"hub": hub, "quantity": qty} for hub, qty in db.get_sku_stock(sku)
+        if user["role"] == "admin" or "ALL" in user["hubs"] or hub in user["hubs"]
+    ]
+    return 200, {"sku": sku, "name": name, "barcode": barcode, "stock": stock}
+
+@route("GET", r"/api/barcodes/(?P<barcode>[^/]+)")
+def get_barcode(user, query, body, match):
+    barcode = unquote(match["barcode"])
+    found = db.get_sku_by_barcode(barcode)
+    if found is None:
+        raise ApiError(404, f"Unknown barcode: {barcode}")
+    return 200, {"barcode": barcode, "sku": found[0], "name": found[1]}
+
+def _movement(user, item):
+    if not isinstance(item, dict):
+        raise ApiError(400, "Each movement must be an object with sku, hub, action and qty")
+    try:
+        sku, hub = str(item["sku"]), str(item["hub"])
+        action, qty = str(item["action"]).upper(), int(item["qty"])
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(400, "Each movement needs sku, hub, action and an integer qty")
+    if qty <= 0:
+        raise ApiError(400, f"qty must be positive (got {qty} for {sku})")
+    if action not in ROLE_ACTIONS.get(user["role"], set()):
+        raise ApiError(403, f"Role {user['role']} may not post {action} movements")
+    _require_hub(user, hub)
+    return (user["username"], sku, hub, action, qty, str(item.get("comment") or ""))
+
+@route("POST", r"/api/movements")
+def post_movements(user, query, body, match):
+    """Apply every movement in one transaction; stock may only go negative for admins who ask."""
+    body = _object(body, '{"movements": [...]}')
+    items = body.get("movements")
+    if not isinstance(items, list) or not items:
+        raise ApiError(400, "Body must be {\"movements\": [...]} with at least one movement")
+    movements = [_movement(user, item) for item in items]
+    unknown = db.find_unknown_skus([m[1] for m in movements])
+    if unknown:
+        raise ApiError(422, "Unknown SKU(s)", unknown=unknown)
+    allow_negative = bool(body.get("allow_negative")) and user["role"] == "admin"
+    quantities = db.record_movements(movements, allow_negative=allow_negative)
+    return 201, {"recorded": len(movements), "quantities": quantities}
+
+@route("POST", r"/api/shipments")
+def post_shipment(user, query, body, match):
+    """Record a multi-line shipment. Suppliers post notices; hub staff can also receive the stock."""
+    body = _object(body, '{"hub": ..., "lines": [...]}')
+    try:
+        hub = str(body["hub"])
+        lines = [(str(line["sku"]), int(line["qty"])) for line in body["lines"]]
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(400, "Body needs hub and lines: [{\"sku\": ..., \"qty\": ...}]")
+    if any(qty <= 0 for _, qty in lines):
+        raise ApiError(400, "Line quantities must be positive")
+    if user["role"] == "supplier":
+        supplier, receive = user["username"], False
+    else:
+        _require_hub(user, hub)
+        supplier, receive = str(body.get("supplier") or user["username"]), bool(body.get("receive", True))
+    count = db.record_shipment_batch(supplier, str(body.get("tracking", "")), str(body.get("carrier", "")),
+                                     str(body.get("ship_date", "")), hub, lines, receive=receive)
+    return 201, {"lines": count, "received": receive}
+
+@route("POST", r"/api/transfers")
+def post_transfer(user, query, body, match):
+    """Move stock between hubs as one transfer; the caller needs access to the source hub."""
+    body = _object(body, '{"from_hub": ..., "to_hub": ..., "lines": [...]}')
+    try:
+        from_hub, to_hub = str(body["from_hub"]), str(body["to_hub"])
+        lines = [(str(line["sku"]), int(line["qty"])) for line in body["lines"]]
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(400, "Body needs from_hub, to_hub and lines: [{\"sku\": ..., \"qty\": ...}]")
+    if user["role"] not in ("admin", "manager"):
+        raise ApiError(403, f"Role {user['role']} may not transfer stock")
+    _require_hub(user, from_hub)
+    transfer_id = db.transfer_stock(user["username"], from_hub, to_hub, lines, str(body.get("comment") or ""))
+    return 201, {"transfer_id": transfer_id, "lines": len(lines)}
+
+@route("GET", r"/api/logs")
+def get_logs(user, query, body, match):
+    hub = _param(query, "hub")
+    if hub:
+        _require_hub(user, hub)
+    elif user["role"] != "admin" and "ALL" not in user["hubs"]:
+        raise ApiError(400, "Missing query parameter: hub")
+    cursor = _param(query, "cursor")
+    if cursor:
+        timestamp, _, log_id = cursor.rpartition("|")
+        if not timestamp or not log_id.isdigit():
+            raise ApiError(400, "cursor must be the next_cursor of a previous page")
+        cursor = (timestamp, int(log_id))
+    try:
+        limit = min(int(_param(query, "limit", 100)), MAX_LOG_PAGE)
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    rows, next_cursor = db.get_logs_page(
+        cursor, limit, hub=hub, username=_param(query, "username"), action=_param(query, "action"),
+        start_date=_param(query, "start_date"), end_date=_param(query, "end_date"),
+    )
+    return 200, {
+        "items": [dict(zip(db.LOG_PAGE_COLUMNS, row)) for row in rows],
+        "next_cursor": f"{next_cursor[0]}|{next_cursor[1]}" if next_cursor else None,
+    }
+
+@route("POST", r"/api/batch")
+def post_batch(user, query, body, match):
+    """Run {"requests": [{"method", "path", "body"}]} in order and return each status and body.
+
+    Sub-requests are independent: one failing does not undo the others. Use
+    a single /api/movements call when the movements must commit together.
+    """
+    requests = _object(body, '{"requests": [...]}').get("requests")
+    if not isinstance(requests, list):
+        raise ApiError(400, "Body must be {\"requests\": [...]}")
+    if len(requests) > API_SETTINGS["max_batch"]:
+        raise ApiError(413, f"At most {API_SETTINGS['max_batch']} requests per batch")
+    results = []
+    for sub in requests:
+        if not isinstance(sub, dict):
+            results.append({"status": 400, "body": {"error": "Each request must be an object with method, path and body"}})
+            continue
+        method, path = str(sub.get("method", "GET")).upper(), str(sub.get("path", ""))
+        if urlsplit(path).path == "/api/batch":
+            status, payload = 400, {"error": "Batches cannot be nested"}
+        else:
+            status, payload = dispatch(user, method, path, sub.get("body"))
+        results.append({"status": status, "body": payload})
+    return 200, {"results": results}
+
+def dispatch(user, method, path, body):
+    """Route one call and turn db errors into HTTP statuses; returns (status, payload)."""
+    parts = urlsplit(path)
+    query = parse_qs(parts.query)
+    allowed = False
+    try:
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.fullmatch(parts.path)
+            if match is None:
+                continue
+            allowed = True
+            if route_method == method:
+                return handler(user, query, body, match)
+        raise ApiError(405 if allowed else 404, f"{method} {parts.path} not found" if not allowed else f"{method} not allowed")
+    except ApiError as e:
+        return e.status, e.payload
+    except db.InsufficientStockError as e:
+        return 409, {"error": str(e), "sku": e.sku, "hub": e.hub}
+    except db.UnknownSkuError as e:
+        return 422, {"error": str(e), "unknown": e.skus}
+    except db.UnknownHubError as e:
+        return 422, {"error": str(e), "unknown": e.hubs}
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    except Exception as e:
+        traceback.print_exc()
+        return 500, {"error": f"Internal error: {type(e).__name__}"}
+
+# --- SERVER ---
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response carries Content-Length
+    server_version = "TTTInventoryAPI/1.0"
+    # Buffer each response and send it in one write; with Nagle on, a separate
+    # header and body write stalls every keep-alive call on the delayed ACK.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # the body's extent is unknown, so the stream can't be reused
+            raise ApiError(400, "Content-Length must be a non-negative integer")
+        if length > API_SETTINGS["max_body_kb"] * 1024:
+            self.close_connection = True
+            raise ApiError(413, "Request body too large")
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ApiError(400, "Body must be JSON")
+
+    def _authenticate(self):
+        header = self.headers.get("Authorization", "")
+        if header.startswith("Basic "):
+            try:
+                username, _, password = base64.b64decode(header[6:]).decode().partition(":")
+            except (binascii.Error, UnicodeDecodeError):
+                username = password = ""
+            user = auth.login_user(username, password) if username else None
+            if user:
+                return user
+        raise ApiError(401, "Authentication required")
+
+    def _handle(self, method):
+        try:
+            body = self._read_body()
+            user = self._authenticate()
+            status, payload = dispatch(user, method, self.path, body)
+        except ApiError as e:
+            status, payload = e.status, e.payload
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 401:
+            self.send_header("WWW-Authenticate", 'Basic realm="ttt-inventory"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def make_server(host=None, port=None, verbose=False):
+    server = ThreadingHTTPServer((host or API_SETTINGS["host"], port or API_SETTINGS["port"]), ApiHandler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TTT inventory JSON API")
+    parser.add_argument("--host", default=API_SETTINGS["host"])
+    parser.add_argument("--port", type=int, default=API_SETTINGS["port"])
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    db.bootstrap()
+    server = make_server(args.host, args.port, args.verbose)
+    print(f"✅ Serving on http://{args.host}:{server.server_port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,11 @@
 import streamlit as st
 from auth import login_user
 from views import admin_dashboard, manager_dashboard
-from utils import require_login
+from utils import require_login, timed_section
 import db
 
-# Seed the warehouse data on startup (only once)
-db.init_db()
-db.seed_warehouses()
+# Create or upgrade the schema once per process; reruns skip straight past it.
+db.bootstrap()
 
 st.set_page_config(page_title="TTT Inventory System", layout="wide")
 
@@ -37,9 +36,11 @@ if "user" in st.session_state:
     role = user["role"]
 
     if role == "admin":
-        admin_dashboard(user)
+        with timed_section("admin", "(whole page)"):
+            admin_dashboard(user)
     elif role == "manager":
-        manager_dashboard(user)
+        with timed_section("manager", "(whole page)"):
+            manager_dashboard(user)
     elif role == "supplier":
         supplier_upload(user)
     elif role == "retail":
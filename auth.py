@@ -1,15 +1,13 @@
-import sqlite3
 import hashlib
+import db
 
 def login_user(username, password):
     hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-    conn = sqlite3.connect("ttt_inventory.db")
-    cur = conn.cursor()
-    user = cur.execute("""
+    conn = db.get_conn()
+    user = conn.execute("""
         SELECT username, role, hubs FROM users
         WHERE username=? AND password=?
     """, (username, hashed_pw)).fetchone()
-    conn.close()
     
     if user:
         return {
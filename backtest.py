@@ -0,0 +1,184 @@
+# backtest.py
+#
+# Replays historical demand per hub against candidate reorder-point /
+# order-quantity policies and reports stockout days and average stock on
+# hand for each one, so low-stock thresholds stop being guesswork:
+#
+#     python backtest.py --days 180
+#     python backtest.py --hub HUB1 --reorder 5 10 20 --order 10 30 60 --units --out policies.csv
+#
+# Policies are in days of each SKU's average daily demand by default, so one
+# policy covers the whole catalog at once (--units reads them as plain unit
+# counts, like the manager Low Stock slider). Every SKU at a hub is
+# simulated together as NumPy arrays, and the policy grid is spread over a
+# process pool.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+import db
+
+DEFAULT_REORDER = (3, 7, 14, 21)
+DEFAULT_ORDER = (7, 14, 30)
+DEFAULT_LEAD_TIME_DAYS = 7
+RESULT_COLUMNS = ["hub", "reorder", "order", "lead_time", "skus", "stockout_days", "skus_stocked_out",
+                  "fill_rate", "avg_on_hand", "orders"]
+
+def demand_matrix(hub, start, end):
+    """Return (skus, demand) where demand[i, t] is what skus[i] sold at hub on day t of [start, end]."""
+    days = pd.date_range(start, end, freq="D").strftime("%Y-%m-%d")
+    rows = db.get_daily_demand(hub, start, end)
+    if not rows:
+        return [], np.zeros((0, len(days)), dtype=np.int64)
+    df = pd.DataFrame(rows, columns=["day", "sku", "qty"])
+    matrix = df.pivot_table(index="sku", columns="day", values="qty", aggfunc="sum", fill_value=0)
+    matrix = matrix.reindex(columns=days, fill_value=0)
+    return matrix.index.tolist(), matrix.to_numpy(dtype=np.int64)
+
+def lead_times(hubs):
+    """Median shipment lead time per hub in whole days (at least 1), or DEFAULT_LEAD_TIME_DAYS without data.
+
+    Shipments only record when a notice was entered and its ship_date, so
+    that gap is the only lead-time signal the data has.
+    """
+    df = pd.DataFrame(db.get_shipment_lead_times(), columns=["hub", "days"]).dropna()
+    medians = df.groupby("hub")["days"].median()
+    return {hub: max(1, int(round(medians[hub]))) if hub in medians.index else DEFAULT_LEAD_TIME_DAYS
+            for hub in hubs}
+
+def simulate(demand, reorder_point, order_qty, lead_time):
+    """Run one (s, Q) policy over every SKU at once.
+
+    demand is a (skus, days) array; reorder_point and order_qty are per-SKU
+    unit arrays. Each SKU starts with s + Q on hand. Every day, arrivals are
+    received, demand is filled from stock (the unfilled part is lost), and Q
+    is ordered when on-hand plus on-order is at or below s. An order arrives
+    lead_time days later. Returns per-SKU (stockout_days, lost_units,
+    avg_on_hand, orders).
+    """
+    n_skus, n_days = demand.shape
+    on_hand = (reorder_point + order_qty).astype(np.int64)
+    on_order = np.zeros(n_skus, dtype=np.int64)
+    arrivals = np.zeros((lead_time + 1, n_skus), dtype=np.int64)  # ring buffer indexed by day
+    stockout_days = np.zeros(n_skus, dtype=np.int64)
+    lost = np.zeros(n_skus, dtype=np.int64)
+    on_hand_total = np.zeros(n_skus, dtype=np.int64)
+    orders = np.zeros(n_skus, dtype=np.int64)
+    for day in range(n_days):
+        slot = day % (lead_time + 1)
+        on_hand += arrivals[slot]
+        on_order -= arrivals[slot]
+        arrivals[slot] = 0
+
+        wanted = demand[:, day]
+        short = wanted > on_hand
+        stockout_days += short
+        lost += np.where(short, wanted - on_hand, 0)
+        on_hand -= np.minimum(on_hand, wanted)
+
+        reorder = on_hand + on_order <= reorder_point
+        placed = np.where(reorder, order_qty, 0)
+        arrivals[(day + lead_time) % (lead_time + 1)] += placed
+        on_order += placed
+        orders += reorder
+        on_hand_total += on_hand
+    return stockout_days, lost, on_hand_total / max(n_days, 1), orders
+
+def policy_units(demand, reorder, order, units=False):
+    """Per-SKU (reorder_point, order_qty) arrays for a policy given in days of average demand or in units."""
+    n_skus = demand.shape[0]
+    if units:
+        return np.full(n_skus, int(reorder), dtype=np.int64), np.full(n_skus, max(1, int(order)), dtype=np.int64)
+    mean = demand.mean(axis=1)
+    return (np.ceil(reorder * mean).astype(np.int64),
+            np.maximum(1, np.ceil(order * mean)).astype(np.int64))
+
+# Demand matrices reach each worker once through the pool initializer
+# instead of being pickled again for every policy.
+_hub_data = {}
+
+def _init_worker(hub_data):
+    global _hub_data
+    _hub_data = hub_data
+
+def _run_policy(task):
+    hub, reorder, order, units = task
+    skus, demand, lead_time = _hub_data[hub]
+    reorder_point, order_qty = policy_units(demand, reorder, order, units)
+    stockout_days, lost, avg_on_hand, orders = simulate(demand, reorder_point, order_qty, lead_time)
+    total = int(demand.sum())
+    return (hub, reorder, order, lead_time, len(skus), round(float(stockout_days.mean()), 2),
+            int((stockout_days > 0).sum()), round(1 - int(lost.sum()) / total, 4) if total else 1.0,
+            round(float(avg_on_hand.sum()), 1), int(orders.sum()))
+
+def backtest(hubs, start, end, reorder_grid=DEFAULT_REORDER, order_grid=DEFAULT_ORDER, units=False,
+             workers=None, lead_time=None):
+    """Evaluate every (reorder, order) pair for every hub; returns a DataFrame with RESULT_COLUMNS."""
+    leads = lead_times(hubs)
+    hub_data = {}
+    for hub in hubs:
+        skus, demand = demand_matrix(hub, start, end)
+        if skus:
+            hub_data[hub] = (skus, demand, lead_time or leads[hub])
+    tasks = [(hub, reorder, order, units) for hub in hub_data for reorder, order in product(reorder_grid, order_grid)]
+    if workers == 1:
+        _init_worker(hub_data)
+        rows = [_run_policy(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(hub_data,)) as pool:
+            rows = list(pool.map(_run_policy, tasks))
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS).sort_values(
+        ["hub", "stockout_days", "avg_on_hand"], ignore_index=True)
+
+def recommend(results, target_fill):
+    """Per hub, the policy with the least stock on hand that still meets target_fill."""
+    meeting = results[results["fill_rate"] >= target_fill]
+    return meeting.loc[meeting.groupby("hub")["avg_on_hand"].idxmin()].reset_index(drop=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest reorder policies against historical demand")
+    parser.add_argument("--db", default=db.DB_PATH, help="database to read (default: database.path)")
+    parser.add_argument("--hub", action="append", help="hub to test (repeatable; default: every hub with demand)")
+    parser.add_argument("--days", type=int, default=180, help="history to replay, ending today")
+    parser.add_argument("--reorder", type=float, nargs="+", default=DEFAULT_REORDER, help="reorder points to try")
+    parser.add_argument("--order", type=float, nargs="+", default=DEFAULT_ORDER, help="order quantities to try")
+    parser.add_argument("--units", action="store_true", help="read --reorder/--order as units, not days of demand")
+    parser.add_argument("--lead-time", type=int, help="override the lead time estimated from shipments")
+    parser.add_argument("--target-fill", type=float, default=0.95, help="fill rate a recommended policy must reach")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (1 runs in-process)")
+    parser.add_argument("--out", help="write every policy's results to this CSV")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    end = date.today()
+    start = end - timedelta(days=args.days - 1)
+    hubs = args.hub or [code for code, *_ in db.get_all_warehouses()]
+
+    started = time.perf_counter()
+    results = backtest(hubs, start, end, args.reorder, args.order, args.units, args.workers, args.lead_time)
+    elapsed = time.perf_counter() - started
+    if results.empty:
+        print(f"❌ No demand at {', '.join(hubs)} between {start} and {end}.")
+        return 1
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+    unit = "units" if args.units else "days of demand"
+    with pd.option_context("display.max_rows", 200, "display.width", 140):
+        print(f"Policies in {unit}; {start} to {end}; {len(results)} runs in {elapsed:.1f}s.")
+        print(results.to_string(index=False))
+        best = recommend(results, args.target_fill)
+        print(f"\nLeast stock on hand with fill rate >= {args.target_fill:.0%}:")
+        print(best.to_string(index=False) if len(best) else "  no policy reaches the target")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# benchmark.py
+#
+# Times every public db.py function (plus auth.login_user) against synthetic
+# databases of several sizes and writes a JSON report. Pass a previous report
+# with --compare to fail on regressions before deploying:
+#
+#     python benchmark.py --sizes small,medium --out bench_report.json
+#     python benchmark.py --sizes small --compare bench_report.json --threshold 1.5
+
+import argparse
+import contextlib
+import hashlib
+import inspect
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import auth
+import db
+import synthetic_data
+
+SIZES = {
+    "small": {"n_skus": 500, "n_logs": 100_000, "n_shipments": 5_000, "n_messages": 500},
+    "medium": {"n_skus": 2_000, "n_logs": 1_000_000, "n_shipments": 50_000, "n_messages": 2_000},
+    "large": {"n_skus": 5_000, "n_logs": 5_000_000, "n_shipments": 200_000, "n_messages": 5_000},
+}
+
+# Plumbing rather than queries: connection/cache helpers, decorators, the
+# CLI and the schema helpers that init_db() runs inside its own transaction.
+NOT_TIMED = {"load_db_settings", "get_pool", "get_conn", "pool_stats", "close_all_connections",
+             "cached", "writes", "invalidate", "cache_stats", "clear_cache", "main",
+             "top_queries", "slow_queries", "reset_query_stats", "thread_sql_ms",
+             "get_write_queue", "stop_write_queues", "write_queue_stats", "apply_reconciliation",
+             "create_barcode_index", "rebuild_barcode_index", "create_indexes", "create_sku_totals", "create_log_rollups",
+             "create_inventory_snapshots", "create_sku_velocity", "create_transfers", "create_cache_generations",
+             "recreate_sku_totals_triggers", "migrate_log_messages"}
+
+MANIFEST_CSV = "SKU,Qty\n{sku},3\n{sku},2\nNOPE,1\n"
+
+def public_functions():
+    return sorted(
+        name for name, obj in vars(db).items()
+        if inspect.isfunction(obj) and not name.startswith("_")
+        and getattr(obj, "__module__", None) == "db" and name not in NOT_TIMED
+    )
+
+def fixtures(conn):
+    """Pick realistic arguments from the generated data: the busiest hub and SKU, etc."""
+    hub = conn.execute("SELECT hub FROM logs GROUP BY hub ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    sku, barcode = conn.execute("""
+        SELECT s.sku, s.barcode FROM sku_info s JOIN sku_totals t ON t.sku = s.sku
+        ORDER BY t.quantity DESC LIMIT 1
+    """).fetchone()
+    other_hub = conn.execute("SELECT code FROM warehouses WHERE code != ? LIMIT 1", (hub,)).fetchone()[0]
+    supplier = conn.execute("SELECT supplier FROM shipments LIMIT 1").fetchone()[0]
+    thread_id = conn.execute("SELECT MAX(thread_id) FROM messages").fetchone()[0]
+    last = conn.execute("SELECT MAX(timestamp) FROM logs").fetchone()[0]
+    month_ago = (datetime.strptime(last, "%Y-%m-%d %H:%M:%S").toordinal() - 30)
+    start = datetime.fromordinal(month_ago).strftime("%Y-%m-%d")
+    end = last[:10]
+    _, cursor = db.get_logs_page(hub=hub)
+    last_id = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0]
+    return {"hub": hub, "other_hub": other_hub, "sku": sku, "barcode": barcode, "supplier": supplier,
+            "thread_id": thread_id, "last_id": last_id, "start": start, "end": end, "cursor": cursor}
+
+def build_cases(f):
+    """Return (label, func, make_call) triples; make_call() returns fresh (args, kwargs)."""
+    def call(*args, **kwargs):
+        return lambda: (args, kwargs)
+
+    def manifest():
+        return (io.StringIO(MANIFEST_CSV.format(sku=f["sku"])),), {}
+
+    hub, sku, start, end = f["hub"], f["sku"], f["start"], f["end"]
+    return [
+        ("login_user", auth.login_user, call("bench_admin", synthetic_data.BENCH_PASSWORD)),
+        ("login_user[bad]", auth.login_user, call("bench_admin", "wrong")),
+        ("get_skus_for_hub", db.get_skus_for_hub, call(hub)),
+        ("get_all_inventory", db.get_all_inventory, call()),
+        ("get_sku_totals", db.get_sku_totals, call()),
+        ("get_sku_total", db.get_sku_total, call(sku)),
+        ("check_sku_totals", db.check_sku_totals, call()),
+        ("get_logs_for_hub", db.get_logs_for_hub, call(hub)),
+        ("get_all_logs", db.get_all_logs, call()),
+        ("get_logs_page", db.get_logs_page, call()),
+        ("get_logs_page[next]", db.get_logs_page, call(f["cursor"], hub=hub)),
+        ("get_logs_page[filtered]", db.get_logs_page, call(hub=hub, action="OUT", start_date=start, end_date=end)),
+        ("get_logs_since[first]", db.get_logs_since, call()),
+        ("get_logs_since[idle]", db.get_logs_since, call(f["last_id"], hub)),
+        ("get_logs_since[hub,first]", db.get_logs_since, call(hub=hub)),
+        ("get_logs_since[hub,new]", db.get_logs_since, call(f["last_id"] - 1000, hub)),
+        ("iter_logs[month]", db.iter_logs, call(hub=hub, start_date=start, end_date=end)),
+        ("get_log_actions", db.get_log_actions, call()),
+        ("archive_logs[dry_run]", db.archive_logs, call(dry_run=True)),
+        ("archived_months", db.archived_months, call()),
+        ("get_activity[day]", db.get_activity, call("day", start_date=start)),
+        ("get_activity[week,sku]", db.get_activity, call("week", hub=hub, sku=sku)),
+        ("find_unknown_skus", db.find_unknown_skus, call((sku, "NOPE"))),
+        ("parse_shipment_manifest", db.parse_shipment_manifest, manifest),
+        ("get_shipments_for_hub", db.get_shipments_for_hub, call(hub)),
+        ("get_all_shipments", db.get_all_shipments, call()),
+        ("get_all_shipments[month]", db.get_all_shipments, call(start, end, hub)),
+        ("iter_shipments", db.iter_shipments, call(supplier=f["supplier"])),
+        ("get_all_users", db.get_all_users, call()),
+        ("get_all_sku_info", db.get_all_sku_info, call()),
+        ("get_sku_by_barcode", db.get_sku_by_barcode, call(f["barcode"])),
+        ("get_sku", db.get_sku, call(sku)),
+        ("get_sku_stock", db.get_sku_stock, call(sku)),
+        ("get_inbox", db.get_inbox, call(db.TO_ADMIN)),
+        ("get_admin_inbox", db.get_admin_inbox, call()),
+        ("get_hub_inbox", db.get_hub_inbox, call(hub)),
+        ("count_unread_messages", db.count_unread_messages, call(db.TO_ADMIN)),
+        ("get_thread", db.get_thread, call(f["thread_id"])),
+        ("get_all_warehouses", db.get_all_warehouses, call()),
+        ("stock_as_of[no snapshot]", db.stock_as_of, call(f"{start} 00:00:00")),
+        ("stock_as_of[hub]", db.stock_as_of, call(f"{start} 00:00:00", hub)),
+        ("get_inventory_snapshots", db.get_inventory_snapshots, call()),
+        ("refresh_velocity", db.refresh_velocity, call()),
+        ("get_velocity", db.get_velocity, call()),
+        ("get_velocity[hub]", db.get_velocity, call(hub)),
+        ("rebuild_velocity", db.rebuild_velocity, call()),
+        ("get_daily_demand", db.get_daily_demand, call(hub, start, end)),
+        ("get_shipment_lead_times", db.get_shipment_lead_times, call()),
+        ("reconcile_inventory", db.reconcile_inventory, call()),
+        ("reconcile_inventory[hub]", db.reconcile_inventory, call(hub)),
+        ("maybe_take_inventory_snapshot", db.maybe_take_inventory_snapshot, call()),
+        ("import_sku_catalog[dry_run]", db.import_sku_catalog, call(dry_run=True)),
+        # Writes: each call adds a row or two, which is noise next to the data set.
+        ("update_inventory", db.update_inventory, call(sku, hub, 1, "IN")),
+        ("log_action", db.log_action, call("bench_admin", sku, hub, "IN", 1, "")),
+        ("record_movement", db.record_movement, call("bench_admin", sku, hub, "IN", 1)),
+        ("record_movements", db.record_movements, call([("bench_admin", sku, hub, "IN", 1, ""),
+                                                         ("bench_admin", sku, hub, "OUT", 1, "")])),
+        ("record_shipment", db.record_shipment, call(f["supplier"], "1ZBENCH", "UPS", end, hub, sku, 1)),
+        ("record_shipment_batch", db.record_shipment_batch,
+         call(f["supplier"], "1ZBENCH", "UPS", end, hub, [(sku, 1), (sku, 2)])),
+        # The movements above top up the busiest SKU at hub, so the transfer never runs short;
+        # transfer #1 then exists for the listing reads that follow.
+        ("transfer_stock", db.transfer_stock, call("bench_admin", hub, f["other_hub"], [(sku, 1), (sku, 1)])),
+        ("get_transfers", db.get_transfers, call()),
+        ("get_transfers[hub]", db.get_transfers, call(hub)),
+        ("get_transfer_lines", db.get_transfer_lines, call(1)),
+        ("send_message", db.send_message, call("bench_admin", hub, db.TO_HUB, "Bench", "Body")),
+        ("mark_thread_read", db.mark_thread_read, call(f["thread_id"], db.TO_ADMIN)),
+        ("mark_all_read", db.mark_all_read, call(db.TO_HUB, hub)),
+        ("update_warehouse", db.update_warehouse, call(hub, "Address", "Contact", "Open", "United States")),
+        ("reset_password", db.reset_password, call("bench_admin", synthetic_data.BENCH_PASSWORD_HASH)),
+        ("add_user", db.add_user, lambda: (("bench_" + os.urandom(6).hex(), "x", "manager", hub), {})),
+        ("delete_user", db.delete_user, call("bench_nobody")),
+        ("take_inventory_snapshot", db.take_inventory_snapshot, call()),
+        ("seed_warehouses", db.seed_warehouses, call()),
+        ("clean_junk_skus", db.clean_junk_skus, call()),
+        ("rebuild_sku_totals", db.rebuild_sku_totals, call()),
+        ("rebuild_log_rollups", db.rebuild_log_rollups, call()),
+        ("init_db", db.init_db, call()),
+        ("migrate", db.migrate, call()),
+        ("bootstrap", db.bootstrap, call()),
+        ("check_barcodes", db.check_barcodes, call()),
+        ("schema_version", db.schema_version, call()),
+        ("pending_migrations", db.pending_migrations, call()),
+        ("seed_skus", db.seed_skus, call()),
+    ]
+
+def time_case(func, make_call, repeat):
+    """Run func `repeat` times with a cold query cache; return per-call timings in ms."""
+    timings = []
+    for _ in range(repeat):
+        args, kwargs = make_call()
+        db.clear_cache()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        if inspect.isgenerator(result):
+            for _ in result:
+                pass
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def summarize(timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {"median_ms": round(statistics.median(ordered), 3), "p95_ms": round(p95, 3),
+            "min_ms": round(ordered[0], 3), "runs": len(ordered)}
+
+def run_size(name, workdir, repeat, keep=False):
+    path = os.path.join(workdir, f"bench_{name}.db")
+    if not (keep and os.path.exists(path)):
+        print(f"Generating {name} database…", file=sys.stderr)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = synthetic_data.generate(path, **SIZES[name])
+    else:
+        db.DB_PATH = path
+        db.migrate()  # bring a database kept from an older schema up to date
+        summary = {"reused": True, "db_bytes": os.path.getsize(path)}
+    cases = build_cases(fixtures(db.get_conn()))
+
+    results = {}
+    for label, func, make_call in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            time_case(func, make_call, 1)  # warm the page cache
+            timings = time_case(func, make_call, repeat)
+        results[label] = summarize(timings)
+        print(f"  {name:6} {label:32} median {results[label]['median_ms']:10.2f} ms"
+              f"  p95 {results[label]['p95_ms']:10.2f} ms", file=sys.stderr)
+    db.close_all_connections()
+
+    covered = {func.__name__ for _, func, _ in cases}
+    return {"data": summary, "results": results,
+            "uncovered": [fn for fn in public_functions() if fn not in covered]}
+
+def compare(report, baseline, threshold, floor_ms):
+    """Return (size, label, old, new) for every median that got `threshold` times slower."""
+    regressions = []
+    for size, current in report["sizes"].items():
+        previous = baseline.get("sizes", {}).get(size, {}).get("results", {})
+        for label, stats in current["results"].items():
+            old = previous.get(label, {}).get("median_ms")
+            new = stats["median_ms"]
+            if old is not None and new > floor_ms and new > old * threshold:
+                regressions.append((size, label, old, new))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the db layer on synthetic data")
+    parser.add_argument("--sizes", default="small", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per function")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "ttt_bench"))
+    parser.add_argument("--keep", action="store_true", help="reuse databases left in --workdir")
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.5, help="slowdown ratio that counts as a regression")
+    parser.add_argument("--floor-ms", type=float, default=1.0, help="ignore functions faster than this")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    os.makedirs(args.workdir, exist_ok=True)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "db_py_sha256": hashlib.sha256(open(db.__file__, "rb").read()).hexdigest()[:12],
+        },
+        "sizes": {name: run_size(name, args.workdir, args.repeat, args.keep) for name in sizes},
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {args.out}")
+
+    uncovered = sorted({fn for size in report["sizes"].values() for fn in size["uncovered"]})
+    if uncovered:
+        print(f"⚠️ Not benchmarked: {', '.join(uncovered)}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.floor_ms)
+        for size, label, old, new in regressions:
+            print(f"  {size}: {label} {old:.2f} ms -> {new:.2f} ms ({new / old:.1f}x)")
+        if regressions:
+            print(f"❌ {len(regressions)} functions regressed by more than {args.threshold}x.")
+            return 1
+        print(f"✅ No regressions against {args.compare}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# check_query_plans.py
+#
+# Runs every query issued by db.py through EXPLAIN QUERY PLAN against a
+# scratch database and exits non-zero if any of them falls back to a full
+# table scan or a temp B-tree sort. Run it after touching queries or indexes:
+#
+#     python check_query_plans.py
+
+import inspect
+import io
+import os
+import re
+import sys
+import tempfile
+
+import pandas as pd
+
+import db
+
+# Listings that are meant to return a whole (small) table, plus the catalog
+# import and the sku_totals check/rebuild, which compare whole tables by design,
+# the migration bookkeeping, which reads the few-row schema_version table, the
+# ledger reconciliation, which sums every log row by design, and the demand
+# velocity listing and rebuild, which walk the per-(hub, sku) demand tables,
+# and the shipment lead times that feed the reorder backtest.
+FULL_SCAN_OK = {"get_all_inventory", "get_all_users", "get_all_warehouses", "import_sku_catalog",
+                "check_sku_totals", "rebuild_sku_totals", "rebuild_log_rollups",
+                "schema_version", "pending_migrations", "migrate", "reconcile_inventory",
+                "get_velocity", "rebuild_velocity", "get_shipment_lead_times"}
+# Listings that walk a whole table, but in index order so no sort is needed.
+# Index walks cut short by a LIMIT (keyset pages) are accepted everywhere.
+# Rollup reads and the stock_as_of replay group a bounded time range, so a
+# temp B-tree for the GROUP BY is expected there, as it is for the backtest's
+# daily demand and per-shipment lead times.
+GROUP_BY_OK = {"get_activity", "stock_as_of", "get_daily_demand", "get_shipment_lead_times"}
+INDEX_SCAN_OK = {"get_all_logs", "iter_logs", "iter_shipments", "get_sku_totals", "get_all_shipments", "get_all_sku_info"}
+
+# The cases below refer to this SKU and to the default hubs.
+PLAN_CATALOG = "SKU,Product Name,Barcode\nSKU-1,Plan,123\n"
+
+CASES = [
+    (db.get_skus_for_hub, ("HUB1",)),
+    (db.get_all_inventory, ()),
+    (db.get_sku_totals, ()),
+    (db.get_sku_total, ("SKU-1",)),
+    (db.check_sku_totals, ()),
+    (db.rebuild_sku_totals, ()),
+    (db.update_inventory, ("SKU-1", "HUB1", 1, "IN")),
+    (db.record_movement, ("plan", "SKU-1", "HUB1", "IN", 5, "")),
+    (db.record_movement, ("plan", "SKU-1", "HUB1", "OUT", 1, ""), {"allow_negative": False}),
+    (db.log_action, ("plan", "SKU-1", "HUB1", "IN", 1, "")),
+    (db.get_logs_for_hub, ("HUB1",)),
+    (db.get_all_logs, ()),
+    (db.get_logs_page, ()),
+    (db.get_logs_page, (("2024-01-01 00:00:00", 10),)),
+    (db.get_logs_page, (), {"hub": "HUB1"}),
+    (db.get_logs_page, (("2024-01-01 00:00:00", 10),), {"hub": "HUB1", "action": "IN"}),
+    (db.get_logs_page, (), {"username": "plan"}),
+    (db.get_logs_page, (), {"action": "OUT", "start_date": "2024-01-01", "end_date": "2024-01-31"}),
+    (db.get_logs_page, (), {"start_date": "2020-01-01", "end_date": "2020-03-31"}),
+    (db.get_logs_since, ()),
+    (db.get_logs_since, (), {"hub": "HUB1"}),
+    (db.get_logs_since, (1,), {"hub": "HUB1"}),
+    (db.archive_logs, (), {"dry_run": True}),
+    (db.archived_months, ()),
+    (db.get_activity, ("hour",), {"start_date": "2024-01-01"}),
+    (db.get_activity, ("day",), {"hub": "HUB1", "start_date": "2024-01-01"}),
+    (db.get_activity, ("week",), {"hub": "HUB1", "sku": "SKU-1", "start_date": "2024-01-01", "end_date": "2024-12-31"}),
+    (db.rebuild_log_rollups, ()),
+    (db.stock_as_of, ("2024-06-01 00:00:00",)),
+    (db.take_inventory_snapshot, ()),
+    (db.maybe_take_inventory_snapshot, ()),
+    (db.get_inventory_snapshots, ()),
+    (db.stock_as_of, ("2099-01-01 00:00:00",)),
+    (db.stock_as_of, ("2099-01-01 00:00:00", "HUB1")),
+    (db.refresh_velocity, ()),
+    (db.get_velocity, ()),
+    (db.get_velocity, ("HUB1",)),
+    (db.rebuild_velocity, ()),
+    (db.get_daily_demand, ("HUB1", "2024-01-01")),
+    (db.get_daily_demand, ("HUB1", "2024-01-01", "2024-06-30")),
+    (db.get_shipment_lead_times, ()),
+    (db.get_shipment_lead_times, ("HUB1",)),
+    (db.reconcile_inventory, ()),
+    (db.reconcile_inventory, ("HUB1",)),
+    (db.apply_reconciliation, (pd.DataFrame([("SKU-1", "HUB1", 3, 2, 1, True)], columns=db.RECONCILE_COLUMNS),)),
+    (db.record_movement, ("plan", "SKU-1", "HUB2", "IN", 5, "")),
+    (db.transfer_stock, ("plan", "HUB2", "HUB1", [("SKU-1", 2), ("SKU-1", 1)])),
+    (db.get_transfers, ()),
+    (db.get_transfers, ("HUB1",)),
+    (db.get_transfer_lines, (1,)),
+    (db.record_shipment, ("plan", "TRK", "UPS", "2024-01-01", "HUB1", "SKU-1", 1)),
+    (db.record_shipment_batch, ("plan", "TRK", "UPS", "2024-01-01", "HUB1", [("SKU-1", 2)])),
+    (db.find_unknown_skus, (("SKU-1", "SKU-2"),)),
+    (db.get_shipments_for_hub, ("HUB1",)),
+    (db.get_all_shipments, ()),
+    (db.get_all_shipments, ("2024-01-01", "2024-12-31", "HUB1")),
+    (db.get_all_shipments, (), {"supplier": "plan"}),
+    (db.iter_shipments, (), {"hub": "HUB1"}),
+    (db.iter_logs, (), {"hub": "HUB1", "start_date": "2024-01-01"}),
+    (db.iter_logs, (), {"action": "IN"}),
+    (db.add_user, ("plan", "x", "manager", "HUB1")),
+    (db.get_all_users, ()),
+    (db.reset_password, ("plan", "y")),
+    (db.delete_user, ("plan",)),
+    (db.get_all_sku_info, ()),
+    (db.get_sku_by_barcode, ("123",)),
+    (db.check_barcodes, ()),
+    (db.get_sku, ("SKU1",)),
+    (db.get_sku_stock, ("SKU1",)),
+    (db.get_all_warehouses, ()),
+    (db.update_warehouse, ("HUB1", "Address", "Contact", "Open", "United States")),
+    (db.send_message, ("plan", "HUB1", db.TO_ADMIN, "Subject", "Body")),
+    (db.get_admin_inbox, ()),
+    (db.get_admin_inbox, ("HUB1",)),
+    (db.get_hub_inbox, ("HUB1",)),
+    (db.count_unread_messages, (db.TO_ADMIN,)),
+    (db.count_unread_messages, (db.TO_HUB, "HUB1")),
+    (db.get_thread, (1,)),
+    (db.mark_thread_read, (1, db.TO_ADMIN)),
+    (db.mark_all_read, (db.TO_HUB, "HUB1")),
+    (db.clean_junk_skus, ()),
+    (db.schema_version, ()),
+    (db.pending_migrations, ()),
+    (db.migrate, ()),
+    (db.import_sku_catalog, (io.StringIO("SKU,Product Name,Barcode\nSKU-1,Plan,123\n"),)),
+]
+
+PLANNED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "WITH")
+# The query cache reads and bumps this few-row table around every call.
+CACHE_BOOKKEEPING = "cache_generations"
+TABLE_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+INDEX_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)? USING (COVERING )?INDEX")
+
+def plan_problems(conn, sql, allow_index_scan=False, allow_group_by=False):
+    problems = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall():
+        detail = row[-1]
+        if allow_group_by and detail.startswith("USE TEMP B-TREE FOR GROUP BY"):
+            continue
+        if TABLE_SCAN.match(detail) or "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+        elif INDEX_SCAN.match(detail) and not allow_index_scan:
+            problems.append(detail)
+    return problems
+
+def run_case(conn, func, args, kwargs):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        result = func(*args, **kwargs)
+        if inspect.isgenerator(result):
+            list(result)
+    finally:
+        conn.set_trace_callback(None)
+    normalized = (" ".join(s.split()) for s in statements)
+    return list(dict.fromkeys(s for s in normalized
+                              if s.upper().startswith(PLANNED_STATEMENTS) and CACHE_BOOKKEEPING not in s))
+
+def check_cases(conn, cases=CASES):
+    """Run each case and yield (name, sql, problems) for every statement it issued."""
+    for case in cases:
+        db.clear_cache()
+        func, args = case[0], case[1]
+        kwargs = case[2] if len(case) > 2 else {}
+        for sql in run_case(conn, func, args, kwargs):
+            if func.__name__ in FULL_SCAN_OK:
+                problems = []
+            else:
+                bounded = " LIMIT " in sql.upper()
+                problems = plan_problems(conn, sql, bounded or func.__name__ in INDEX_SCAN_OK,
+                                         func.__name__ in GROUP_BY_OK)
+            yield func.__name__, sql, problems
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "plans.db")
+        db.init_db()
+        db.seed_warehouses()
+        db.import_sku_catalog(io.StringIO(PLAN_CATALOG))
+        for name, sql, problems in check_cases(db.get_conn()):
+            status = "FAIL" if problems else "ok"
+            print(f"{status:4} {name}: {sql[:100]}")
+            for problem in problems:
+                print(f"       -> {problem}")
+            failures += bool(problems)
+        db.close_all_connections()
+
+    if failures:
+        print(f"❌ {failures} queries fall back to a full scan or temp sort.")
+        return 1
+    print("✅ All query plans use indexes.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
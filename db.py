@@ -1,98 +1,939 @@
+import argparse
+import contextlib
+import functools
+import json
+import logging
+import os
 import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
 import pandas as pd
+import yaml
 
-DB_PATH = "ttt_inventory.db"
+CONFIG_PATH = "config.yaml"
+
+# --- CONNECTION POOL ---
+
+DEFAULT_DB_SETTINGS = {
+    "path": "ttt_inventory.db",
+    "busy_timeout_ms": 5000,
+    "cache_size_kb": 16384,
+    "mmap_size_mb": 128,
+    "pool_size": 8,
+    "query_cache_entries": 256,
+    "query_cache_ttl_s": 60,
+    "trace_queries": True,
+    "slow_query_ms": 250,
+    "slow_query_log": "slow_queries.log",
+    "log_retention_days": 365,
+    "archive_dir": "",
+    "snapshot_interval_hours": 24,
+    "write_queue": False,
+    "write_queue_linger_ms": 2,
+    "write_queue_max_batch": 500,
+}
+
+def load_db_settings(config_path=CONFIG_PATH):
+    settings = dict(DEFAULT_DB_SETTINGS)
+    try:
+        with open(config_path) as f:
+            config = yaml.safe_load(f) or {}
+        settings.update(config.get("database") or {})
+    except FileNotFoundError:
+        pass
+    return settings
+
+DB_SETTINGS = load_db_settings()
+DB_PATH = DB_SETTINGS["path"]
+
+class ConnectionPool:
+    """Hands each thread one tuned connection and recycles it once the thread is gone.
+
+    Streamlit runs every session (and every rerun) on its own thread, so
+    connections are leased per thread and returned to an idle list when the
+    owning thread exits, instead of being opened and thrown away per query.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._leased = {}
+        self._idle = []
+        self.opened = 0
+        self.reused = 0
+        self.recycled = 0
+        self.closed = 0
+
+    def _connect(self):
+        factory = TracedConnection if self.settings["trace_queries"] else sqlite3.Connection
+        conn = sqlite3.connect(self.path, timeout=self.settings["busy_timeout_ms"] / 1000,
+                               check_same_thread=False, factory=factory)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.settings['busy_timeout_ms'])}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.settings['cache_size_kb'])}")
+        conn.execute(f"PRAGMA mmap_size={int(self.settings['mmap_size_mb']) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self.opened += 1
+        return conn
+
+    def _reclaim_dead_leases(self):
+        for thread in [t for t in self._leased if not t.is_alive()]:
+            conn = self._leased.pop(thread)
+            if conn.in_transaction:
+                conn.rollback()
+            if len(self._idle) < self.settings["pool_size"]:
+                self._idle.append(conn)
+                self.recycled += 1
+            else:
+                conn.close()
+                self.closed += 1
+
+    def get(self):
+        thread = threading.current_thread()
+        with self._lock:
+            conn = self._leased.get(thread)
+            if conn is not None:
+                self.reused += 1
+                return conn
+            self._reclaim_dead_leases()
+            conn = self._idle.pop() if self._idle else self._connect()
+            self._leased[thread] = conn
+            return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in list(self._leased.values()) + self._idle:
+                conn.close()
+                self.closed += 1
+            self._leased.clear()
+            self._idle.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "leased": len(self._leased),
+                "idle": len(self._idle),
+                "opened": self.opened,
+                "reused": self.reused,
+                "recycled": self.recycled,
+                "closed": self.closed,
+            }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    path = path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(path)
+        # Connections must not cross a fork; start a fresh pool in the child.
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[path] = ConnectionPool(path, DB_SETTINGS)
+        return pool
 
 def get_conn():
-    return sqlite3.connect(DB_PATH)
+    return get_pool().get()
 
-def init_db():
-    with get_conn() as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL,
-            hubs TEXT
-        )
-        """)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS inventory (
-            sku TEXT,
-            hub TEXT,
-            quantity INTEGER,
-            PRIMARY KEY (sku, hub)
-        )
-        """)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            sku TEXT,
-            hub TEXT,
-            action TEXT,
-            qty INTEGER,
-            comment TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS shipments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            supplier TEXT,
-            tracking TEXT,
-            carrier TEXT,
-            ship_date TEXT,
-            hub TEXT,
-            sku TEXT,
-            qty INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS warehouses (
-            code TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            address TEXT,
-            contact TEXT,
-            status TEXT,
-            region TEXT
-        )
-        """)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS sku_info (
-            sku TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            barcode TEXT
-        )
-        """)
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+def close_all_connections():
+    stop_write_queues()
+    query_cache.forget_connections()
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+# --- QUERY TRACING ---
+
+class QueryTracer:
+    """Totals per (caller, statement) plus the most recent slow statements.
+
+    Latency covers execute and every fetch on the cursor, so a SELECT that is
+    cheap to start but expensive to drain is still charged in full. Slow
+    statements also go to the slow-query log file when one is configured.
+    """
+
+    def __init__(self, slow_ms, log_path=None, keep_slow=50):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._slow = deque(maxlen=keep_slow)
+        self.logger = logging.getLogger("ttt.slow_queries")
+        if log_path and not self.logger.handlers:
+            handler = logging.FileHandler(log_path, delay=True)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+
+    def record(self, caller, sql, elapsed_ms, rows, calls):
+        with self._lock:
+            entry = self._totals.get((caller, sql))
+            if entry is None:
+                entry = self._totals[(caller, sql)] = [0, 0, 0.0, 0.0]
+            entry[0] += calls
+            entry[1] += rows
+            entry[2] += elapsed_ms
+            entry[3] = max(entry[3], elapsed_ms)
+
+    def record_slow(self, caller, sql, elapsed_ms, rows):
+        sql = " ".join(sql.split())
+        with self._lock:
+            self._slow.append((time.strftime("%Y-%m-%d %H:%M:%S"), caller, sql, round(elapsed_ms, 1), rows))
+        self.logger.info("%.1f ms rows=%d %s %s", elapsed_ms, rows, caller, sql)
+
+    def top(self, limit=20):
+        with self._lock:
+            totals = sorted(self._totals.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [
+            (caller, " ".join(sql.split()), calls, rows, round(total, 2),
+             round(total / calls, 3) if calls else 0.0, round(longest, 2))
+            for (caller, sql), (calls, rows, total, longest) in totals
+        ]
+
+    def slow(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._slow.clear()
+
+query_tracer = QueryTracer(DB_SETTINGS["slow_query_ms"], DB_SETTINGS["slow_query_log"])
+_trace_local = threading.local()
+_TRACE_FRAMES = {"cursor", "execute", "executemany", "_account"}
+
+def _query_caller():
+    """Name the first function above the tracing wrappers and pandas, e.g. "db.get_all_logs"."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        internal = frame.f_code.co_filename == __file__ and frame.f_code.co_name in _TRACE_FRAMES
+        if not internal and not module.startswith("pandas"):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times execute and fetch calls and reports them to query_tracer."""
+
+    _trace = None
+
+    def _account(self, elapsed_ms, rows, calls=0):
+        trace = self._trace
+        if trace is None:
+            return
+        trace[2] += elapsed_ms
+        trace[3] += rows
+        _trace_local.sql_ms = getattr(_trace_local, "sql_ms", 0.0) + elapsed_ms
+        query_tracer.record(trace[0], trace[1], elapsed_ms, rows, calls)
+        if not trace[4] and trace[2] >= query_tracer.slow_ms:
+            trace[4] = True
+            query_tracer.record_slow(trace[0], trace[1], trace[2], trace[3])
+
+    def execute(self, sql, parameters=()):
+        self._trace = [_query_caller(), sql, 0.0, 0, False]
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._account((time.perf_counter() - start) * 1000, max(self.rowcount, 0), calls=1)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._trace = [_query_caller(), sql, 0.0, 0, False]
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._account((time.perf_counter() - start) * 1000, max(self.rowcount, 0), calls=1)
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._account((time.perf_counter() - start) * 1000, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account((time.perf_counter() - start) * 1000, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._account((time.perf_counter() - start) * 1000, len(rows))
+        return rows
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are TracedCursors."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def top_queries(limit=20):
+    """(caller, sql, calls, rows, total_ms, avg_ms, max_ms) ordered by total time."""
+    return query_tracer.top(limit)
+
+def slow_queries():
+    """(timestamp, caller, sql, ms, rows) for recent statements over slow_query_ms, newest first."""
+    return query_tracer.slow()
+
+def reset_query_stats():
+    query_tracer.reset()
+
+def thread_sql_ms():
+    """Milliseconds this thread has spent in traced SQLite calls so far."""
+    return getattr(_trace_local, "sql_ms", 0.0)
+
+
+# --- QUERY CACHE ---
+
+class QueryCache:
+    """LRU of read results, dropped as soon as a table they read from is written.
+
+    Every table has a generation counter that write helpers bump after they
+    commit. A result computed while a write to one of its tables was in
+    flight is not stored, so the cache never hands out pre-write rows.
+
+    Writes also bump the table's row in cache_generations, and before a
+    lookup the reading connection checks PRAGMA data_version: when another
+    connection has committed since, the shared generations are re-read and
+    tables another process (the API, a second app server) wrote are dropped
+    here too. Results also expire after a TTL, which bounds staleness from
+    writes that bypass db.py.
+    """
+
+    def __init__(self, max_entries, ttl_s):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._shared = {}  # (path, table) -> newest cache_generations value seen
+        self._data_versions = {}  # id(conn) -> PRAGMA data_version at its last sync
+        self.external_invalidations = 0
+
+    def publish(self, conn, path, tables):
+        """Bump the shared generation of `tables`, inside conn's open transaction if it has one.
+
+        Failures are ignored (the table predates its migration, or the lock
+        is busy): the write itself has committed, and the TTL still bounds
+        how long other processes can serve stale rows.
+        """
+        in_transaction = conn.in_transaction
+        try:
+            rows = sqlite3.Cursor(conn).execute("""
+                INSERT INTO cache_generations (name, generation)
+                SELECT value, 1 FROM json_each(?) WHERE true
+                ON CONFLICT(name) DO UPDATE SET generation = generation + 1
+                RETURNING name, generation
+            """, (json.dumps(sorted(tables)),)).fetchall()
+            if not in_transaction:
+                conn.commit()
+        except sqlite3.Error:
+            if not in_transaction and conn.in_transaction:
+                conn.rollback()
+            return
+        with self._lock:
+            for name, generation in rows:
+                self._shared[(path, name)] = generation
+
+    def sync(self, conn, path):
+        """Invalidate tables that other processes wrote since conn last synced."""
+        cursor = sqlite3.Cursor(conn)
+        try:
+            version = cursor.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_versions.get(id(conn)) == version:
+                return
+            rows = cursor.execute("SELECT name, generation FROM cache_generations").fetchall()
+        except sqlite3.Error:
+            return
+        with self._lock:
+            self._data_versions[id(conn)] = version
+            stale = [name for name, generation in rows if self._shared.get((path, name)) != generation]
+            self._shared.update(((path, name), generation) for name, generation in rows)
+        if stale:
+            self.external_invalidations += 1
+            self.invalidate(stale)
+
+    def forget_connections(self):
+        with self._lock:
+            self._data_versions.clear()
+
+    def generations(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(t, 0) for t in tables)
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def store(self, key, tables, generations, value):
+        with self._lock:
+            if tuple(self._generations.get(t, 0) for t in tables) != generations:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_s, tables, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if tables.intersection(entry[1])]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "external_invalidations": self.external_invalidations,
+                "generations": dict(self._generations),
+            }
+
+query_cache = QueryCache(DB_SETTINGS["query_cache_entries"], DB_SETTINGS["query_cache_ttl_s"])
+
+def cached(*tables):
+    """Serve a read helper from query_cache; `tables` are the tables it reads."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (DB_PATH, func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+            query_cache.sync(get_conn(), DB_PATH)
+            hit, value = query_cache.lookup(key)
+            if not hit:
+                generations = query_cache.generations(tables)
+                value = func(*args, **kwargs)
+                query_cache.store(key, tables, generations, value)
+            return list(value) if isinstance(value, list) else value
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+# Tables whose shared generation the current write helper has already had
+# bumped inside its transaction (by _submit_write or the write queue).
+_write_local = threading.local()
+
+def writes(*tables):
+    """Invalidate cached reads of `tables` once the wrapped write helper returns."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = getattr(_write_local, "published", None)
+            _write_local.published = set()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                query_cache.invalidate(tables)
+                pending = set(tables) - _write_local.published
+                if pending:
+                    query_cache.publish(get_conn(), DB_PATH, pending)
+                _write_local.published = None if outer is None else outer | set(tables)
+        return wrapper
+    return decorator
+
+def _mark_published(tables):
+    published = getattr(_write_local, "published", None)
+    if published is not None:
+        published.update(tables)
+
+def invalidate(*tables):
+    query_cache.invalidate(tables)
+    query_cache.publish(get_conn(), DB_PATH, tables)
+
+def create_cache_generations(conn):
+    """Per-table write counters that let every process see which cached reads another one made stale."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS cache_generations (
+        name TEXT PRIMARY KEY,
+        generation INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+
+def cache_stats():
+    return query_cache.stats()
+
+def clear_cache():
+    query_cache.clear()
+
+# --- WRITE QUEUE ---
+
+class WriteQueue:
+    """One writer thread that group-commits queued writes.
+
+    SQLite has a single writer, so sessions that each BEGIN and COMMIT their
+    own write queue up on the lock and pay one fsync apiece. Queued writes
+    instead run on a dedicated thread that takes everything pending (waiting
+    up to linger_ms for stragglers), applies each item under its own
+    savepoint inside one BEGIN IMMEDIATE, and commits once. An item that
+    raises is rolled back alone; its future gets the exception and the rest
+    of the batch still commits.
+    """
+
+    def __init__(self, path, linger_ms, max_batch):
+        self.path = path
+        self.pid = os.getpid()
+        self.linger = linger_ms / 1000
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._stopping = False
+        self.submitted = 0
+        self.batches = 0
+        self.committed = 0
+        self.failed = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name="ttt-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, tables, func, *args):
+        """Queue func(conn, *args); returns a Future for its return value."""
+        future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("write queue is stopped")
+            self._pending.append((tables, func, args, future))
+            self.submitted += 1
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = time.monotonic() + self.linger
+            while len(self._pending) < self.max_batch and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._pending), self.max_batch)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        conn = get_pool(self.path).get()
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._commit(conn, batch)
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for tables, func, args, future in batch:
+                    conn.execute("SAVEPOINT queued_write")
+                    try:
+                        outcomes.append((True, func(conn, *args)))
+                        conn.execute("RELEASE queued_write")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO queued_write")
+                        conn.execute("RELEASE queued_write")
+                        outcomes.append((False, e))
+                query_cache.publish(conn, self.path, {table for tables, _, _, _ in batch for table in tables})
+        except Exception as e:
+            outcomes = [(False, e)] * len(batch)
+        # Invalidate before resolving so a caller's next read sees its own write.
+        query_cache.invalidate({table for tables, _, _, _ in batch for table in tables})
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for (_, _, _, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                self.committed += 1
+                future.set_result(value)
+            else:
+                self.failed += 1
+                future.set_exception(value)
+
+    def stop(self):
+        """Commit whatever is queued, then end the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "path": self.path,
+            "pending": pending,
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "committed": self.committed,
+            "failed": self.failed,
+            "avg_batch": round(self.committed / self.batches, 1) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+def get_write_queue(path=None):
+    path = path or DB_PATH
+    with _write_queues_lock:
+        queue = _write_queues.get(path)
+        # The writer thread does not survive a fork; start a new one in the child.
+        if queue is None or queue.pid != os.getpid():
+            queue = _write_queues[path] = WriteQueue(
+                path, DB_SETTINGS["write_queue_linger_ms"], DB_SETTINGS["write_queue_max_batch"])
+        return queue
+
+def stop_write_queues():
+    with _write_queues_lock:
+        queues = [q for q in _write_queues.values() if q.pid == os.getpid()]
+        _write_queues.clear()
+    for queue in queues:
+        queue.stop()
+
+def write_queue_stats():
+    with _write_queues_lock:
+        queues = list(_write_queues.values())
+    return [queue.stats() for queue in queues]
+
+def _submit_write(tables, func, *args):
+    """Run func(conn, *args) as one atomic write and return a Future for its result.
+
+    With `write_queue` on, the write joins the writer thread's next group
+    commit. Otherwise it runs now in its own BEGIN IMMEDIATE transaction and
+    the returned future is already resolved.
+    """
+    _mark_published(tables)  # the writer thread or the transaction below bumps them
+    if DB_SETTINGS["write_queue"]:
+        return get_write_queue().submit(tables, func, *args)
+    future = Future()
+    conn = get_conn()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            result = func(conn, *args)
+            query_cache.publish(conn, DB_PATH, tables)
+        future.set_result(result)
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        query_cache.invalidate(tables)
+    return future
+
+def _queued(tables, func, args, wait):
+    future = _submit_write(tables, func, *args)
+    return future.result() if wait else future
+
+# --- SCHEMA ---
+
+def _create_base_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,
+        hubs TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS inventory (
+        sku TEXT,
+        hub TEXT,
+        quantity INTEGER,
+        PRIMARY KEY (sku, hub)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        sku TEXT,
+        hub TEXT,
+        action TEXT,
+        qty INTEGER,
+        comment TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS shipments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier TEXT,
+        tracking TEXT,
+        carrier TEXT,
+        ship_date TEXT,
+        hub TEXT,
+        sku TEXT,
+        qty INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS warehouses (
+        code TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        address TEXT,
+        contact TEXT,
+        status TEXT,
+        region TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sku_info (
+        sku TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        barcode TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id INTEGER,
+        sender TEXT NOT NULL,
+        hub TEXT NOT NULL,
+        direction TEXT NOT NULL,
+        recipient TEXT,
+        subject TEXT,
+        body TEXT,
+        is_read INTEGER NOT NULL DEFAULT 0,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _duplicate_barcodes(conn):
+    return conn.execute("""
+        SELECT barcode, group_concat(sku), COUNT(*) FROM sku_info
+        WHERE barcode IS NOT NULL
+        GROUP BY barcode HAVING COUNT(*) > 1
+        ORDER BY barcode
+    """).fetchall()
+
+def create_barcode_index(conn):
+    """Unique barcode -> SKU index for scanning; SKUs without a barcode are exempt."""
+    duplicates = _duplicate_barcodes(conn)
+    if duplicates:
+        # Older catalogs may carry duplicate barcodes; keep lookups indexed until they are cleaned up.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sku_info_barcode ON sku_info (barcode) WHERE barcode IS NOT NULL")
+        print(f"⚠️ {len(duplicates)} barcode(s) are shared by more than one SKU; barcode index created without UNIQUE:")
+        for barcode, skus, _ in duplicates[:20]:
+            print(f"   {barcode}: {skus}")
+        print("   Fix them in the catalog, then run `python db.py check-barcodes`.")
+        return
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sku_info_barcode ON sku_info (barcode)
+        WHERE barcode IS NOT NULL
+    """)
+
+def rebuild_barcode_index(conn):
+    """Replace the barcode index; earlier versions keyed it on (barcode, sku), which never rejected anything."""
+    conn.execute("DROP INDEX IF EXISTS idx_sku_info_barcode")
+    create_barcode_index(conn)
+
+def create_indexes(conn):
+    # Hub screens filter by hub and sort newest first; message screens also filter on action.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_hub ON inventory (hub, sku, quantity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_hub_timestamp ON logs (hub, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_action_hub_timestamp ON logs (action, hub, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_action_timestamp ON logs (action, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_username_timestamp ON logs (username, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shipments_timestamp ON shipments (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shipments_hub_timestamp ON shipments (hub, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shipments_supplier_timestamp ON shipments (supplier, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sku_info_name ON sku_info (name, sku, barcode)")
+    create_barcode_index(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_inbox ON messages (direction, hub, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_direction_timestamp ON messages (direction, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages (direction, is_read, hub)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id, id)")
 
 # --- INVENTORY FUNCTIONS ---
 
+@cached("inventory")
 def get_skus_for_hub(hub):
     with get_conn() as conn:
         return conn.execute("SELECT sku, quantity FROM inventory WHERE hub=?", (hub,)).fetchall()
 
-def update_inventory(sku, hub, qty, action):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        current = cur.execute("SELECT quantity FROM inventory WHERE sku=? AND hub=?", (sku, hub)).fetchone()
-        new_qty = (current[0] if current else 0) + (qty if action == 'IN' else -qty)
-        cur.execute("INSERT OR REPLACE INTO inventory (sku, hub, quantity) VALUES (?, ?, ?)", (sku, hub, new_qty))
+@writes("inventory")
+def update_inventory(sku, hub, qty, action, wait=True):
+    """Add (IN) or remove qty at hub; with wait=False returns a Future instead of the new quantity."""
+    return _queued(("inventory",), _update_inventory, (sku, hub, qty, action), wait)
+
+def _update_inventory(conn, sku, hub, qty, action):
+    return _apply_delta(conn, sku, hub, qty if action == 'IN' else -qty)
 
+@cached("inventory")
 def get_all_inventory():
     with get_conn() as conn:
         return conn.execute("SELECT sku, hub, quantity FROM inventory").fetchall()
 
-# --- LOGS ---
+# --- NETWORK TOTALS ---
+
+def create_sku_totals(conn):
+    """Create sku_totals and the inventory triggers that keep it in step.
+
+    Every insert, update and delete on inventory adjusts the per-SKU network
+    total in the same transaction, and a total that drops to zero is removed
+    so deleted SKUs leave no row behind. Inventory writes must stay plain
+    INSERT/UPDATE/UPSERT: the delete half of an INSERT OR REPLACE does not
+    fire triggers, so it would double count.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sku_totals (
+        sku TEXT PRIMARY KEY,
+        quantity INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_totals_insert AFTER INSERT ON inventory
+    BEGIN
+        INSERT INTO sku_totals (sku, quantity) VALUES (NEW.sku, NEW.quantity)
+        ON CONFLICT(sku) DO UPDATE SET quantity = quantity + excluded.quantity;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_totals_update AFTER UPDATE OF sku, quantity ON inventory
+    BEGIN
+        UPDATE sku_totals SET quantity = quantity - OLD.quantity WHERE sku = OLD.sku;
+        INSERT INTO sku_totals (sku, quantity) VALUES (NEW.sku, NEW.quantity)
+        ON CONFLICT(sku) DO UPDATE SET quantity = quantity + excluded.quantity;
+        DELETE FROM sku_totals WHERE sku IN (OLD.sku, NEW.sku) AND quantity = 0;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_totals_delete AFTER DELETE ON inventory
+    BEGIN
+        UPDATE sku_totals SET quantity = quantity - OLD.quantity WHERE sku = OLD.sku;
+        DELETE FROM sku_totals WHERE sku = OLD.sku AND quantity = 0;
+    END
+    """)
+    # Backfill once when the table is first added to an existing database.
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM sku_totals)").fetchone()[0]:
+        _rebuild_sku_totals(conn)
+
+def recreate_sku_totals_triggers(conn):
+    """Replace the inventory triggers with the versions that drop zero totals, and drop existing ones."""
+    for trigger in ("trg_inventory_totals_insert", "trg_inventory_totals_update", "trg_inventory_totals_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    create_sku_totals(conn)
+    conn.execute("DELETE FROM sku_totals WHERE quantity = 0")
+
+def _expected_sku_totals_sql():
+    return "SELECT sku, COALESCE(SUM(quantity), 0) AS quantity FROM inventory GROUP BY sku"
 
-def log_action(username, sku, hub, action, qty, comment):
+def _rebuild_sku_totals(conn):
+    conn.execute("DELETE FROM sku_totals")
+    conn.execute(f"INSERT INTO sku_totals (sku, quantity) "
+                 f"SELECT sku, quantity FROM ({_expected_sku_totals_sql()}) WHERE quantity != 0")
+
+@cached("inventory", "sku_totals")
+def check_sku_totals():
+    """Return (sku, stored, expected) for every SKU whose total disagrees with inventory.
+
+    A missing row and a zero total are the same thing: the triggers drop
+    totals that reach zero.
+    """
     with get_conn() as conn:
-        conn.execute("""
-        INSERT INTO logs (username, sku, hub, action, qty, comment)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """, (username, sku, hub, action, qty, comment))
+        return conn.execute(f"""
+        SELECT sku, stored, expected FROM (
+            SELECT e.sku, t.quantity AS stored, e.quantity AS expected
+            FROM ({_expected_sku_totals_sql()}) e
+            LEFT JOIN sku_totals t ON t.sku = e.sku
+            UNION ALL
+            SELECT t.sku, t.quantity, NULL
+            FROM sku_totals t
+            WHERE NOT EXISTS (SELECT 1 FROM inventory i WHERE i.sku = t.sku)
+        )
+        WHERE COALESCE(stored, 0) != COALESCE(expected, 0)
+        """).fetchall()
+
+@writes("sku_totals")
+def rebuild_sku_totals():
+    """Recompute sku_totals from inventory; returns the mismatches that were fixed."""
+    mismatches = check_sku_totals.uncached()
+    conn = get_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_sku_totals(conn)
+    return mismatches
 
+@cached("inventory", "sku_totals")
+def get_sku_totals():
+    with get_conn() as conn:
+        return conn.execute("SELECT sku, quantity FROM sku_totals ORDER BY sku").fetchall()
+
+@cached("inventory", "sku_totals")
+def get_sku_total(sku):
+    with get_conn() as conn:
+        row = conn.execute("SELECT quantity FROM sku_totals WHERE sku=?", (sku,)).fetchone()
+    return row[0] if row else 0
+
+# --- LOGS ---
+
+@writes("logs")
+def log_action(username, sku, hub, action, qty, comment, wait=True):
+    """Append one log row; returns its id, or a Future for it with wait=False."""
+    return _queued(("logs",), _log_action, (username, sku, hub, action, qty, comment), wait)
+
+def _log_action(conn, username, sku, hub, action, qty, comment):
+    return conn.execute("""
+    INSERT INTO logs (username, sku, hub, action, qty, comment)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, (username, sku, hub, action, qty, comment)).lastrowid
+
+@cached("logs")
 def get_logs_for_hub(hub):
     with get_conn() as conn:
         return conn.execute("""
@@ -102,6 +943,7 @@ def get_logs_for_hub(hub):
         ORDER BY timestamp DESC
         """, (hub,)).fetchall()
 
+@cached("logs")
 def get_all_logs():
     with get_conn() as conn:
         return conn.execute("""
@@ -110,15 +952,989 @@ def get_all_logs():
         ORDER BY timestamp DESC
         """).fetchall()
 
-# --- SHIPMENTS ---
+LOG_PAGE_COLUMNS = ["id", "timestamp", "username", "sku", "hub", "action", "qty", "comment"]
+
+def _log_filters(hub=None, username=None, action=None, start_date=None, end_date=None):
+    clauses, params = [], []
+    if hub:
+        clauses.append("hub = ?")
+        params.append(hub)
+    if username:
+        clauses.append("username = ?")
+        params.append(username)
+    if action:
+        clauses.append("action = ?")
+        params.append(action)
+    if start_date:
+        clauses.append("timestamp >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("timestamp < date(?, '+1 day')")
+        params.append(str(end_date))
+    return clauses, params
+
+@cached("logs")
+def get_logs_page(cursor=None, limit=100, hub=None, username=None, action=None, start_date=None, end_date=None):
+    """Return (rows, next_cursor) for one page of logs, newest first.
 
-def record_shipment(supplier, tracking, carrier, ship_date, hub, sku, qty):
+    Pages are keyed on the (timestamp, id) of the last row seen, so each page
+    is an index seek no matter how deep into the history it is. Pass the
+    returned cursor back to get the next page; it is None on the last page.
+    With a start_date, pages continue into the archived months it covers.
+    """
+    clauses, params = _log_filters(hub, username, action, start_date, end_date)
+    if cursor:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = get_conn()
+    rows = []
+    with contextlib.closing(_log_sources(conn, start_date, end_date, cursor[0] if cursor else None)) as sources:
+        for source in sources:
+            rows += conn.execute(f"""
+            SELECT id, timestamp, username, sku, hub, action, qty, comment
+            FROM {source}.logs
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+            """, params + [limit + 1 - len(rows)]).fetchall()
+            if len(rows) > limit:
+                break
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1][1], rows[-1][0])
+    return rows, None
+
+def get_logs_since(last_id=0, hub=None, limit=100):
+    """Return (rows, high_water): up to `limit` logs newer than last_id, newest first.
+
+    Rows are LOG_PAGE_COLUMNS. Live feeds pass the returned high_water back
+    as last_id. It is the newest id overall, not just the newest returned
+    row, so a quiet hub's polls never re-walk other hubs' rows, and an idle
+    poll is two rowid seeks that find nothing. With more than `limit` new
+    rows only the newest come back, which is all a feed of `limit` rows would
+    keep. Not cached: the cache TTL would hide writes from other processes
+    (the API, other app servers) for up to a minute.
+    """
+    last_id = last_id or 0
     with get_conn() as conn:
-        conn.execute("""
-        INSERT INTO shipments (supplier, tracking, carrier, ship_date, hub, sku, qty)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (supplier, tracking, carrier, ship_date, hub, sku, qty))
+        high_water = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0] or 0
+        if high_water == last_id:
+            return [], high_water
+        if not hub:
+            where, params, order = "id > ? AND id <= ?", [last_id, high_water], "id DESC"
+        elif last_id:
+            # Unary + keeps the planner on the rowid range; the hub index
+            # would visit every row of the hub and then sort them.
+            where, params, order = "id > ? AND id <= ? AND +hub = ?", [last_id, high_water, hub], "id DESC"
+        else:
+            # First load: a quiet hub's newest rows can be far back, so seek
+            # the hub index rather than walk rowids down to them.
+            where, params, order = "hub = ? AND id <= ?", [hub, high_water], "timestamp DESC, id DESC"
+        rows = conn.execute(f"""
+        SELECT id, timestamp, username, sku, hub, action, qty, comment
+        FROM logs
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ?
+        """, params + [limit]).fetchall()
+    return rows, high_water
+
+LOG_EXPORT_COLUMNS = ["timestamp", "username", "sku", "hub", "action", "qty", "comment"]
+
+def iter_logs(batch_size=5000, hub=None, username=None, action=None, start_date=None, end_date=None):
+    """Yield logs newest first in lists of at most batch_size rows, for exports.
+
+    With a start_date, archived months in the range follow the hot table.
+    """
+    clauses, params = _log_filters(hub, username, action, start_date, end_date)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = get_conn()
+    with contextlib.closing(_log_sources(conn, start_date, end_date)) as sources:
+        for source in sources:
+            cur = conn.execute(f"""
+                SELECT timestamp, username, sku, hub, action, qty, comment
+                FROM {source}.logs
+                {where}
+                ORDER BY timestamp DESC, id DESC
+            """, params)
+            while batch := cur.fetchmany(batch_size):
+                yield batch
+
+def get_log_actions():
+    """Every action a log row can carry, for the log filters; no need to scan logs for them."""
+    return sorted([*MOVEMENT_DIRECTIONS, RECONCILE_ACTION])
+
+# --- LOG ARCHIVE ---
+
+# Logs older than the retention horizon live in one SQLite file per month,
+# e.g. ttt_inventory_archive/logs_2024-01.db. Only whole months are archived,
+# so every archived row is older than every row left in the hot table.
+ARCHIVE_LOG_COLUMNS = "id, username, sku, hub, action, qty, comment, timestamp, transfer_id"
+
+def _archive_dir():
+    return DB_SETTINGS["archive_dir"] or os.path.splitext(DB_PATH)[0] + "_archive"
+
+def _archive_path(month):
+    return os.path.join(_archive_dir(), f"logs_{month}.db")
+
+def archived_months():
+    """Months ("YYYY-MM") that have an archive file, oldest first."""
+    try:
+        names = os.listdir(_archive_dir())
+    except FileNotFoundError:
+        return []
+    return sorted(name[5:12] for name in names if name.startswith("logs_") and name.endswith(".db") and len(name) == 15)
+
+def _archived_until():
+    """First timestamp not covered by the archives, or None when nothing is archived."""
+    months = archived_months()
+    if not months:
+        return None
+    return _next_month(months[-1] + "-01")
+
+def _next_month(day):
+    first = datetime.strptime(day[:7], "%Y-%m").date()
+    return (first.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
+
+def _attach_archive(conn, month):
+    alias = "archive_" + month.replace("-", "_")
+    if alias not in {row[1] for row in conn.execute("PRAGMA database_list")}:
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (_archive_path(month),))
+    return alias
+
+def _log_sources(conn, start_date=None, end_date=None, before=None):
+    """Yield "main", then each archive in [start_date, end_date] newest first.
+
+    Archives are attached one at a time and detached as soon as the caller
+    moves on, so a range of any length stays under SQLite's attach limit and
+    the daily path (no start_date) never touches an archive.
+    """
+    yield "main"
+    if not start_date:
+        return
+    first = str(start_date)[:7]
+    last = min(str(end_date)[:7] if end_date else "9999-12", before[:7] if before else "9999-12")
+    for month in reversed(archived_months()):
+        if month < first:
+            break
+        if month > last:
+            continue
+        alias = _attach_archive(conn, month)
+        try:
+            yield alias
+        finally:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+def _create_archive_table(conn, alias):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {alias}.logs (
+        id INTEGER PRIMARY KEY,
+        username TEXT,
+        sku TEXT,
+        hub TEXT,
+        action TEXT,
+        qty INTEGER,
+        comment TEXT,
+        timestamp DATETIME,
+        transfer_id INTEGER
+    )
+    """)
+    # Archives written before transfers existed lack the column.
+    if "transfer_id" not in {row[1] for row in conn.execute(f"PRAGMA {alias}.table_info(logs)")}:
+        conn.execute(f"ALTER TABLE {alias}.logs ADD COLUMN transfer_id INTEGER")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_logs_timestamp ON logs (timestamp)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_logs_hub_timestamp ON logs (hub, timestamp)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_logs_action_timestamp ON logs (action, timestamp)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_logs_username_timestamp ON logs (username, timestamp)")
+
+@writes("logs")
+def archive_logs(retention_days=None, dry_run=False):
+    """Move whole months of logs older than the retention horizon into archive files.
+
+    Returns [(month, rows)]. Each month is copied with INSERT OR IGNORE and
+    then deleted from the hot table; with WAL the two files do not commit
+    atomically together, but a rerun after a crash only re-copies (and
+    ignores) rows that were not yet deleted. log_rollups has no delete
+    trigger, so activity charts keep the archived history.
+    """
+    days = DB_SETTINGS["log_retention_days"] if retention_days is None else retention_days
+    cutoff = (date.today() - timedelta(days=days)).replace(day=1).isoformat()
+    conn = get_conn()
+    oldest = conn.execute("SELECT MIN(timestamp) FROM logs").fetchone()[0]
+    moved = []
+    month_start = oldest[:7] + "-01" if oldest else cutoff
+    while month_start < cutoff:
+        month_end = _next_month(month_start)
+        window = (month_start, month_end)
+        rows = conn.execute("SELECT COUNT(*) FROM logs WHERE timestamp >= ? AND timestamp < ?", window).fetchone()[0]
+        if rows and not dry_run:
+            os.makedirs(_archive_dir(), exist_ok=True)
+            alias = _attach_archive(conn, month_start[:7])
+            try:
+                _create_archive_table(conn, alias)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(f"""
+                        INSERT OR IGNORE INTO {alias}.logs ({ARCHIVE_LOG_COLUMNS})
+                        SELECT {ARCHIVE_LOG_COLUMNS} FROM main.logs WHERE timestamp >= ? AND timestamp < ?
+                    """, window)
+                    conn.execute("DELETE FROM main.logs WHERE timestamp >= ? AND timestamp < ?", window)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            finally:
+                conn.execute(f"DETACH DATABASE {alias}")
+        if rows:
+            moved.append((month_start[:7], rows))
+        month_start = month_end
+    return moved
+
+# --- ACTIVITY ROLLUPS ---
+
+# How each chart bucket is derived from the hourly rollup key.
+ROLLUP_PERIODS = {
+    "hour": "bucket",
+    "day": "substr(bucket, 1, 10)",
+    "week": "date(bucket, '-6 days', 'weekday 1')",
+}
+ACTIVITY_COLUMNS = ["period", "hub", "action", "qty", "moves"]
+
+def create_log_rollups(conn):
+    """Create log_rollups and the logs trigger that feeds it.
+
+    Each logged movement adds its qty to an hourly (bucket, hub, sku, action)
+    row, so charts aggregate a bounded number of buckets instead of raw logs.
+    Rows deleted from logs are not subtracted; rebuild_log_rollups()
+    recomputes the table from logs when that matters.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS log_rollups (
+        bucket TEXT NOT NULL,
+        hub TEXT NOT NULL,
+        sku TEXT NOT NULL,
+        action TEXT NOT NULL,
+        qty INTEGER NOT NULL DEFAULT 0,
+        moves INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, hub, sku, action)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_rollups_hub_bucket ON log_rollups (hub, bucket)")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_logs_rollup AFTER INSERT ON logs
+    WHEN NEW.action NOT IN ('MESSAGE', 'REPLY')
+    BEGIN
+        INSERT INTO log_rollups (bucket, hub, sku, action, qty, moves)
+        VALUES (strftime('%Y-%m-%d %H:00:00', NEW.timestamp), COALESCE(NEW.hub, ''), COALESCE(NEW.sku, ''),
+                NEW.action, COALESCE(NEW.qty, 0), 1)
+        ON CONFLICT(bucket, hub, sku, action) DO UPDATE SET qty = qty + excluded.qty, moves = moves + 1;
+    END
+    """)
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM log_rollups)").fetchone()[0]:
+        _rebuild_log_rollups(conn)
+
+def _rebuild_log_rollups(conn):
+    # Buckets before the archive horizon have no hot rows left to rebuild from; keep them.
+    horizon = _archived_until() or ""
+    conn.execute("DELETE FROM log_rollups WHERE bucket >= ?", (horizon,))
+    conn.execute("""
+        INSERT INTO log_rollups (bucket, hub, sku, action, qty, moves)
+        SELECT strftime('%Y-%m-%d %H:00:00', timestamp), COALESCE(hub, ''), COALESCE(sku, ''),
+               action, SUM(COALESCE(qty, 0)), COUNT(*)
+        FROM logs
+        WHERE action NOT IN ('MESSAGE', 'REPLY') AND timestamp >= ?
+        GROUP BY 1, 2, 3, 4
+    """, (horizon,))
+
+@writes("log_rollups")
+def rebuild_log_rollups():
+    conn = get_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_log_rollups(conn)
+        return conn.execute("SELECT COUNT(*) FROM log_rollups").fetchone()[0]
+
+@cached("logs", "log_rollups")
+def get_activity(bucket="day", hub=None, sku=None, start_date=None, end_date=None):
+    """Movement qty and counts per (period, hub, action) from the hourly rollups."""
+    if bucket not in ROLLUP_PERIODS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    clauses, params = [], []
+    if hub:
+        clauses.append("hub = ?")
+        params.append(hub)
+    if sku:
+        clauses.append("sku = ?")
+        params.append(sku)
+    if start_date:
+        clauses.append("bucket >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("bucket < date(?, '+1 day')")
+        params.append(str(end_date))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_conn() as conn:
+        return conn.execute(f"""
+        SELECT {ROLLUP_PERIODS[bucket]} AS period, hub, action, SUM(qty), SUM(moves)
+        FROM log_rollups
+        {where}
+        GROUP BY period, hub, action
+        """, params).fetchall()
+
+# --- STOCK MOVEMENTS ---
+
+# Sign each logged action applies to the on-hand quantity. COUNT is applied
+# as an IN, which is how the retail screen has always recorded it.
+MOVEMENT_DIRECTIONS = {
+    "IN": 1,
+    "OUT": -1,
+    "COUNT": 1,
+    "ADMIN-ADD": 1,
+    "ADMIN-REMOVE": -1,
+    "SUPPLIER-IN": 1,
+    "TRANSFER-OUT": -1,
+    "TRANSFER-IN": 1,
+}
+
+class InsufficientStockError(ValueError):
+    def __init__(self, sku, hub, qty):
+        super().__init__(f"Not enough stock of {sku} at {hub} to remove {qty}")
+        self.sku = sku
+        self.hub = hub
+        self.qty = qty
 
+def _apply_delta(conn, sku, hub, delta, allow_negative=True):
+    if delta < 0 and not allow_negative:
+        row = conn.execute("""
+            UPDATE inventory SET quantity = quantity + ?
+            WHERE sku=? AND hub=? AND quantity + ? >= 0
+            RETURNING quantity
+        """, (delta, sku, hub, delta)).fetchone()
+        if row is None:
+            raise InsufficientStockError(sku, hub, -delta)
+        return row[0]
+    return conn.execute("""
+        INSERT INTO inventory (sku, hub, quantity) VALUES (?, ?, ?)
+        ON CONFLICT(sku, hub) DO UPDATE SET quantity = quantity + excluded.quantity
+        RETURNING quantity
+    """, (sku, hub, delta)).fetchone()[0]
+
+def _movement_delta(action, qty):
+    if action not in MOVEMENT_DIRECTIONS:
+        raise ValueError(f"Unknown movement action: {action}")
+    return MOVEMENT_DIRECTIONS[action] * qty
+
+@writes("inventory", "logs")
+def record_movements(movements, allow_negative=True, wait=True):
+    """Apply (username, sku, hub, action, qty, comment) movements in one transaction.
+
+    Either every movement is applied and logged or none is. Returns the new
+    quantity for each movement, in order (or a Future for that list with
+    wait=False).
+    """
+    return _queued(("inventory", "logs"), _write_movements, ([tuple(m) for m in movements], allow_negative), wait)
+
+def _write_movements(conn, movements, allow_negative=True, transfer_id=None):
+    movements = [tuple(m) for m in movements]
+    deltas = [_movement_delta(m[3], m[4]) for m in movements]
+    new_quantities = [
+        _apply_delta(conn, sku, hub, delta, allow_negative)
+        for (_, sku, hub, _, _, _), delta in zip(movements, deltas)
+    ]
+    conn.executemany("""
+    INSERT INTO logs (username, sku, hub, action, qty, comment, transfer_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [m + (transfer_id,) for m in movements])
+    return new_quantities
+
+def record_movement(username, sku, hub, action, qty, comment="", allow_negative=True):
+    return record_movements([(username, sku, hub, action, qty, comment)], allow_negative)[0]
+
+# --- TRANSFERS ---
+
+TRANSFER_COLUMNS = ["id", "created_at", "username", "from_hub", "to_hub", "lines", "units", "comment"]
+
+def create_transfers(conn):
+    """Transfer headers, plus logs.transfer_id linking each TRANSFER-OUT/TRANSFER-IN row to one."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS transfers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        username TEXT NOT NULL,
+        from_hub TEXT NOT NULL,
+        to_hub TEXT NOT NULL,
+        lines INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        comment TEXT
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_created_at ON transfers (created_at)")
+    if "transfer_id" not in {row[1] for row in conn.execute("PRAGMA table_info(logs)")}:
+        conn.execute("ALTER TABLE logs ADD COLUMN transfer_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_transfer ON logs (transfer_id) WHERE transfer_id IS NOT NULL")
+
+class UnknownHubError(ValueError):
+    def __init__(self, hubs):
+        super().__init__(f"Unknown hub(s): {', '.join(hubs)}")
+        self.hubs = hubs
+
+def _transfer_lines(lines):
+    """Sum [(sku, qty)] per SKU, keeping first-seen order; every qty must be a positive integer."""
+    totals = {}
+    for sku, qty in lines:
+        qty = int(qty)
+        if qty <= 0:
+            raise ValueError(f"Transfer quantities must be positive (got {qty} for {sku}).")
+        totals[str(sku)] = totals.get(str(sku), 0) + qty
+    if not totals:
+        raise ValueError("A transfer needs at least one line.")
+    return list(totals.items())
+
+@writes("inventory", "logs", "transfers")
+def transfer_stock(username, from_hub, to_hub, lines, comment="", wait=True):
+    """Move [(sku, qty)] lines from from_hub to to_hub in one transaction; returns the transfer id.
+
+    Every line is logged as a TRANSFER-OUT at the source and a TRANSFER-IN
+    at the destination, both carrying the transfer id. If either hub is not
+    a warehouse (UnknownHubError), any SKU is unknown (UnknownSkuError) or short
+    at the source (InsufficientStockError), nothing is written. With wait=False a Future for the id is returned.
+    """
+    if from_hub == to_hub:
+        raise ValueError("Source and destination hub must differ.")
+    return _queued(("inventory", "logs", "transfers"), _transfer_stock,
+                   (username, from_hub, to_hub, _transfer_lines(lines), comment), wait)
+
+def _transfer_stock(conn, username, from_hub, to_hub, lines, comment):
+    missing = [hub for hub in (from_hub, to_hub)
+               if conn.execute("SELECT 1 FROM warehouses WHERE code = ?", (hub,)).fetchone() is None]
+    if missing:
+        raise UnknownHubError(missing)
+    unknown = _unknown_skus(conn, [sku for sku, _ in lines])
+    if unknown:
+        raise UnknownSkuError(unknown)
+    transfer_id = conn.execute("""
+        INSERT INTO transfers (username, from_hub, to_hub, lines, units, comment) VALUES (?, ?, ?, ?, ?, ?)
+    """, (username, from_hub, to_hub, len(lines), sum(qty for _, qty in lines), comment)).lastrowid
+    note = f"Transfer #{transfer_id} {from_hub} -> {to_hub}" + (f": {comment}" if comment else "")
+    _write_movements(conn, [(username, sku, from_hub, "TRANSFER-OUT", qty, note) for sku, qty in lines]
+                     + [(username, sku, to_hub, "TRANSFER-IN", qty, note) for sku, qty in lines],
+                     allow_negative=False, transfer_id=transfer_id)
+    return transfer_id
+
+@cached("transfers")
+def get_transfers(hub=None, limit=50):
+    """TRANSFER_COLUMNS rows for the newest transfers, optionally only those into or out of hub."""
+    with get_conn() as conn:
+        return conn.execute(f"""
+            SELECT id, created_at, username, from_hub, to_hub, lines, units, comment
+            FROM transfers
+            {"WHERE from_hub = ? OR to_hub = ?" if hub else ""}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, (hub, hub, limit) if hub else (limit,)).fetchall()
+
+@cached("logs")
+def get_transfer_lines(transfer_id):
+    """[(sku, qty)] moved by one transfer."""
+    with get_conn() as conn:
+        return conn.execute("""
+            SELECT sku, qty FROM logs WHERE transfer_id = ? AND action = 'TRANSFER-OUT' ORDER BY id
+        """, (transfer_id,)).fetchall()
+
+# --- INVENTORY SNAPSHOTS ---
+
+def create_inventory_snapshots(conn):
+    """Snapshot headers plus their non-zero (hub, sku, quantity) rows."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS inventory_snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        taken_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        last_log_id INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_snapshots_taken_at ON inventory_snapshots (taken_at, id)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS inventory_snapshot_rows (
+        snapshot_id INTEGER NOT NULL,
+        hub TEXT NOT NULL,
+        sku TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (snapshot_id, hub, sku)
+    ) WITHOUT ROWID
+    """)
+
+@writes("inventory_snapshots")
+def take_inventory_snapshot():
+    """Copy current inventory into a new snapshot and return its id.
+
+    The snapshot records the newest log id it includes, so stock_as_of can
+    replay exactly the rows written after it.
+    """
+    conn = get_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return _take_inventory_snapshot(conn)
+
+def _take_inventory_snapshot(conn):
+    last_log_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+    snapshot_id = conn.execute("INSERT INTO inventory_snapshots (last_log_id) VALUES (?)", (last_log_id,)).lastrowid
+    conn.execute("""
+        INSERT INTO inventory_snapshot_rows (snapshot_id, hub, sku, quantity)
+        SELECT ?, hub, sku, quantity FROM inventory WHERE quantity != 0
+    """, (snapshot_id,))
+    return snapshot_id
+
+def maybe_take_inventory_snapshot(interval_hours=None):
+    """Take a snapshot if the newest one is older than snapshot_interval_hours; return its id or None."""
+    hours = DB_SETTINGS["snapshot_interval_hours"] if interval_hours is None else interval_hours
+    latest = get_conn().execute("""
+        SELECT taken_at > datetime('now', ?) FROM inventory_snapshots ORDER BY taken_at DESC, id DESC LIMIT 1
+    """, (f"-{hours} hours",)).fetchone()
+    if latest and latest[0]:
+        return None
+    return take_inventory_snapshot()
+
+@cached("inventory_snapshots")
+def get_inventory_snapshots(limit=50):
+    """(id, taken_at, last_log_id, rows) for the newest snapshots."""
+    with get_conn() as conn:
+        return conn.execute("""
+            SELECT s.id, s.taken_at, s.last_log_id,
+                   (SELECT COUNT(*) FROM inventory_snapshot_rows r WHERE r.snapshot_id = s.id)
+            FROM inventory_snapshots s
+            ORDER BY s.taken_at DESC, s.id DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+
+def _movement_sign_sql():
+    cases = " ".join(f"WHEN '{action}' THEN {sign}" for action, sign in MOVEMENT_DIRECTIONS.items())
+    return f"CASE action {cases} ELSE 0 END"
+
+@cached("logs", "inventory_snapshots")
+def stock_as_of(timestamp, hub=None):
+    """Return [(sku, hub, quantity)] as it stood at `timestamp`, non-zero rows only.
+
+    Starts from the newest snapshot taken at or before `timestamp` and
+    replays only the logs written after it, with the same signs that
+    record_movement applies (COUNT adds, like an IN). Without an earlier
+    snapshot the whole history is replayed, archived months included.
+    """
+    timestamp = str(timestamp)
+    conn = get_conn()
+    snapshot = conn.execute("""
+        SELECT id, taken_at, last_log_id FROM inventory_snapshots
+        WHERE taken_at <= ?
+        ORDER BY taken_at DESC, id DESC
+        LIMIT 1
+    """, (timestamp,)).fetchone()
+    stock = {}
+    if snapshot:
+        snapshot_id, since, last_log_id = snapshot
+        rows = conn.execute(f"""
+            SELECT sku, hub, quantity FROM inventory_snapshot_rows
+            WHERE snapshot_id = ? {"AND hub = ?" if hub else ""}
+        """, (snapshot_id, hub) if hub else (snapshot_id,)).fetchall()
+        stock = {(sku, row_hub): qty for sku, row_hub, qty in rows}
+    else:
+        since, last_log_id = "0000-01-01", 0
+
+    clauses = ["timestamp >= ?", "timestamp <= ?", "id > ?"]
+    params = [since, timestamp, last_log_id]
+    if hub:
+        clauses.insert(0, "hub = ?")
+        params.insert(0, hub)
+    with contextlib.closing(_log_sources(conn, since, timestamp[:10])) as sources:
+        for source in sources:
+            for sku, row_hub, delta in conn.execute(f"""
+                SELECT sku, hub, SUM(qty * {_movement_sign_sql()})
+                FROM {source}.logs
+                WHERE {" AND ".join(clauses)}
+                GROUP BY sku, hub
+            """, params):
+                stock[(sku, row_hub)] = stock.get((sku, row_hub), 0) + delta
+    return sorted((sku, row_hub, qty) for (sku, row_hub), qty in stock.items() if qty)
+
+# --- RECONCILIATION ---
+
+# Logged with the signed correction in qty whenever reconcile_inventory
+# brings inventory back in line with the ledger. It is not in
+# MOVEMENT_DIRECTIONS: the ledger already holds the stock it restores, so
+# replays give it a sign of 0. A snapshot taken before the correction holds
+# the drifted stock instead, so apply_reconciliation takes a fresh snapshot
+# in the same transaction; stock_as_of from then on starts from it.
+RECONCILE_ACTION = "RECONCILE"
+RECONCILE_CHUNK_ROWS = 500_000
+RECONCILE_COLUMNS = ["sku", "hub", "expected", "actual", "difference", "in_catalog"]
+
+def _ledger_totals(conn, source, hub=None, chunk_rows=RECONCILE_CHUNK_ROWS):
+    """Sum one logs table per (sku, hub, action), one chunk of rows at a time."""
+    cur = conn.execute(f"""
+        SELECT sku, hub, action, qty FROM {source}.logs {"WHERE hub = ?" if hub else ""}
+    """, (hub,) if hub else ())
+    parts = []
+    while rows := cur.fetchmany(chunk_rows):
+        chunk = pd.DataFrame(rows, columns=["sku", "hub", "action", "qty"])
+        parts.append(chunk.groupby(["sku", "hub", "action"], sort=False)["qty"].sum())
+    return parts
+
+def _read_ledger(conn, hub=None, chunk_rows=RECONCILE_CHUNK_ROWS):
+    """Return (per-action ledger sums, inventory) read in step with each other.
+
+    Archives are read first, since ATTACH is not allowed inside a
+    transaction; the hot logs and inventory then come from one read
+    transaction. If archive_logs moved a month in between, read again.
+    """
+    for _ in range(3):
+        months = archived_months()
+        parts = []
+        with contextlib.closing(_log_sources(conn, "0000-01-01")) as sources:
+            for source in sources:
+                if source != "main":
+                    parts += _ledger_totals(conn, source, hub, chunk_rows)
+        conn.execute("BEGIN")
+        try:
+            parts += _ledger_totals(conn, "main", hub, chunk_rows)
+            inventory = conn.execute(f"""
+                SELECT sku, hub, quantity FROM inventory {"WHERE hub = ?" if hub else ""}
+            """, (hub,) if hub else ()).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        if archived_months() == months:
+            return parts, inventory
+    raise RuntimeError("Logs kept being archived during reconciliation; try again.")
+
+def reconcile_inventory(hub=None, chunk_rows=RECONCILE_CHUNK_ROWS):
+    """Rebuild stock from the full logs ledger and diff it against inventory.
+
+    Returns a DataFrame with RECONCILE_COLUMNS, one row per (sku, hub)
+    where the two disagree; difference is expected - actual. Archived
+    months are included, and actions outside MOVEMENT_DIRECTIONS (messages,
+    RECONCILE) count for nothing.
+    """
+    parts, inventory = _read_ledger(get_conn(), hub, chunk_rows)
+    if parts:
+        by_action = pd.concat(parts).groupby(level=[0, 1, 2], sort=False).sum()
+        signs = by_action.index.get_level_values("action").map(MOVEMENT_DIRECTIONS)
+        expected = (by_action * pd.Series(signs, index=by_action.index).fillna(0)).groupby(level=[0, 1]).sum()
+    else:
+        expected = pd.Series(dtype="int64", index=pd.MultiIndex.from_tuples([], names=["sku", "hub"]))
+    actual = pd.DataFrame(inventory, columns=["sku", "hub", "actual"]).set_index(["sku", "hub"])["actual"]
+
+    report = pd.concat([expected.rename("expected"), actual], axis=1).fillna(0).astype("int64")
+    report["difference"] = report["expected"] - report["actual"]
+    report = report[report["difference"] != 0].reset_index()
+    catalog = {sku for sku, _, _ in get_all_sku_info()}
+    report["in_catalog"] = report["sku"].isin(catalog)
+    return report.sort_values(["hub", "sku"], ignore_index=True)[RECONCILE_COLUMNS]
+
+@writes("inventory", "logs", "inventory_snapshots")
+def apply_reconciliation(report, username="reconcile", include_unknown=False):
+    """Move inventory by each report row's difference and log it as RECONCILE.
+
+    Corrections are deltas, so movements recorded after the report was
+    built are kept. An inventory snapshot is taken in the same transaction. Rows whose ledger total is negative are skipped: the
+    ledger is missing receipts there, which needs a stock count rather
+    than a correction. SKUs no longer in sku_info are skipped unless
+    include_unknown is set. Returns the number of rows corrected.
+    """
+    report = report[report["expected"] >= 0]
+    if not include_unknown:
+        report = report[report["in_catalog"]]
+    rows = [(sku, hub, int(expected), int(actual), int(difference))
+            for sku, hub, expected, actual, difference in report[["sku", "hub", "expected", "actual", "difference"]].itertuples(index=False)]
+    return _queued(("inventory", "logs", "inventory_snapshots"), _apply_reconciliation, (rows, username), True)
+
+def _apply_reconciliation(conn, rows, username):
+    conn.executemany("""
+        INSERT INTO inventory (sku, hub, quantity) VALUES (?, ?, ?)
+        ON CONFLICT(sku, hub) DO UPDATE SET quantity = quantity + excluded.quantity
+    """, [(sku, hub, difference) for sku, hub, _, _, difference in rows])
+    conn.executemany("""
+        INSERT INTO logs (username, sku, hub, action, qty, comment)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(username, sku, hub, RECONCILE_ACTION, difference, f"Ledger reconciliation: {actual} -> {expected}")
+          for sku, hub, expected, actual, difference in rows])
+    if rows:
+        _take_inventory_snapshot(conn)
+    return len(rows)
+
+# --- DEMAND VELOCITY ---
+
+# Demand is stock leaving a hub to customers; admin removals and
+# reconciliation corrections are not consumption.
+DEMAND_ACTIONS = ("OUT",)
+VELOCITY_WINDOWS = (7, 30, 90)
+COVER_WINDOW_DAYS = 30
+VELOCITY_COLUMNS = ["sku", "hub", "quantity", "out_7d", "out_30d", "out_90d", "per_day", "days_of_cover"]
+
+def create_sku_velocity(conn):
+    """Create the demand tables and build them from the last 90 days of logs.
+
+    sku_daily_demand holds demand per (hub, sku, day) for the longest
+    window, sku_velocity the 7/30/90-day totals derived from it, and
+    velocity_state the newest log id and the day both are current to.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sku_daily_demand (
+        hub TEXT NOT NULL,
+        sku TEXT NOT NULL,
+        day TEXT NOT NULL,
+        qty INTEGER NOT NULL,
+        PRIMARY KEY (hub, sku, day)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sku_velocity (
+        hub TEXT NOT NULL,
+        sku TEXT NOT NULL,
+        out_7d INTEGER NOT NULL,
+        out_30d INTEGER NOT NULL,
+        out_90d INTEGER NOT NULL,
+        PRIMARY KEY (hub, sku)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS velocity_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_log_id INTEGER NOT NULL,
+        as_of TEXT NOT NULL
+    )
+    """)
+    _rebuild_velocity(conn)
+
+def _demand_cutoff(today):
+    return str((pd.Timestamp(today) - pd.Timedelta(days=max(VELOCITY_WINDOWS) - 1)).date())
+
+def _daily_demand(rows):
+    """Sum (hub, sku, day, qty) demand rows per (hub, sku, day)."""
+    df = pd.DataFrame(rows, columns=["hub", "sku", "day", "qty"])
+    return df.groupby(["hub", "sku", "day"], sort=False)["qty"].sum().reset_index()
+
+def _window_totals(daily, today):
+    """Per (hub, sku) demand in each trailing window ending on `today`, from daily rows."""
+    age = (pd.Timestamp(today) - pd.to_datetime(daily["day"])).dt.days
+    windows = pd.DataFrame({f"out_{days}d": daily["qty"].where(age < days, 0) for days in VELOCITY_WINDOWS})
+    return windows.groupby([daily["hub"], daily["sku"]]).sum().reset_index()
+
+def _set_velocity_state(conn, last_log_id, today):
+    conn.execute("""
+        INSERT INTO velocity_state (id, last_log_id, as_of) VALUES (1, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET last_log_id = excluded.last_log_id, as_of = excluded.as_of
+    """, (last_log_id, today))
+
+def _recompute_velocity(conn, today):
+    """Drop days that left the longest window and rederive every window total."""
+    conn.execute("DELETE FROM sku_daily_demand WHERE day < ?", (_demand_cutoff(today),))
+    daily = pd.DataFrame(conn.execute("SELECT hub, sku, day, qty FROM sku_daily_demand").fetchall(),
+                         columns=["hub", "sku", "day", "qty"])
+    totals = _window_totals(daily, today)
+    conn.execute("DELETE FROM sku_velocity")
+    conn.executemany("INSERT INTO sku_velocity (hub, sku, out_7d, out_30d, out_90d) VALUES (?, ?, ?, ?, ?)",
+                     totals.itertuples(index=False))
+
+def _rebuild_velocity(conn):
+    today = conn.execute("SELECT date('now')").fetchone()[0]
+    last_log_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+    rows = conn.execute(f"""
+        SELECT hub, sku, substr(timestamp, 1, 10), qty FROM logs
+        WHERE action IN ({", ".join("?" * len(DEMAND_ACTIONS))}) AND timestamp >= ? AND id <= ?
+    """, (*DEMAND_ACTIONS, _demand_cutoff(today), last_log_id)).fetchall()
+    conn.execute("DELETE FROM sku_daily_demand")
+    conn.executemany("INSERT INTO sku_daily_demand (hub, sku, day, qty) VALUES (?, ?, ?, ?)",
+                     _daily_demand(rows).itertuples(index=False))
+    _recompute_velocity(conn, today)
+    _set_velocity_state(conn, last_log_id, today)
+
+@writes("sku_velocity")
+def rebuild_velocity():
+    """Rebuild the demand tables from logs; returns the number of (hub, sku) rows."""
+    conn = get_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_velocity(conn)
+        return conn.execute("SELECT COUNT(*) FROM sku_velocity").fetchone()[0]
+
+def refresh_velocity():
+    """Fold log rows written since the last refresh into the demand tables.
+
+    Only rows with an id past velocity_state.last_log_id are read, and their
+    totals are added to the windows they fall in. The windows are rederived
+    from sku_daily_demand only when the day has changed since the last
+    refresh. With nothing new this is two indexed reads and no write, and
+    cached get_velocity results are only invalidated when sku_velocity
+    actually changed, so dashboards can call this on every render.
+    Returns the number of new demand rows.
+    """
+    conn = get_conn()
+    state = conn.execute("SELECT last_log_id, as_of, date('now'), (SELECT MAX(id) FROM logs) FROM velocity_state WHERE id = 1").fetchone()
+    if state and state[0] == (state[3] or 0) and state[1] == state[2]:
+        return 0
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        last_log_id, as_of, today, max_id = conn.execute(
+            "SELECT last_log_id, as_of, date('now'), COALESCE((SELECT MAX(id) FROM logs), 0) FROM velocity_state WHERE id = 1"
+        ).fetchone()
+        rows = conn.execute(f"""
+            SELECT hub, sku, substr(timestamp, 1, 10), qty FROM logs
+            WHERE id > ? AND id <= ? AND action IN ({", ".join("?" * len(DEMAND_ACTIONS))})
+        """, (last_log_id, max_id, *DEMAND_ACTIONS)).fetchall()
+        new = _daily_demand(rows)
+        new = new[new["day"] >= _demand_cutoff(today)]
+        changed = len(new) > 0 or as_of != today
+        conn.executemany("""
+            INSERT INTO sku_daily_demand (hub, sku, day, qty) VALUES (?, ?, ?, ?)
+            ON CONFLICT(hub, sku, day) DO UPDATE SET qty = qty + excluded.qty
+        """, new.itertuples(index=False))
+        if as_of != today:
+            _recompute_velocity(conn, today)
+        else:
+            conn.executemany("""
+                INSERT INTO sku_velocity (hub, sku, out_7d, out_30d, out_90d) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(hub, sku) DO UPDATE SET out_7d = out_7d + excluded.out_7d,
+                    out_30d = out_30d + excluded.out_30d, out_90d = out_90d + excluded.out_90d
+            """, _window_totals(new, today).itertuples(index=False))
+        _set_velocity_state(conn, max_id, today)
+    if changed:
+        invalidate("sku_velocity")
+    return len(rows)
+
+@cached("sku_velocity", "inventory")
+def get_velocity(hub=None):
+    """Return VELOCITY_COLUMNS rows for SKUs with demand in the last 90 days, lowest days of cover first.
+
+    per_day is the 30-day demand rate; days_of_cover is on-hand stock over
+    that rate, or None when nothing sold in the last 30 days.
+    """
+    with get_conn() as conn:
+        rows = conn.execute(f"""
+            SELECT v.sku, v.hub, COALESCE(i.quantity, 0), v.out_7d, v.out_30d, v.out_90d
+            FROM sku_velocity v
+            LEFT JOIN inventory i ON i.sku = v.sku AND i.hub = v.hub
+            {"WHERE v.hub = ?" if hub else ""}
+        """, (hub,) if hub else ()).fetchall()
+    result = []
+    for sku, row_hub, quantity, out_7d, out_30d, out_90d in rows:
+        per_day = out_30d / COVER_WINDOW_DAYS
+        cover = round(max(quantity, 0) / per_day, 1) if per_day else None
+        result.append((sku, row_hub, quantity, out_7d, out_30d, out_90d, round(per_day, 2), cover))
+    result.sort(key=lambda row: (row[7] is None, row[7] if row[7] is not None else 0, -row[4]))
+    return result
+
+@cached("logs", "log_rollups")
+def get_daily_demand(hub, start_date, end_date=None):
+    """[(day, sku, qty)] demand at hub per day from the hourly rollups, which keep archived months."""
+    clauses = ["hub = ?", f"action IN ({', '.join('?' * len(DEMAND_ACTIONS))})", "bucket >= ?"]
+    params = [hub, *DEMAND_ACTIONS, str(start_date)]
+    if end_date:
+        clauses.append("bucket < date(?, '+1 day')")
+        params.append(str(end_date))
+    with get_conn() as conn:
+        return conn.execute(f"""
+        SELECT substr(bucket, 1, 10) AS day, sku, SUM(qty)
+        FROM log_rollups
+        WHERE {" AND ".join(clauses)}
+        GROUP BY day, sku
+        """, params).fetchall()
+
+@cached("shipments")
+def get_shipment_lead_times(hub=None):
+    """[(hub, days)] from the day each shipment was recorded to its ship_date, one row per tracking number."""
+    with get_conn() as conn:
+        return conn.execute(f"""
+        SELECT hub, julianday(ship_date) - julianday(date(MIN(timestamp)))
+        FROM shipments
+        {"WHERE hub = ?" if hub else ""}
+        GROUP BY hub, tracking, ship_date
+        """, (hub,) if hub else ()).fetchall()
+
+# --- SHIPMENTS ---
+
+@writes("shipments")
+def record_shipment(supplier, tracking, carrier, ship_date, hub, sku, qty, wait=True):
+    """Record one shipment line; returns its id, or a Future for it with wait=False."""
+    return _queued(("shipments",), _record_shipment, (supplier, tracking, carrier, ship_date, hub, sku, qty), wait)
+
+def _record_shipment(conn, supplier, tracking, carrier, ship_date, hub, sku, qty):
+    return conn.execute("""
+    INSERT INTO shipments (supplier, tracking, carrier, ship_date, hub, sku, qty)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (supplier, tracking, carrier, ship_date, hub, sku, qty)).lastrowid
+
+class UnknownSkuError(ValueError):
+    def __init__(self, skus):
+        shown = ", ".join(skus[:10]) + (f" (+{len(skus) - 10} more)" if len(skus) > 10 else "")
+        super().__init__(f"Unknown SKU(s): {shown}")
+        self.skus = skus
+
+def _unknown_skus(conn, skus):
+    return [row[0] for row in conn.execute("""
+        SELECT j.value FROM json_each(?) j
+        WHERE NOT EXISTS (SELECT 1 FROM sku_info i WHERE i.sku = j.value)
+    """, (json.dumps(list(dict.fromkeys(skus))),)).fetchall()]
+
+@cached("sku_info")
+def find_unknown_skus(skus):
+    """Return the SKUs (in any iterable) that are not in sku_info, in one query."""
+    return _unknown_skus(get_conn(), skus)
+
+@writes("shipments", "inventory", "logs")
+def record_shipment_batch(supplier, tracking, carrier, ship_date, hub, lines, receive=True, wait=True):
+    """Record a shipment header plus any number of (sku, qty) lines in one transaction.
+
+    Every SKU must exist in sku_info, otherwise UnknownSkuError is raised and
+    nothing is written. With receive=True the lines are also added to the
+    hub's inventory and logged as SUPPLIER-IN movements. Returns the line
+    count, or a Future for it with wait=False.
+    """
+    lines = [(str(sku), int(qty)) for sku, qty in lines]
+    if not lines:
+        raise ValueError("A shipment needs at least one line.")
+    return _queued(("shipments", "inventory", "logs"), _record_shipment_batch,
+                   (supplier, tracking, carrier, ship_date, hub, lines, receive), wait)
+
+def _record_shipment_batch(conn, supplier, tracking, carrier, ship_date, hub, lines, receive):
+    unknown = _unknown_skus(conn, [sku for sku, _ in lines])
+    if unknown:
+        raise UnknownSkuError(unknown)
+    conn.executemany("""
+    INSERT INTO shipments (supplier, tracking, carrier, ship_date, hub, sku, qty)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(supplier, tracking, carrier, str(ship_date), hub, sku, qty) for sku, qty in lines])
+    if receive:
+        comment = f"Tracking: {tracking}, Carrier: {carrier}, Date: {ship_date}"
+        _write_movements(conn, [(supplier, sku, hub, "SUPPLIER-IN", qty, comment) for sku, qty in lines])
+    return len(lines)
+
+MANIFEST_QTY_COLUMNS = ("Qty", "Quantity")
+
+def parse_shipment_manifest(csv_source):
+    """Read a manifest CSV (SKU + Qty/Quantity columns) into shipment lines.
+
+    Repeated SKUs are summed. Returns a dict with the aggregated `lines`,
+    the number of `rejected` rows (blank SKU or non-positive/invalid qty)
+    and the `unknown` SKUs that are not in sku_info.
+    """
+    if hasattr(csv_source, "seek"):
+        csv_source.seek(0)
+    df = pd.read_csv(csv_source, dtype=str, keep_default_na=False)
+    df = df.rename(columns=lambda c: str(c).strip())
+    qty_col = next((c for c in MANIFEST_QTY_COLUMNS if c in df.columns), None)
+    if "SKU" not in df.columns or qty_col is None:
+        raise ValueError("Manifest CSV needs a `SKU` column and a `Qty` (or `Quantity`) column.")
+
+    skus = df["SKU"].str.strip()  # catalog SKUs are case-sensitive, see _normalize_sku_chunk
+    qtys = pd.to_numeric(df[qty_col].str.strip(), errors="coerce")
+    valid = (skus != "") & (qtys > 0) & (qtys == qtys.round())
+    totals = qtys[valid].astype(int).groupby(skus[valid], sort=False).sum()
+    lines = list(zip(totals.index, totals.astype(int).tolist()))
+    return {
+        "lines": lines,
+        "rejected": int((~valid).sum()),
+        "unknown": find_unknown_skus(tuple(totals.index)),
+    }
+
+@cached("shipments")
 def get_shipments_for_hub(hub):
     with get_conn() as conn:
         return conn.execute("""
@@ -128,38 +1944,58 @@ def get_shipments_for_hub(hub):
         ORDER BY timestamp DESC
         """, (hub,)).fetchall()
 
-def get_all_shipments(start_date=None, end_date=None, hub=None):
-    conn = get_conn()
-    query = """
-        SELECT timestamp, supplier, tracking, carrier, ship_date, sku, qty
-        FROM shipments
-        WHERE 1=1
-    """
+def _shipment_filters(start_date=None, end_date=None, hub=None, supplier=None):
+    query = " WHERE 1=1"
     params = []
     if start_date:
         query += " AND date(ship_date) >= ?"
-        params.append(start_date)
+        params.append(str(start_date))
     if end_date:
         query += " AND date(ship_date) <= ?"
-        params.append(end_date)
+        params.append(str(end_date))
     if hub:
         query += " AND hub = ?"
         params.append(hub)
-    query += " ORDER BY timestamp DESC"
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
-    return rows
+    if supplier:
+        query += " AND supplier = ?"
+        params.append(supplier)
+    return query, params
+
+@cached("shipments")
+def get_all_shipments(start_date=None, end_date=None, hub=None, supplier=None):
+    conn = get_conn()
+    where, params = _shipment_filters(start_date, end_date, hub, supplier)
+    query = """
+        SELECT timestamp, supplier, tracking, carrier, ship_date, sku, qty
+        FROM shipments
+    """ + where + " ORDER BY timestamp DESC"
+    return conn.execute(query, params).fetchall()
+
+SHIPMENT_EXPORT_COLUMNS = ["timestamp", "supplier", "tracking", "carrier", "ship_date", "hub", "sku", "qty"]
+
+def iter_shipments(batch_size=5000, start_date=None, end_date=None, hub=None, supplier=None):
+    """Yield shipments newest first in lists of at most batch_size rows."""
+    where, params = _shipment_filters(start_date, end_date, hub, supplier)
+    cur = get_conn().execute("""
+        SELECT timestamp, supplier, tracking, carrier, ship_date, hub, sku, qty
+        FROM shipments
+    """ + where + " ORDER BY timestamp DESC", params)
+    while batch := cur.fetchmany(batch_size):
+        yield batch
 
 # --- USERS ---
 
+@writes("users")
 def reset_password(username, new_hashed_pw):
     with get_conn() as conn:
         conn.execute("UPDATE users SET password=? WHERE username=?", (new_hashed_pw, username))
 
+@cached("users")
 def get_all_users():
     with get_conn() as conn:
         return conn.execute("SELECT username, role, hubs FROM users").fetchall()
 
+@writes("users")
 def add_user(username, password_hash, role, hubs):
     with get_conn() as conn:
         conn.execute("""
@@ -167,63 +2003,323 @@ def add_user(username, password_hash, role, hubs):
         VALUES (?, ?, ?, ?)
         """, (username, password_hash, role, hubs))
 
+@writes("users")
 def delete_user(username):
     with get_conn() as conn:
         conn.execute("DELETE FROM users WHERE username=?", (username,))
 
+@cached("sku_info")
 def get_all_sku_info():
     with get_conn() as conn:
         return conn.execute("SELECT sku, name, barcode FROM sku_info ORDER BY name").fetchall()
 
+@cached("sku_info")
+def get_sku(sku):
+    """Return (sku, name, barcode) for one SKU, or None."""
+    with get_conn() as conn:
+        return conn.execute("SELECT sku, name, barcode FROM sku_info WHERE sku = ?", (sku,)).fetchone()
+
+@cached("inventory")
+def get_sku_stock(sku):
+    """Return [(hub, quantity)] for one SKU across every hub that holds a row for it."""
+    with get_conn() as conn:
+        return conn.execute("SELECT hub, quantity FROM inventory WHERE sku = ? ORDER BY hub", (sku,)).fetchall()
+
+def check_barcodes():
+    """Return [(barcode, "SKU-A,SKU-B", count)] for every barcode shared by more than one SKU.
+
+    Scanning needs barcodes unique; while duplicates remain the barcode index
+    is created without UNIQUE. Once none are left, this makes it UNIQUE.
+    """
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        duplicates = _duplicate_barcodes(conn)
+        unique = any(row[1] == "idx_sku_info_barcode" and row[2] for row in conn.execute("PRAGMA index_list(sku_info)"))
+        if not duplicates and not unique:
+            rebuild_barcode_index(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return duplicates
+
+@cached("sku_info")
+def get_sku_by_barcode(barcode):
+    """Return (sku, name) for a scanned barcode, or None if it is not in the catalog."""
+    barcode = str(barcode).strip()
+    if not barcode:
+        return None
+    with get_conn() as conn:
+        return conn.execute("""
+            SELECT sku, name FROM sku_info WHERE barcode = ? AND barcode IS NOT NULL
+        """, (barcode,)).fetchone()
+
+
+# --- MESSAGES ---
+
+# Hub managers write TO_ADMIN; admin replies go TO_HUB (optionally to one user).
+TO_ADMIN = "TO_ADMIN"
+TO_HUB = "TO_HUB"
+MESSAGE_COLUMNS = ["id", "thread_id", "timestamp", "sender", "hub", "recipient", "subject", "body", "is_read"]
+
+@writes("messages")
+def send_message(sender, hub, direction, subject, body, thread_id=None, recipient=None):
+    with get_conn() as conn:
+        cur = conn.execute("""
+        INSERT INTO messages (thread_id, sender, hub, direction, recipient, subject, body)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (thread_id, sender, hub, direction, recipient, subject, body))
+        message_id = cur.lastrowid
+        if thread_id is None:
+            conn.execute("UPDATE messages SET thread_id=? WHERE id=?", (message_id, message_id))
+    return message_id
+
+@cached("messages")
+def get_inbox(direction, hub=None, limit=200):
+    query = """
+        SELECT id, thread_id, timestamp, sender, hub, recipient, subject, body, is_read
+        FROM messages
+        WHERE direction = ?
+    """
+    params = [direction]
+    if hub:
+        query += " AND hub = ?"
+        params.append(hub)
+    query += " ORDER BY timestamp DESC LIMIT ?"
+    params.append(limit)
+    with get_conn() as conn:
+        return conn.execute(query, params).fetchall()
+
+def get_admin_inbox(hub=None, limit=200):
+    return get_inbox(TO_ADMIN, hub, limit)
+
+def get_hub_inbox(hub, limit=200):
+    return get_inbox(TO_HUB, hub, limit)
+
+@cached("messages")
+def count_unread_messages(direction, hub=None):
+    query = "SELECT COUNT(*) FROM messages WHERE direction = ? AND is_read = 0"
+    params = [direction]
+    if hub:
+        query += " AND hub = ?"
+        params.append(hub)
+    with get_conn() as conn:
+        return conn.execute(query, params).fetchone()[0]
+
+@cached("messages")
+def get_thread(thread_id):
+    with get_conn() as conn:
+        return conn.execute("""
+        SELECT id, thread_id, timestamp, sender, hub, recipient, subject, body, is_read
+        FROM messages
+        WHERE thread_id = ?
+        ORDER BY id
+        """, (thread_id,)).fetchall()
+
+@writes("messages")
+def mark_thread_read(thread_id, direction):
+    with get_conn() as conn:
+        conn.execute("UPDATE messages SET is_read = 1 WHERE thread_id = ? AND direction = ? AND is_read = 0", (thread_id, direction))
+
+@writes("messages")
+def mark_all_read(direction, hub=None):
+    query = "UPDATE messages SET is_read = 1 WHERE direction = ? AND is_read = 0"
+    params = [direction]
+    if hub:
+        query += " AND hub = ?"
+        params.append(hub)
+    with get_conn() as conn:
+        conn.execute(query, params)
+
+def _split_legacy_message(action, comment):
+    """Best-effort (recipient, subject, body) from an old MESSAGE/REPLY log comment."""
+    comment = comment or ""
+    recipient = None
+    if action == "REPLY" and comment.startswith("REPLY TO ") and " // " in comment:
+        header, comment = comment.split(" // ", 1)
+        recipient = header[len("REPLY TO "):].split(" @ ")[0].strip() or None
+    subject = ""
+    if comment.startswith(("SUBJECT:", "RE:")) and " // " in comment:
+        subject, comment = comment.split(" // ", 1)
+        subject = subject.replace("SUBJECT:", "", 1).strip()
+    return recipient, subject, comment.strip()
+
+def migrate_log_messages(conn):
+    """Move MESSAGE/REPLY rows out of logs into messages.
+
+    Runs once as a schema migration; once the rows are moved there is
+    nothing left to pick up, so a repeat call is a single index lookup. Migrated messages are
+    marked read, since the old screens had no read state to carry over.
+    """
+    rows = conn.execute("""
+        SELECT id, username, hub, action, comment, timestamp
+        FROM logs
+        WHERE action IN ('MESSAGE', 'REPLY')
+        ORDER BY id
+    """).fetchall()
+    if not rows:
+        return 0
+    for log_id, username, hub, action, comment, timestamp in rows:
+        recipient, subject, body = _split_legacy_message(action, comment)
+        direction = TO_ADMIN if action == "MESSAGE" else TO_HUB
+        cur = conn.execute("""
+            INSERT INTO messages (sender, hub, direction, recipient, subject, body, is_read, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+        """, (username, hub or "", direction, recipient, subject, body, timestamp))
+        conn.execute("UPDATE messages SET thread_id=? WHERE id=?", (cur.lastrowid, cur.lastrowid))
+    conn.execute("DELETE FROM logs WHERE action IN ('MESSAGE', 'REPLY')")
+    return len(rows)
 
 # --- WAREHOUSES ---
 
+DEFAULT_WAREHOUSES = [
+    ("HUB1", "Hub 1 - Stafford, VA", "2142 Richmond Hwy Ste 103, Stafford, VA 22554", "Kevin Mornot (+1)5404973359", "Open", "United States"),
+    ("HUB2", "Hub 2 - Hartford, CT", "12 Charter Oak Pl, Hartford, CT 06106", "Customer Service (+1)5714122402", "Open", "United States"),
+    ("HUB3", "Hub 3 - Cali", "3600 Sisk Rd Bldg 5 Ste 9, Modesto, CA 95356", "Customer Service (+1)5714122402", "Open", "United States"),
+    ("RETAIL", "Retail - Woodbridge, VA", "3062 Ps Business Center Dr, Woodbridge, VA 22192", "Customer Service (+1)5714122402", "Open", "United States"),
+]
+
+def _seed_default_warehouses(conn):
+    conn.executemany("INSERT OR IGNORE INTO warehouses (code, name, address, contact, status, region) VALUES (?, ?, ?, ?, ?, ?)",
+                     DEFAULT_WAREHOUSES)
+
+@writes("warehouses")
 def seed_warehouses():
-    hubs = [
-        ("HUB1", "Hub 1 - Stafford, VA", "2142 Richmond Hwy Ste 103, Stafford, VA 22554", "Kevin Mornot (+1)5404973359", "Open", "United States"),
-        ("HUB2", "Hub 2 - Hartford, CT", "12 Charter Oak Pl, Hartford, CT 06106", "Customer Service (+1)5714122402", "Open", "United States"),
-        ("HUB3", "Hub 3 - Cali", "3600 Sisk Rd Bldg 5 Ste 9, Modesto, CA 95356", "Customer Service (+1)5714122402", "Open", "United States"),
-        ("RETAIL", "Retail - Woodbridge, VA", "3062 Ps Business Center Dr, Woodbridge, VA 22192", "Customer Service (+1)5714122402", "Open", "United States"),
-    ]
     with get_conn() as conn:
-        for hub in hubs:
-            conn.execute("INSERT OR IGNORE INTO warehouses (code, name, address, contact, status, region) VALUES (?, ?, ?, ?, ?, ?)", hub)
+        _seed_default_warehouses(conn)
+
+@writes("warehouses")
+def update_warehouse(code, address, contact, status, region):
+    with get_conn() as conn:
+        conn.execute("""
+            UPDATE warehouses
+            SET address=?, contact=?, status=?, region=?
+            WHERE code=?
+        """, (address, contact, status, region, code))
 
+@cached("warehouses")
 def get_all_warehouses():
     with get_conn() as conn:
         return conn.execute("SELECT code, name, address, contact, status, region FROM warehouses").fetchall()
 
 # --- SKU SEEDING ---
-def seed_skus():
-    data = pd.read_csv("Master_Updated_Barcode_Inventory.csv")
-    with get_conn() as conn:
-        for i, row in data.iterrows():
-            conn.execute("INSERT OR IGNORE INTO sku_info (sku, name, barcode) VALUES (?, ?, ?)", (row["SKU"], row["Product Name"], row["Barcode Number"]))
 
-import pandas as pd
+SKU_CATALOG_CSV = "Master_Updated_Barcode_Inventory.csv"
+SKU_IMPORT_CHUNK_ROWS = 5000
+# Supplier catalogs name the barcode column either way.
+SKU_BARCODE_COLUMNS = ("Barcode", "Barcode Number")
+SKU_IMPORT_SAMPLE_COLUMNS = ["status", "sku", "name", "barcode", "current_name", "current_barcode"]
+
+def _normalize_sku_chunk(chunk):
+    """Return (rows, rejected) for one CSV chunk read with dtype=str."""
+    chunk = chunk.rename(columns=lambda c: str(c).strip())
+    missing = [c for c in ("SKU", "Product Name") if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"SKU CSV is missing column(s): {', '.join(missing)}")
+    barcode_col = next((c for c in SKU_BARCODE_COLUMNS if c in chunk.columns), None)
+
+    skus = chunk["SKU"].fillna("").str.strip()
+    names = chunk["Product Name"].fillna("").str.strip()
+    barcodes = chunk[barcode_col].fillna("").str.strip() if barcode_col else pd.Series("", index=chunk.index)
+    valid = (skus != "") & (names != "")
+    rows = list(zip(skus[valid], names[valid], barcodes[valid].replace("", None)))
+    return rows, int((~valid).sum())
 
-def seed_skus(csv_path="Master_Updated_Barcode_Inventory.csv"):
+def import_sku_catalog(csv_source=SKU_CATALOG_CSV, dry_run=False, chunksize=SKU_IMPORT_CHUNK_ROWS, sample_size=50):
+    """Load a SKU catalog CSV into sku_info and report what changed.
+
+    The file is streamed in chunks; each chunk is validated and bulk-loaded
+    into a temp staging table, then diffed against sku_info in SQL. With
+    dry_run=True the diff is reported and everything is rolled back.
+    Returns a summary dict with new/changed/unchanged/rejected counts and a
+    sample of the new and changed rows.
+    """
+    if hasattr(csv_source, "seek"):
+        csv_source.seek(0)
+    summary = {"staged": 0, "rejected": 0, "committed": False}
+    conn = get_conn()
     try:
-        df = pd.read_csv(csv_path)
-        with get_conn() as conn:
-            conn.execute("""
-            CREATE TABLE IF NOT EXISTS sku_info (
-                sku TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                barcode TEXT
+        conn.execute("BEGIN" if dry_run else "BEGIN IMMEDIATE")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS sku_import_staging (sku TEXT PRIMARY KEY, name TEXT NOT NULL, barcode TEXT)")
+        conn.execute("CREATE INDEX IF NOT EXISTS temp.idx_sku_import_staging_barcode ON sku_import_staging (barcode)")
+        conn.execute("DELETE FROM temp.sku_import_staging")
+        for chunk in pd.read_csv(csv_source, chunksize=chunksize, dtype=str, keep_default_na=False):
+            rows, rejected = _normalize_sku_chunk(chunk)
+            conn.executemany("INSERT OR REPLACE INTO temp.sku_import_staging (sku, name, barcode) VALUES (?, ?, ?)", rows)
+            summary["staged"] += len(rows)
+            summary["rejected"] += rejected
+
+        diff_sql = """
+            SELECT CASE
+                       WHEN i.sku IS NULL THEN 'new'
+                       WHEN i.name IS NOT s.name OR i.barcode IS NOT s.barcode THEN 'changed'
+                       ELSE 'unchanged'
+                   END AS status,
+                   s.sku, s.name, s.barcode, i.name, i.barcode
+            FROM temp.sku_import_staging s
+            LEFT JOIN sku_info i ON i.sku = s.sku
+        """
+        counts = dict(conn.execute(f"SELECT status, COUNT(*) FROM ({diff_sql}) GROUP BY status").fetchall())
+        for status in ("new", "changed", "unchanged"):
+            summary[status] = counts.get(status, 0)
+        summary["samples"] = conn.execute(
+            f"SELECT * FROM ({diff_sql}) WHERE status != 'unchanged' LIMIT ?", (sample_size,)
+        ).fetchall()
+        # Barcodes must stay unique for scanning: within the file, and against SKUs the file doesn't touch.
+        summary["barcode_conflicts"] = [row[0] for row in conn.execute("""
+            SELECT s.barcode FROM temp.sku_import_staging s
+            WHERE s.barcode IS NOT NULL AND (
+                EXISTS (SELECT 1 FROM temp.sku_import_staging o WHERE o.barcode = s.barcode AND o.sku != s.sku)
+                OR EXISTS (
+                    SELECT 1 FROM sku_info i
+                    WHERE i.barcode = s.barcode AND i.sku != s.sku
+                      AND NOT EXISTS (SELECT 1 FROM temp.sku_import_staging r WHERE r.sku = i.sku)
+                )
+            )
+            GROUP BY s.barcode
+            LIMIT ?
+        """, (sample_size,)).fetchall()]
+
+        if dry_run:
+            conn.rollback()
+            return summary
+        if summary["barcode_conflicts"]:
+            raise ValueError(f"Barcode(s) used by more than one SKU: {', '.join(summary['barcode_conflicts'][:10])}")
+        # The unique index is checked row by row, so two SKUs swapping barcodes
+        # would collide halfway through the upsert; release the old ones first.
+        conn.execute("""
+            UPDATE sku_info SET barcode = NULL
+            WHERE barcode IS NOT NULL AND EXISTS (
+                SELECT 1 FROM temp.sku_import_staging s WHERE s.sku = sku_info.sku AND s.barcode IS NOT sku_info.barcode
             )
-            """)
-            for _, row in df.iterrows():
-                conn.execute("""
-                    INSERT OR REPLACE INTO sku_info (sku, name, barcode)
-                    VALUES (?, ?, ?)
-                """, (row["SKU"], row["Product Name"], str(row["Barcode"])))
-        print("✅ SKUs seeded from CSV.")
+        """)
+        conn.execute("""
+            INSERT INTO sku_info (sku, name, barcode)
+            SELECT sku, name, barcode FROM temp.sku_import_staging WHERE true
+            ON CONFLICT(sku) DO UPDATE SET name = excluded.name, barcode = excluded.barcode
+            WHERE sku_info.name IS NOT excluded.name OR sku_info.barcode IS NOT excluded.barcode
+        """)
+        conn.execute("DELETE FROM temp.sku_import_staging")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate("sku_info")
+    summary["committed"] = True
+    return summary
+
+def seed_skus(csv_path=SKU_CATALOG_CSV):
+    try:
+        summary = import_sku_catalog(csv_path)
+        print(f"✅ SKUs seeded from CSV: {summary['new']} new, {summary['changed']} changed, "
+              f"{summary['unchanged']} unchanged, {summary['rejected']} rejected.")
     except FileNotFoundError:
         print(f"❌ CSV file not found at path: {csv_path}")
     except Exception as e:
         print(f"❌ Error while seeding SKUs: {e}")
-        
+
+@writes("inventory", "sku_info")
 def clean_junk_skus():
     junk = ["ADFD", "ADAFD", "ADDFD", "TEST", "BLACK-WHITE", "BLACKWHITE", "RAINBOW", "HOT-PINK"]
     with get_conn() as conn:
@@ -233,12 +2329,201 @@ def clean_junk_skus():
     print(f"✅ Removed {len(junk)} junk/test SKUs.")
 
 
+# --- SCHEMA MIGRATIONS ---
+
+# Ordered, append-only: each step runs exactly once per database, in its own
+# transaction, and is recorded in schema_version. Never edit or renumber a
+# shipped step; add a new one. Steps 1-6 must stay idempotent because
+# databases created before schema_version existed replay them all once.
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "default warehouses", _seed_default_warehouses),
+    (3, "query indexes", create_indexes),
+    (4, "sku_totals with inventory triggers", create_sku_totals),
+    (5, "hourly log_rollups", create_log_rollups),
+    (6, "move MESSAGE/REPLY logs into messages", migrate_log_messages),
+    (7, "inventory snapshots", create_inventory_snapshots),
+    (8, "demand velocity", create_sku_velocity),
+    (9, "hub-to-hub transfers", create_transfers),
+    (10, "unique barcode index", rebuild_barcode_index),
+    (11, "shared cache generations", create_cache_generations),
+    (12, "drop zero sku_totals rows", recreate_sku_totals_triggers),
+]
+
+def _create_schema_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _applied_versions(conn):
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")}
+
+def schema_version():
+    """Highest applied migration, or 0 for a database that has never been migrated."""
+    conn = get_conn()
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone() is None:
+        return 0
+    return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+
+def pending_migrations():
+    """(version, name) of every step not yet applied to DB_PATH."""
+    conn = get_conn()
+    _create_schema_version(conn)
+    applied = _applied_versions(conn)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+@writes("logs", "messages", "sku_totals", "log_rollups", "warehouses", "sku_velocity", "transfers")
+def migrate(target=None):
+    """Apply pending migrations up to `target` (default: all) and return their versions.
+
+    Each step takes the write lock with BEGIN IMMEDIATE and re-checks
+    schema_version, so two processes starting together apply it once.
+    """
+    conn = get_conn()
+    _create_schema_version(conn)
+    applied = _applied_versions(conn)
+    done = []
+    for version, name, step in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version in applied:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone() is None:
+                step(conn)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+                done.append(version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return done
+
+def init_db():
+    """Create or upgrade the schema; the same as migrate()."""
+    return migrate()
+
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+def bootstrap():
+    """Migrate DB_PATH once per process; later calls (every Streamlit rerun) return at once.
+
+    Also takes the periodic inventory snapshot if one is due; long-running
+    deployments should run `python db.py snapshot` from cron as well.
+    """
+    key = (os.getpid(), DB_PATH)
+    if key in _bootstrapped:
+        return []
+    with _bootstrap_lock:
+        if key in _bootstrapped:
+            return []
+        done = migrate()
+        maybe_take_inventory_snapshot()
+        _bootstrapped.add(key)
+        return done
+
+
 # --- Init Run ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TTT inventory database tools")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("init", help="create tables and seed warehouses and SKUs (default)")
+    totals = commands.add_parser("rebuild-sku-totals", help="recompute sku_totals from inventory")
+    totals.add_argument("--check", action="store_true", help="only report mismatches")
+    commands.add_parser("rebuild-rollups", help="backfill log_rollups from the full logs history")
+    commands.add_parser("rebuild-velocity", help="rebuild demand velocity from the last 90 days of logs")
+    commands.add_parser("check-barcodes", help="list barcodes shared by more than one SKU, or make the index UNIQUE")
+    migrations = commands.add_parser("migrate", help="apply pending schema migrations")
+    migrations.add_argument("--status", action="store_true", help="list pending migrations without applying them")
+    migrations.add_argument("--to", type=int, help="stop after this version")
+    snapshot = commands.add_parser("snapshot", help="take an inventory snapshot if one is due")
+    snapshot.add_argument("--force", action="store_true", help="take one even if the last is recent")
+    archive = commands.add_parser("archive-logs", help="move logs past the retention horizon into monthly archive files")
+    archive.add_argument("--days", type=int, help="retention in days (default: database.log_retention_days)")
+    archive.add_argument("--dry-run", action="store_true", help="only report what would move")
+    reconcile = commands.add_parser("reconcile", help="diff inventory against the stock the logs ledger implies")
+    reconcile.add_argument("--hub", help="only this hub")
+    reconcile.add_argument("--out", help="write the discrepancy report to this CSV")
+    reconcile.add_argument("--apply", action="store_true", help="correct inventory and log each correction as RECONCILE")
+    reconcile.add_argument("--include-unknown", action="store_true", help="also correct SKUs that are not in sku_info")
+    reconcile.add_argument("--chunk-rows", type=int, default=RECONCILE_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    if args.command in (None, "init"):
+        init_db()
+        seed_warehouses()
+        seed_skus()
+        clean_junk_skus()  # 👈 optional
+        print("✅ Database initialized with SKUs.")
+    elif args.command == "rebuild-sku-totals":
+        mismatches = check_sku_totals() if args.check else rebuild_sku_totals()
+        for sku, stored, expected in mismatches:
+            print(f"  {sku}: stored={stored} expected={expected}")
+        if args.check:
+            print(f"{'❌' if mismatches else '✅'} {len(mismatches)} SKU totals disagree with inventory.")
+            return 1 if mismatches else 0
+        print(f"✅ Rebuilt sku_totals ({len(mismatches)} SKUs corrected).")
+    elif args.command == "rebuild-rollups":
+        print(f"✅ Rebuilt log_rollups ({rebuild_log_rollups()} buckets).")
+    elif args.command == "rebuild-velocity":
+        print(f"✅ Rebuilt demand velocity ({rebuild_velocity()} SKU/hub rows).")
+    elif args.command == "check-barcodes":
+        duplicates = check_barcodes()
+        for barcode, skus, _ in duplicates:
+            print(f"  {barcode}: {skus}")
+        if duplicates:
+            print(f"❌ {len(duplicates)} barcodes are shared by more than one SKU; fix them in the catalog "
+                  "and run this again to make the barcode index UNIQUE.")
+            return 1
+        print("✅ Every barcode belongs to one SKU; the barcode index is UNIQUE.")
+    elif args.command == "migrate":
+        if args.status:
+            pending = pending_migrations()
+            print(f"Schema version {schema_version()}, {len(pending)} pending.")
+            for version, name in pending:
+                print(f"  {version}: {name}")
+            return 0
+        done = migrate(args.to)
+        for version, name, _ in MIGRATIONS:
+            if version in done:
+                print(f"  applied {version}: {name}")
+        print(f"✅ Schema at version {schema_version()}.")
+    elif args.command == "snapshot":
+        snapshot_id = take_inventory_snapshot() if args.force else maybe_take_inventory_snapshot()
+        if snapshot_id is None:
+            print(f"✅ Latest snapshot is under {DB_SETTINGS['snapshot_interval_hours']}h old; nothing to do.")
+        else:
+            print(f"✅ Took inventory snapshot #{snapshot_id}.")
+    elif args.command == "archive-logs":
+        moved = archive_logs(args.days, dry_run=args.dry_run)
+        for month, rows in moved:
+            print(f"  {month}: {rows} rows")
+        verb = "Would archive" if args.dry_run else "Archived"
+        print(f"✅ {verb} {sum(rows for _, rows in moved)} log rows from {len(moved)} months into {_archive_dir()}.")
+    elif args.command == "reconcile":
+        started = time.perf_counter()
+        report = reconcile_inventory(args.hub, args.chunk_rows)
+        elapsed = time.perf_counter() - started
+        if args.out:
+            report.to_csv(args.out, index=False)
+        with pd.option_context("display.max_rows", 50, "display.width", 120):
+            print(report if len(report) else "No discrepancies.")
+        print(f"{'❌' if len(report) else '✅'} {len(report)} (sku, hub) rows disagree with the ledger "
+              f"(net {int(report['difference'].sum()) if len(report) else 0} units, {elapsed:.1f}s).")
+        if args.apply and len(report):
+            fixed = apply_reconciliation(report, include_unknown=args.include_unknown)
+            print(f"✅ Corrected {fixed} of {len(report)} rows; each is logged as {RECONCILE_ACTION}.")
+        elif len(report):
+            return 1
+    return 0
+
 if __name__ == "__main__":
-    init_db()
-    seed_warehouses()
-    seed_skus()
-    clean_junk_skus()  # 👈 optional
-    print("✅ Database initialized with SKUs.")
+    raise SystemExit(main())
 
 
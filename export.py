@@ -0,0 +1,77 @@
+# export.py
+#
+# Streams logs and shipments out of SQLite into CSV (optionally gzip) files
+# in batches, so large exports never hold the whole table in memory. Used by
+# the dashboards' export buttons and runnable directly:
+#
+#     python export.py logs --hub HUB1 --start 2024-01-01 --gzip -o log_HUB1.csv.gz
+
+import argparse
+import csv
+import gzip
+import io
+import os
+import tempfile
+import time
+import uuid
+
+import db
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "ttt_exports")
+EXPORT_MAX_AGE_S = 3600
+BATCH_SIZE = 5000
+
+def _prune_old_exports():
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - EXPORT_MAX_AGE_S
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+def _export_path(stem, compress):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _prune_old_exports()
+    return os.path.join(EXPORT_DIR, f"{stem}-{uuid.uuid4().hex[:8]}.csv{'.gz' if compress else ''}")
+
+def write_csv(path, columns, batches, compress=False):
+    """Write header + batches of rows to path; returns the number of rows written."""
+    raw = gzip.open(path, "wb") if compress else open(path, "wb")
+    rows = 0
+    with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            rows += len(batch)
+    return rows
+
+def export_logs(path=None, compress=True, batch_size=BATCH_SIZE, **filters):
+    """Export logs matching db.get_logs_page-style filters; returns (path, rows)."""
+    path = path or _export_path("logs", compress)
+    rows = write_csv(path, db.LOG_EXPORT_COLUMNS, db.iter_logs(batch_size, **filters), compress)
+    return path, rows
+
+def export_shipments(path=None, compress=True, batch_size=BATCH_SIZE, **filters):
+    """Export shipments matching db.get_all_shipments filters; returns (path, rows)."""
+    path = path or _export_path("shipments", compress)
+    rows = write_csv(path, db.SHIPMENT_EXPORT_COLUMNS, db.iter_shipments(batch_size, **filters), compress)
+    return path, rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export logs or shipments to CSV")
+    parser.add_argument("table", choices=["logs", "shipments"])
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--hub")
+    parser.add_argument("--start", help="YYYY-MM-DD")
+    parser.add_argument("--end", help="YYYY-MM-DD")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args(argv)
+
+    export = export_logs if args.table == "logs" else export_shipments
+    path, rows = export(args.output, compress=args.gzip, hub=args.hub, start_date=args.start, end_date=args.end)
+    print(f"✅ Exported {rows} {args.table} rows to {path}")
+
+if __name__ == "__main__":
+    main()
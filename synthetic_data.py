@@ -0,0 +1,205 @@
+# synthetic_data.py
+#
+# Fills a database with production-sized synthetic data for benchmarking:
+# SKUs modelled on Master_Updated_Barcode_Inventory.csv, hubs, users, log
+# rows and shipments, with Zipf-skewed SKU popularity and uneven hub load.
+#
+#     python synthetic_data.py --db bench.db --skus 2000 --logs 1000000 --shipments 50000
+
+import argparse
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import db
+
+BENCH_PASSWORD = "bench"
+BENCH_PASSWORD_HASH = hashlib.sha256(BENCH_PASSWORD.encode()).hexdigest()
+
+# Share of log rows per action; OUT slightly outpaces IN like a selling hub.
+ACTION_WEIGHTS = {
+    "IN": 0.40,
+    "OUT": 0.48,
+    "SUPPLIER-IN": 0.06,
+    "COUNT": 0.02,
+    "ADMIN-ADD": 0.02,
+    "ADMIN-REMOVE": 0.02,
+}
+CHUNK_ROWS = 200_000
+
+def zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def make_catalog(n_skus, template_csv=db.SKU_CATALOG_CSV):
+    """Return a DataFrame of n_skus SKUs, cycling the real catalog with variant suffixes."""
+    template = pd.read_csv(template_csv, dtype=str).dropna(subset=["SKU", "Product Name"])
+    reps = -(-n_skus // len(template))
+    catalog = pd.concat([template] * reps, ignore_index=True).iloc[:n_skus].copy()
+    variant = np.arange(n_skus) // len(template)
+    catalog["SKU"] = np.where(variant == 0, catalog["SKU"], catalog["SKU"] + "-V" + variant.astype(str))
+    catalog["Product Name"] = np.where(variant == 0, catalog["Product Name"], catalog["Product Name"] + " v" + variant.astype(str))
+    catalog["Barcode"] = (700000000000 + np.arange(n_skus)).astype(str)
+    return catalog[["SKU", "Product Name", "Barcode"]]
+
+def make_hubs(n_hubs):
+    hubs = ["HUB1", "HUB2", "HUB3", "RETAIL"][:n_hubs]
+    hubs += [f"HUB{i}" for i in range(4, n_hubs + 1)]
+    return hubs
+
+def make_timestamps(n, days, rng, end=None):
+    """Timestamps over the last `days` days, denser during business hours."""
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    day_offsets = rng.integers(0, days, n)
+    hours = np.clip(rng.normal(13, 3, n), 0, 23.99)
+    seconds = day_offsets * 86400 + (hours * 3600).astype(np.int64)
+    stamps = pd.to_datetime(start) + pd.to_timedelta(np.sort(seconds), unit="s")
+    return stamps.strftime("%Y-%m-%d %H:%M:%S")
+
+def generate(db_path, n_skus=500, n_hubs=4, n_logs=100_000, n_shipments=5_000, n_messages=500, days=365, seed=7):
+    """Build a fresh database at db_path and return a summary of what was generated."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    rng = np.random.default_rng(seed)
+    db.DB_PATH = db_path
+    db.clear_cache()
+    db.init_db()
+    db.seed_warehouses()
+
+    catalog = make_catalog(n_skus)
+    hubs = make_hubs(n_hubs)
+    skus = catalog["SKU"].to_numpy()
+    sku_p = zipf_weights(n_skus)
+    hub_p = zipf_weights(n_hubs, 0.6)
+    managers = [f"manager_{hub.lower()}" for hub in hubs]
+    suppliers = [f"supplier_{i}" for i in range(1, 6)]
+
+    conn = db.get_conn()
+    conn.execute("PRAGMA synchronous=OFF")
+    with conn:
+        conn.executemany("INSERT INTO sku_info (sku, name, barcode) VALUES (?, ?, ?)", catalog.itertuples(index=False))
+        conn.executemany(
+            "INSERT OR IGNORE INTO warehouses (code, name, address, contact, status, region) VALUES (?, ?, '', '', 'Open', 'United States')",
+            [(hub, f"Synthetic {hub}") for hub in hubs],
+        )
+        users = [("bench_admin", "admin", "ALL")] + [(m, "manager", h) for m, h in zip(managers, hubs)]
+        users += [(s, "supplier", "") for s in suppliers]
+        conn.executemany(
+            "INSERT OR REPLACE INTO users (username, password, role, hubs) VALUES (?, ?, ?, ?)",
+            [(name, BENCH_PASSWORD_HASH, role, user_hubs) for name, role, user_hubs in users],
+        )
+
+        # Load logs with the rollup trigger off; create_log_rollups() below
+        # recreates it and backfills the rollups in one pass.
+        conn.execute("DROP TRIGGER IF EXISTS trg_logs_rollup")
+        actions = np.array(list(ACTION_WEIGHTS))
+        action_p = np.array(list(ACTION_WEIGHTS.values()))
+        ledger = []
+        for start in range(0, n_logs, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, n_logs - start)
+            hub_idx = rng.choice(n_hubs, n, p=hub_p)
+            chunk = pd.DataFrame({
+                "username": np.array(managers)[hub_idx],
+                "sku": rng.choice(skus, n, p=sku_p),
+                "hub": np.array(hubs)[hub_idx],
+                "action": rng.choice(actions, n, p=action_p),
+                "qty": rng.geometric(0.25, n),
+                "comment": "",
+                "timestamp": make_timestamps(n, days, rng),
+            })
+            conn.executemany(
+                "INSERT INTO logs (username, sku, hub, action, qty, comment, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                chunk.itertuples(index=False),
+            )
+            signs = chunk["action"].map(db.MOVEMENT_DIRECTIONS)
+            ledger.append((chunk["qty"] * signs).groupby([chunk["sku"], chunk["hub"]]).sum())
+
+        # Current stock is the ledger sum. Where the random OUTs outran the
+        # receipts, an opening-balance ADMIN-ADD at the start of the history
+        # lifts the sum to zero (the UI's OUT guard never lets stock go
+        # negative), so inventory always matches its own ledger.
+        if ledger:
+            balance = pd.concat(ledger).groupby(level=[0, 1]).sum()
+            opening = (datetime.now().replace(microsecond=0) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+            conn.executemany(
+                "INSERT INTO logs (username, sku, hub, action, qty, comment, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (("bench_admin", sku, hub, "ADMIN-ADD", int(-qty), "Opening balance", opening)
+                 for (sku, hub), qty in balance[balance < 0].items()),
+            )
+            stock = balance.clip(lower=0)
+            conn.executemany(
+                "INSERT INTO inventory (sku, hub, quantity) VALUES (?, ?, ?)",
+                ((sku, hub, int(qty)) for (sku, hub), qty in stock.items()),
+            )
+
+        ship_hub_idx = rng.choice(n_hubs, n_shipments, p=hub_p)
+        shipments = pd.DataFrame({
+            "supplier": rng.choice(suppliers, n_shipments),
+            "tracking": [f"1Z{n:010d}" for n in rng.integers(0, 10**10, n_shipments)],
+            "carrier": rng.choice(["UPS", "FedEx", "USPS", "DHL"], n_shipments),
+            "ship_date": pd.Series(make_timestamps(n_shipments, days, rng)).str[:10],
+            "hub": np.array(hubs)[ship_hub_idx],
+            "sku": rng.choice(skus, n_shipments, p=sku_p),
+            "qty": rng.integers(10, 500, n_shipments),
+        })
+        shipments["timestamp"] = shipments["ship_date"] + " 12:00:00"
+        conn.executemany(
+            "INSERT INTO shipments (supplier, tracking, carrier, ship_date, hub, sku, qty, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            shipments.itertuples(index=False),
+        )
+
+        msg_hub_idx = rng.integers(0, n_hubs, n_messages)
+        conn.executemany(
+            "INSERT INTO messages (sender, hub, direction, subject, body, is_read, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                np.array(managers)[msg_hub_idx],
+                np.array(hubs)[msg_hub_idx],
+                rng.choice([db.TO_ADMIN, db.TO_HUB], n_messages),
+                [f"Subject {i}" for i in range(n_messages)],
+                [f"Synthetic message {i}" for i in range(n_messages)],
+                rng.integers(0, 2, n_messages).tolist(),
+                make_timestamps(n_messages, days, rng),
+            ),
+        )
+        conn.execute("UPDATE messages SET thread_id = id WHERE thread_id IS NULL")
+
+    with conn:
+        db.create_log_rollups(conn)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("ANALYZE")
+    db.clear_cache()
+    return {
+        "skus": n_skus,
+        "hubs": n_hubs,
+        "logs": n_logs,
+        "shipments": n_shipments,
+        "messages": n_messages,
+        "days": days,
+        "seed": seed,
+        "db_bytes": os.path.getsize(db_path),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic TTT inventory database")
+    parser.add_argument("--db", required=True, help="output database path (overwritten)")
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--hubs", type=int, default=4)
+    parser.add_argument("--logs", type=int, default=100_000)
+    parser.add_argument("--shipments", type=int, default=5_000)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.abspath(db.DB_SETTINGS["path"]):
+        parser.error("refusing to overwrite the live database")
+    summary = generate(args.db, args.skus, args.hubs, args.logs, args.shipments, args.messages, args.days, args.seed)
+    print(f"✅ Generated {args.db}: {summary}")
+
+if __name__ == "__main__":
+    main()
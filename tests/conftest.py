@@ -0,0 +1,22 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+CATALOG = "SKU,Product Name,Barcode\nA,Alpha,111\nB,Bravo,222\nC,Charlie,\n"
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """An empty, fully migrated database with the default hubs and SKUs A, B (barcoded) and C."""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    db.clear_cache()
+    db.init_db()
+    db.import_sku_catalog(io.StringIO(CATALOG))
+    yield db
+    db.close_all_connections()
+    db.clear_cache()
@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import http.client
+import json
+import threading
+
+import pytest
+
+import api
+
+PASSWORD = "secret"
+
+@pytest.fixture
+def call(fresh_db):
+    """call(method, path, body) against a live server; returns (status, payload)."""
+    db = fresh_db
+    password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    db.add_user("boss", password_hash, "admin", "ALL")
+    db.add_user("hub1", password_hash, "manager", "HUB1")
+    db.record_movement("boss", "A", "HUB1", "IN", 10)
+    server = api.make_server("127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def request(method, path, body=None, user="boss", raw=None, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        token = base64.b64encode(f"{user}:{PASSWORD}".encode()).decode()
+        data = raw if raw is not None else (json.dumps(body).encode() if body is not None else None)
+        conn.putrequest(method, path)
+        conn.putheader("Authorization", f"Basic {token}")
+        for name, value in (headers or {"Content-Length": str(len(data or b""))}).items():
+            conn.putheader(name, value)
+        conn.endheaders(data)
+        response = conn.getresponse()
+        status, payload = response.status, json.loads(response.read())
+        conn.close()
+        return status, payload
+
+    yield request
+    server.shutdown()
+    server.server_close()
+
+def test_transfer_to_unknown_hub_is_rejected(call, fresh_db):
+    status, payload = call("POST", "/api/transfers",
+                           {"from_hub": "HUB1", "to_hub": "NOWHERE", "lines": [{"sku": "A", "qty": 2}]})
+    assert status == 422
+    assert payload["unknown"] == ["NOWHERE"]
+    assert sorted(row for row in fresh_db.get_all_inventory() if row[2]) == [("A", "HUB1", 10)]
+
+def test_transfer_moves_stock(call, fresh_db):
+    status, payload = call("POST", "/api/transfers",
+                           {"from_hub": "HUB1", "to_hub": "HUB2", "lines": [{"sku": "A", "qty": 2}]}, user="hub1")
+    assert status == 201
+    assert sorted(row for row in fresh_db.get_all_inventory() if row[2]) == [("A", "HUB1", 8), ("A", "HUB2", 2)]
+
+@pytest.mark.parametrize("path", ["/api/movements", "/api/shipments", "/api/transfers", "/api/batch"])
+@pytest.mark.parametrize("body", [[1, 2], "movements", 7, None])
+def test_non_object_body_is_a_bad_request(call, path, body):
+    status, payload = call("POST", path, raw=json.dumps(body).encode())
+    assert status == 400
+    assert "error" in payload
+
+def test_non_object_movement_is_a_bad_request(call):
+    status, payload = call("POST", "/api/movements", {"movements": ["A", 3]})
+    assert status == 400
+
+def test_non_object_batch_item_fails_alone(call):
+    status, payload = call("POST", "/api/batch", {"requests": [[1], "x", {"method": "GET", "path": "/api/skus/A"}]})
+    assert status == 200
+    assert [result["status"] for result in payload["results"]] == [400, 400, 200]
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_bad_content_length_is_a_bad_request(call, length):
+    status, payload = call("POST", "/api/movements", headers={"Content-Length": length})
+    assert status == 400
+    assert "Content-Length" in payload["error"]
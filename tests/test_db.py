@@ -0,0 +1,119 @@
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+def test_duplicate_barcode_is_rejected(fresh_db):
+    db = fresh_db
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.get_conn() as conn:
+            conn.execute("INSERT INTO sku_info (sku, name, barcode) VALUES ('D', 'Delta', '111')")
+    assert db.get_sku_by_barcode("111") == ("A", "Alpha")
+    with pytest.raises(ValueError, match="111"):
+        db.import_sku_catalog(io.StringIO("SKU,Product Name,Barcode\nD,Delta,111\n"))
+
+def test_import_can_swap_barcodes(fresh_db):
+    db = fresh_db
+    db.import_sku_catalog(io.StringIO("SKU,Product Name,Barcode\nA,Alpha,222\nB,Bravo,111\n"))
+    assert db.get_sku_by_barcode("111") == ("B", "Bravo")
+    assert db.get_sku_by_barcode("222") == ("A", "Alpha")
+
+def test_barcode_index_becomes_unique_once_duplicates_are_fixed(fresh_db):
+    db = fresh_db
+    with db.get_conn() as conn:
+        conn.execute("DROP INDEX idx_sku_info_barcode")
+        conn.execute("UPDATE sku_info SET barcode = '111' WHERE sku = 'B'")
+        db.rebuild_barcode_index(conn)
+    assert db.check_barcodes() == [("111", "A,B", 2)]
+    with db.get_conn() as conn:
+        conn.execute("UPDATE sku_info SET barcode = '222' WHERE sku = 'B'")
+    assert db.check_barcodes() == []
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.get_conn() as conn:
+            conn.execute("UPDATE sku_info SET barcode = '111' WHERE sku = 'B'")
+
+def _now(db):
+    return db.get_conn().execute("SELECT datetime('now')").fetchone()[0]
+
+def test_stock_as_of_matches_inventory_after_reconciliation(fresh_db):
+    db = fresh_db
+    db.record_movement("tester", "A", "HUB1", "IN", 10)
+    with db.get_conn() as conn:
+        conn.execute("UPDATE inventory SET quantity = 5 WHERE sku = 'A' AND hub = 'HUB1'")
+    db.take_inventory_snapshot()
+
+    report = db.reconcile_inventory()
+    assert report[["sku", "hub", "expected", "actual"]].values.tolist() == [["A", "HUB1", 10, 5]]
+    assert db.apply_reconciliation(report) == 1
+    inventory = sorted(row for row in db.get_all_inventory() if row[2])
+    assert inventory == [("A", "HUB1", 10)]
+    assert db.stock_as_of(_now(db)) == inventory
+    assert db.reconcile_inventory().empty
+
+def test_transfer_checks_both_hubs(fresh_db):
+    db = fresh_db
+    db.record_movement("tester", "A", "HUB1", "IN", 10)
+    with pytest.raises(db.UnknownHubError):
+        db.transfer_stock("tester", "HUB1", "NOWHERE", [("A", 2)])
+    with pytest.raises(db.UnknownHubError):
+        db.transfer_stock("tester", "NOWHERE", "HUB1", [("A", 2)])
+    assert db.get_transfers() == []
+    assert sorted(row for row in db.get_all_inventory() if row[2]) == [("A", "HUB1", 10)]
+
+def test_sku_totals_drop_skus_whose_inventory_is_gone(fresh_db):
+    db = fresh_db
+    db.record_movement("tester", "A", "HUB1", "IN", 10)
+    db.record_movement("tester", "B", "HUB1", "IN", 4)
+    db.record_movement("tester", "B", "HUB1", "OUT", 4)
+    assert db.get_sku_totals() == [("A", 10)]
+    with db.get_conn() as conn:
+        conn.execute("DELETE FROM inventory WHERE sku = 'A'")
+    db.clear_cache()
+    assert db.check_sku_totals() == []
+    assert db.get_sku_totals() == []
+
+def test_manifest_keeps_sku_case(fresh_db):
+    db = fresh_db
+    db.import_sku_catalog(io.StringIO("SKU,Product Name,Barcode\nabc-1,Lower,\n"))
+    parsed = db.parse_shipment_manifest(io.StringIO("SKU,Qty\n abc-1 ,3\nabc-1,2\nABC-1,1\n"))
+    assert parsed["lines"] == [("abc-1", 5), ("ABC-1", 1)]
+    assert parsed["unknown"] == ["ABC-1"]
+
+def test_log_actions_cover_every_logged_action(fresh_db):
+    db = fresh_db
+    db.record_shipment_batch("acme", "T1", "UPS", "2024-01-01", "HUB1", [("A", 10)])
+    db.record_movement("tester", "A", "HUB1", "OUT", 2)
+    db.transfer_stock("tester", "HUB1", "HUB2", [("A", 3)])
+    with db.get_conn() as conn:
+        conn.execute("UPDATE inventory SET quantity = 1 WHERE sku = 'A' AND hub = 'HUB1'")
+    db.apply_reconciliation(db.reconcile_inventory())
+    logged = {row[0] for row in db.get_conn().execute("SELECT DISTINCT action FROM logs")}
+    assert logged == {"SUPPLIER-IN", "OUT", "TRANSFER-OUT", "TRANSFER-IN", "RECONCILE"}
+    assert logged <= set(db.get_log_actions())
+
+def test_cache_sees_writes_from_other_processes(fresh_db):
+    db = fresh_db
+    db.record_movement("tester", "A", "HUB1", "IN", 10)
+    assert db.get_skus_for_hub("HUB1") == [("A", 10)]
+    script = (f"import db; db.DB_PATH = {db.DB_PATH!r}; "
+              "db.record_movement('other', 'A', 'HUB1', 'IN', 5); db.close_all_connections()")
+    subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(db.__file__), check=True)
+    assert db.get_skus_for_hub("HUB1") == [("A", 15)]
+
+def test_idle_velocity_refresh_keeps_the_cache(fresh_db):
+    db = fresh_db
+    db.record_movement("tester", "A", "HUB1", "IN", 10)
+    db.record_movement("tester", "A", "HUB1", "OUT", 3)
+    assert db.refresh_velocity() == 1
+    assert [row[:5] for row in db.get_velocity("HUB1")] == [("A", "HUB1", 7, 3, 3)]
+
+    db.record_movement("tester", "A", "HUB1", "IN", 1)
+    assert db.get_velocity("HUB1")[0][2] == 8
+    hits = db.cache_stats()["hits"]
+    assert db.refresh_velocity() == 0  # reads the IN row, which is not demand
+    assert db.refresh_velocity() == 0
+    db.get_velocity("HUB1")
+    assert db.cache_stats()["hits"] == hits + 1
@@ -0,0 +1,19 @@
+import io
+
+import check_query_plans
+
+def _failures(db, cases=check_query_plans.CASES):
+    db.seed_warehouses()
+    db.import_sku_catalog(io.StringIO(check_query_plans.PLAN_CATALOG))
+    return [(name, sql, problems) for name, sql, problems in check_query_plans.check_cases(db.get_conn(), cases)
+            if problems]
+
+def test_every_query_uses_an_index(fresh_db):
+    assert _failures(fresh_db) == []
+
+def test_a_dropped_index_fails_the_check(fresh_db):
+    db = fresh_db
+    with db.get_conn() as conn:
+        conn.execute("DROP INDEX idx_sku_info_barcode")
+    failures = _failures(db, [(db.get_sku_by_barcode, ("123",))])
+    assert [name for name, _, _ in failures] == ["get_sku_by_barcode"]
@@ -0,0 +1,12 @@
+import synthetic_data
+
+def test_generated_inventory_matches_its_ledger(tmp_path, monkeypatch):
+    db = synthetic_data.db
+    monkeypatch.setattr(db, "DB_PATH", db.DB_PATH)  # generate() repoints it
+    try:
+        synthetic_data.generate(str(tmp_path / "synthetic.db"), n_skus=50, n_logs=20_000, n_shipments=100, n_messages=10)
+        assert db.reconcile_inventory().empty
+        assert any(qty for _, _, qty in db.get_all_inventory())
+    finally:
+        db.close_all_connections()
+        db.clear_cache()
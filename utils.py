@@ -1,4 +1,18 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 import streamlit as st
+import pandas as pd
+import altair as alt
+from datetime import date, timedelta
+import db
+
+# Recent render timings per (page, section), shared by every session in the process.
+SECTION_SAMPLES = 200
+_section_timings = {}
+_section_lock = threading.Lock()
 
 def require_login():
     if "user" not in st.session_state:
@@ -7,3 +21,245 @@ def require_login():
 
 def show_header(title):
     st.markdown(f"### {title}")
+
+@contextmanager
+def timed_section(page, section):
+    """Time a block of a dashboard, splitting SQLite time from everything else.
+
+    Whatever is not SQL (DataFrame building, Altair, widget serialization) is
+    the difference between the two. st.stop()/st.rerun() still record.
+    """
+    sql_start = db.thread_sql_ms()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        total_ms = (time.perf_counter() - start) * 1000
+        sql_ms = db.thread_sql_ms() - sql_start
+        with _section_lock:
+            samples = _section_timings.setdefault((page, section), deque(maxlen=SECTION_SAMPLES))
+            samples.append((total_ms, sql_ms))
+
+def section_router(page, sections, *args):
+    """Render only the selected entry of `sections` (label -> render function).
+
+    Unlike st.tabs, whose bodies all run on every rerun, only the active
+    section's function is called, so the others load nothing. Widgets in
+    hidden sections are not rendered and reset to their defaults when shown
+    again; state that must survive lives in session-state keys of its own.
+    """
+    labels = list(sections)
+    choice = st.radio("Section", labels, horizontal=True, key=f"{page}_section", label_visibility="collapsed")
+    with timed_section(page, choice.split(" ", 1)[-1]):
+        sections[choice](*args)
+    return choice
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+def section_timings():
+    """One row per timed section: page, section, renders, p50/p95 total ms and p50 SQL ms."""
+    with _section_lock:
+        snapshot = {key: list(samples) for key, samples in _section_timings.items()}
+    rows = []
+    for (page, section), samples in sorted(snapshot.items()):
+        totals = [total for total, _ in samples]
+        sql = [sql_ms for _, sql_ms in samples]
+        rows.append((page, section, len(samples), round(_percentile(totals, 0.5), 1),
+                     round(_percentile(totals, 0.95), 1), round(_percentile(sql, 0.5), 1)))
+    return rows
+
+def reset_section_timings():
+    with _section_lock:
+        _section_timings.clear()
+
+def log_pager(key, page_size=100, **filters):
+    """Show one page of logs with Newer/Older buttons and return it as a DataFrame.
+
+    The cursor stack lives in session state under `key`, and is reset whenever
+    the filters change.
+    """
+    signature = (page_size, sorted((k, str(v)) for k, v in filters.items()))
+    state = st.session_state.get(f"{key}_pager")
+    if state is None or state["signature"] != signature:
+        state = st.session_state[f"{key}_pager"] = {"signature": signature, "cursors": [None]}
+
+    rows, next_cursor = db.get_logs_page(state["cursors"][-1], page_size, **filters)
+    page_df = pd.DataFrame(rows, columns=db.LOG_PAGE_COLUMNS).drop(columns="id")
+    st.dataframe(page_df, use_container_width=True)
+
+    newer_col, older_col, info_col = st.columns([1, 1, 4])
+    if newer_col.button("⬅️ Newer", key=f"{key}_newer", disabled=len(state["cursors"]) == 1):
+        state["cursors"].pop()
+        st.rerun()
+    if older_col.button("Older ➡️", key=f"{key}_older", disabled=next_cursor is None):
+        state["cursors"].append(next_cursor)
+        st.rerun()
+    info_col.caption(f"Page {len(state['cursors'])} · {len(page_df)} rows")
+    return page_df
+
+def live_log_feed(key, hub=None, rows=50, poll_s=5):
+    """The newest `rows` logs (for hub, if given), refreshed every poll_s seconds.
+
+    Only this fragment reruns on each poll, not the page. Rows and the
+    last high-water log id live in session state under `key`, and each poll
+    asks for newer ids only, so an idle feed costs two empty rowid seeks.
+    """
+    live = st.toggle("🔴 Live", value=True, key=f"{key}_live")
+
+    @st.fragment(run_every=poll_s if live else None)
+    def feed():
+        signature = (hub, rows)
+        state = st.session_state.get(f"{key}_feed")
+        if state is None or state["signature"] != signature:
+            state = st.session_state[f"{key}_feed"] = {"signature": signature, "rows": [], "last_id": 0}
+        new_rows, state["last_id"] = db.get_logs_since(state["last_id"], hub, rows)
+        if new_rows:
+            state["rows"] = (new_rows + state["rows"])[:rows]
+        if not state["rows"]:
+            st.info("No activity yet.")
+            return
+        feed_df = pd.DataFrame(state["rows"], columns=db.LOG_PAGE_COLUMNS).drop(columns="id")
+        st.dataframe(feed_df, use_container_width=True, height=250)
+        st.caption(f"{len(new_rows)} new · checked {time.strftime('%H:%M:%S')}"
+                   + (f" · every {poll_s}s" if live else " · paused"))
+
+    feed()
+
+def activity_chart(key, hub=None):
+    """Bar chart of movement qty per period and action, read from the log rollups."""
+    col1, col2 = st.columns(2)
+    bucket = col1.selectbox("Bucket", ["hour", "day", "week"], index=1, key=f"{key}_bucket")
+    days = col2.selectbox("Range", [2, 7, 30, 90, 365], index=3, format_func=lambda d: f"Last {d} days", key=f"{key}_range")
+
+    rows = db.get_activity(bucket, hub=hub, start_date=date.today() - timedelta(days=days))
+    if not rows:
+        st.info("No chart data available.")
+        return
+    activity_df = pd.DataFrame(rows, columns=db.ACTIVITY_COLUMNS)
+    chart = alt.Chart(activity_df).mark_bar().encode(
+        x=alt.X("period:T", title=bucket.title()),
+        y=alt.Y("sum(qty):Q", title="qty"),
+        color="action:N",
+        tooltip=["period:T", "hub", "action", "qty", "moves"]
+    ).properties(height=300)
+    st.altair_chart(chart, use_container_width=True)
+
+def export_download(key, label, export_func, file_stem, **filters):
+    """Build an export only when asked, then offer the finished file for download.
+
+    Rendering the tab costs nothing; the file is streamed to disk by
+    export_func when "Prepare" is clicked and dropped once the filters change.
+    The download button is deferred, so the file is only read on click.
+    """
+    signature = sorted((k, str(v)) for k, v in filters.items())
+    compress = st.checkbox("gzip", value=True, key=f"{key}_gzip")
+    if st.button(f"⚙️ Prepare {label} export", key=f"{key}_prepare"):
+        path, rows = export_func(compress=compress, **filters)
+        st.session_state[f"{key}_export"] = {"signature": signature, "path": path, "rows": rows, "compress": compress}
+
+    prepared = st.session_state.get(f"{key}_export")
+    if prepared and prepared["signature"] == signature and os.path.exists(prepared["path"]):
+        def read_export(path=prepared["path"]):
+            with open(path, "rb") as f:
+                return f.read()
+
+        suffix = ".csv.gz" if prepared["compress"] else ".csv"
+        st.download_button(
+            f"📅 Download {label} CSV ({prepared['rows']} rows)",
+            read_export,
+            file_name=f"{file_stem}{suffix}",
+            mime="application/gzip" if prepared["compress"] else "text/csv",
+            key=f"{key}_download",
+        )
+
+def shipment_manifest_upload(key, supplier, hub, tracking, carrier, ship_date, receive=True):
+    """Validate an uploaded manifest CSV against sku_info and submit it as one shipment."""
+    uploaded = st.file_uploader("Manifest CSV (columns: `SKU`, `Qty`)", type="csv", key=f"{key}_file")
+    if not uploaded:
+        return
+    try:
+        manifest = db.parse_shipment_manifest(uploaded)
+    except Exception as e:
+        st.error(f"❌ Failed to read manifest: {e}")
+        return
+
+    lines = manifest["lines"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Lines", len(lines))
+    col2.metric("Units", sum(qty for _, qty in lines))
+    col3.metric("Rejected rows", manifest["rejected"])
+    col4.metric("Unknown SKUs", len(manifest["unknown"]))
+    if manifest["unknown"]:
+        st.error("❌ These SKUs are not in the catalog; fix the manifest or ask an admin to add them.")
+        st.dataframe(pd.DataFrame(manifest["unknown"], columns=["SKU"]), use_container_width=True)
+    st.dataframe(pd.DataFrame(lines, columns=["SKU", "Qty"]), use_container_width=True)
+
+    if st.button("Submit Manifest", key=f"{key}_submit", disabled=bool(manifest["unknown"]) or not lines):
+        if not tracking or not carrier:
+            st.error("Please fill in the tracking number and carrier.")
+            return
+        try:
+            count = db.record_shipment_batch(supplier, tracking, carrier, ship_date, hub, lines, receive=receive)
+            st.success(f"✅ Shipment of {count} SKUs recorded for {hub}.")
+        except db.UnknownSkuError as e:
+            st.error(f"❌ {e}")
+
+def transfer_form(key, user, from_hubs):
+    """Move stock from one of from_hubs to another hub as one transfer: a single SKU or a bulk CSV."""
+    hubs = [code for code, *_ in db.get_all_warehouses()]
+    col1, col2 = st.columns(2)
+    from_hub = col1.selectbox("From", from_hubs, key=f"{key}_from")
+    to_hub = col2.selectbox("To", [hub for hub in hubs if hub != from_hub], key=f"{key}_to")
+    mode = st.radio("Lines", ["Single SKU", "Bulk CSV"], horizontal=True, key=f"{key}_mode")
+
+    if mode == "Single SKU":
+        on_hand = {sku: qty for sku, qty in db.get_skus_for_hub(from_hub) if qty > 0}
+        if not on_hand:
+            st.info(f"No stock at {from_hub} to transfer.")
+            return
+        sku = st.selectbox("SKU", sorted(on_hand), format_func=lambda s: f"{s} ({on_hand[s]} on hand)", key=f"{key}_sku")
+        qty = st.number_input("Quantity", min_value=1, step=1, key=f"{key}_qty")
+        lines = [(sku, int(qty))]
+    else:
+        uploaded = st.file_uploader("Transfer CSV (columns: `SKU`, `Qty`)", type="csv", key=f"{key}_file")
+        if not uploaded:
+            return
+        try:
+            manifest = db.parse_shipment_manifest(uploaded)
+        except Exception as e:
+            st.error(f"❌ Failed to read CSV: {e}")
+            return
+        lines = manifest["lines"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Lines", len(lines))
+        col2.metric("Units", sum(qty for _, qty in lines))
+        col3.metric("Rejected rows", manifest["rejected"])
+        col4.metric("Unknown SKUs", len(manifest["unknown"]))
+        if manifest["unknown"]:
+            st.error("❌ These SKUs are not in the catalog; fix the CSV first.")
+            st.dataframe(pd.DataFrame(manifest["unknown"], columns=["SKU"]), use_container_width=True)
+            return
+        st.dataframe(pd.DataFrame(lines, columns=["SKU", "Qty"]), use_container_width=True)
+
+    comment = st.text_input("Comment (optional)", key=f"{key}_comment")
+    units = sum(qty for _, qty in lines)
+    if st.button(f"🔁 Transfer {units} units to {to_hub}", key=f"{key}_submit", disabled=not lines):
+        try:
+            transfer_id = db.transfer_stock(user["username"], from_hub, to_hub, lines, comment)
+            st.success(f"✅ Transfer #{transfer_id}: {units} units across {len(lines)} SKUs moved from {from_hub} to {to_hub}.")
+        except (db.InsufficientStockError, db.UnknownSkuError, db.UnknownHubError) as e:
+            st.error(f"❌ {e}. Nothing was moved.")
+
+def transfer_history(key, hub=None):
+    """Newest transfers (into or out of hub, if given), with the lines of a selected one."""
+    transfers = db.get_transfers(hub)
+    if not transfers:
+        st.info("No transfers yet.")
+        return
+    df = pd.DataFrame(transfers, columns=db.TRANSFER_COLUMNS)
+    st.dataframe(df, use_container_width=True)
+    labels = {row.id: f"#{row.id} {row.from_hub} → {row.to_hub} ({row.units} units)" for row in df.itertuples()}
+    selected = st.selectbox("Show lines of", list(labels), format_func=labels.get, key=f"{key}_selected")
+    st.dataframe(pd.DataFrame(db.get_transfer_lines(selected), columns=["SKU", "Qty"]), use_container_width=True)
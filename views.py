@@ -2,7 +2,7 @@ import db
 import streamlit as st
 import pandas as pd
 import altair as alt
-from utils import require_login
+from utils import require_login, shipment_manifest_upload
 from datetime import date
 
 __all__ = ["admin_dashboard", "manager_dashboard", "supplier_upload", "retail_inventory"]
@@ -18,7 +18,6 @@ def admin_dashboard(user):
 
     logs = db.get_all_logs()
     log_df = pd.DataFrame(logs, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-    unread_count = sum(1 for log in logs if log[4] == "MESSAGE")
 
     # Inventory tab
     with tabs[0]:
@@ -61,22 +60,22 @@ def admin_dashboard(user):
 
     # Messages tab
     with tabs[3]:
+        unread_count = db.count_unread_messages(db.TO_ADMIN)
         st.subheader(f"📢 Messages from Hubs {'🔴' if unread_count else ''}")
-        messages = [log for log in logs if log[4] == "MESSAGE"]
+        messages = db.get_admin_inbox()
 
         if messages:
-            msg_df = pd.DataFrame(messages, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-            st.dataframe(msg_df[["timestamp", "username", "hub", "comment"]], use_container_width=True)
+            msg_df = pd.DataFrame(messages, columns=db.MESSAGE_COLUMNS)
+            st.dataframe(msg_df[["timestamp", "sender", "hub", "subject", "body"]], use_container_width=True)
 
             st.markdown("### ✏️ Reply to a Hub")
             selected_hub = st.selectbox("Select Hub to Reply", sorted(msg_df["hub"].unique()))
-            selected_user = st.selectbox("Select User to Reply", sorted(msg_df[msg_df["hub"] == selected_hub]["username"].unique()))
+            selected_user = st.selectbox("Select User to Reply", sorted(msg_df[msg_df["hub"] == selected_hub]["sender"].unique()))
             reply_subject = st.text_input("Subject")
             reply_message = st.text_area("Reply Message")
 
             if st.button("Send Reply"):
-                full_msg = f"REPLY TO {selected_user} @ {selected_hub} // SUBJECT: {reply_subject} // {reply_message}"
-                db.log_action(user["username"], "N/A", selected_hub, "REPLY", 0, full_msg)
+                db.send_message(user["username"], selected_hub, db.TO_HUB, reply_subject, reply_message, recipient=selected_user)
                 st.success("📤 Reply sent.")
         else:
             st.info("No messages from hubs.")
@@ -91,13 +90,14 @@ def admin_dashboard(user):
         qty = st.number_input("Quantity", min_value=1, step=1)
         if st.button("Apply Change"):
             if action == "Add":
-                db.update_inventory(sku, hub, qty, "IN")
-                db.log_action(user["username"], sku, hub, "ADMIN-ADD", qty, "Manual add by admin")
+                db.record_movement(user["username"], sku, hub, "ADMIN-ADD", qty, "Manual add by admin")
                 st.success(f"Added {qty} units of {sku} to {hub}")
             else:
-                db.update_inventory(sku, hub, qty, "OUT")
-                db.log_action(user["username"], sku, hub, "ADMIN-REMOVE", qty, "Manual remove by admin")
-                st.success(f"Removed {qty} units of {sku} from {hub}")
+                try:
+                    db.record_movement(user["username"], sku, hub, "ADMIN-REMOVE", qty, "Manual remove by admin", allow_negative=False)
+                    st.success(f"Removed {qty} units of {sku} from {hub}")
+                except db.InsufficientStockError as e:
+                    st.error(f"❌ {e}")
 
 def manager_dashboard(user):
     require_login()
@@ -127,12 +127,14 @@ def manager_dashboard(user):
         comment = st.text_input("Comment (optional)")
 
         if st.button("Submit"):
-            db.update_inventory(selected_sku, hub, qty, action)
-            db.log_action(user["username"], selected_sku, hub, action, qty, comment)
-            st.session_state["last_action"] = f"{action} {qty} of {selected_sku}"
-            st.success(f"✅ {action} {qty} units of {selected_sku} recorded for {hub}")
-            skus = db.get_skus_for_hub(hub)
-            sku_dict = {sku: qty for sku, qty in skus}
+            try:
+                db.record_movement(user["username"], selected_sku, hub, action, qty, comment, allow_negative=False)
+                st.session_state["last_action"] = f"{action} {qty} of {selected_sku}"
+                st.success(f"✅ {action} {qty} units of {selected_sku} recorded for {hub}")
+                skus = db.get_skus_for_hub(hub)
+                sku_dict = {sku: qty for sku, qty in skus}
+            except db.InsufficientStockError as e:
+                st.error(f"❌ {e}")
 
         if st.session_state["last_action"]:
             st.caption(f"Last action: {st.session_state['last_action']}")
@@ -184,15 +186,15 @@ def manager_dashboard(user):
         subject = st.text_input("Subject")
         message = st.text_area("Message")
         if st.button("Send Message"):
-            db.log_action(user["username"], selected_sku, hub, "MESSAGE", 0, f"SUBJECT: {subject} // {message}")
+            db.send_message(user["username"], hub, db.TO_ADMIN, subject, message)
             st.success("\ud83d\udce8 Message sent to admin!")
 
         # View Admin Replies
         with st.expander("\ud83d\udcec Admin Replies to Your Hub"):
-            replies = [log for log in db.get_all_logs() if log[4] == "REPLY" and log[3] == hub]
+            replies = db.get_hub_inbox(hub)
             if replies:
-                df = pd.DataFrame(replies, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-                st.dataframe(df[["timestamp", "username", "comment"]], use_container_width=True)
+                df = pd.DataFrame(replies, columns=db.MESSAGE_COLUMNS)
+                st.dataframe(df[["timestamp", "sender", "subject", "body"]], use_container_width=True)
             else:
                 st.info("No replies from admin yet.")
 
@@ -207,6 +209,11 @@ def supplier_upload(user):
     ship_date = st.date_input("Shipping Date", value=date.today())
     dest_hub = st.selectbox("Destination Hub", ["HUB1", "HUB2", "HUB3", "RETAIL"])
 
+    mode = st.radio("Entry mode", ["Manual", "Manifest CSV"], horizontal=True)
+    if mode == "Manifest CSV":
+        shipment_manifest_upload("upload_manifest", user["username"], dest_hub, tracking, carrier, ship_date)
+        return
+
     st.markdown("### SKUs in Shipment")
     with st.form("shipment_form"):
         sku_data = []
@@ -222,12 +229,11 @@ def supplier_upload(user):
             if not tracking or not carrier or not sku_data:
                 st.error("Please fill in all required fields and at least one SKU.")
             else:
-                for sku, qty in sku_data:
-                    db.update_inventory(sku, dest_hub, qty, "IN")
-                    db.log_action(user["username"], sku, dest_hub, "SUPPLIER-IN", qty,
-                                  f"Tracking: {tracking}, Carrier: {carrier}, Date: {ship_date}")
-                    db.record_shipment(user["username"], tracking, carrier, str(ship_date), dest_hub, sku, qty)
-                st.success(f"Shipment recorded for {dest_hub} with {len(sku_data)} SKUs.")
+                try:
+                    db.record_shipment_batch(user["username"], tracking, carrier, ship_date, dest_hub, sku_data)
+                    st.success(f"Shipment recorded for {dest_hub} with {len(sku_data)} SKUs.")
+                except db.UnknownSkuError as e:
+                    st.error(f"❌ {e}")
 
 def retail_inventory(user):
     require_login()
@@ -249,13 +255,11 @@ def retail_inventory(user):
     comment = st.text_input("Comment (optional)")
 
     if st.button("Submit"):
-        if action == "COUNT":
-            db.update_inventory(selected_sku, "RETAIL", qty, "IN")
-            db.log_action(user["username"], selected_sku, "RETAIL", "COUNT", qty, comment)
-        else:
-            db.update_inventory(selected_sku, "RETAIL", qty, action)
-            db.log_action(user["username"], selected_sku, "RETAIL", action, qty, comment)
-        st.success(f"{action} {qty} units of {selected_sku} recorded (RETAIL)")
+        try:
+            db.record_movement(user["username"], selected_sku, "RETAIL", action, qty, comment, allow_negative=False)
+            st.success(f"{action} {qty} units of {selected_sku} recorded (RETAIL)")
+        except db.InsufficientStockError as e:
+            st.error(f"❌ {e}")
 
     with st.expander("📜 View Retail Log"):
         logs = db.get_logs_for_hub("RETAIL")
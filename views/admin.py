@@ -1,212 +1,307 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
 import hashlib
 import db
-from utils import require_login
+from utils import require_login, live_log_feed, log_pager, activity_chart, export_download, section_router, section_timings, reset_section_timings, transfer_form, transfer_history
+import export
 
-def admin_dashboard(user):
-    require_login()
-    st.title("Admin Dashboard 🌚")
-
-    tabs = st.tabs([
-        "🏦 Inventory", "📋 Logs", "📊 Chart", "📢 Messages",
-        "⚖️ Manage SKUs", "🔐 User Access", "🏢 Manage Hubs", "📥 Upload SKUs"
-    ])
-
-    inventory = db.get_all_inventory()
+def _inventory_section(user):
+    st.subheader("📦 Inventory by Hub")
+    as_of = st.date_input("As of (leave empty for current stock)", value=None, key="admin_inventory_as_of")
+    if as_of:
+        inventory = db.stock_as_of(f"{as_of} 23:59:59")
+        st.caption(f"Stock at the end of {as_of}, rebuilt from the nearest earlier snapshot plus the log.")
+    else:
+        inventory = db.get_all_inventory()
     df = pd.DataFrame(inventory, columns=["SKU", "Hub", "Quantity"])
 
-    logs = db.get_all_logs()
-    log_df = pd.DataFrame(logs, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-    unread_count = sum(1 for log in logs if log[4] == "MESSAGE")
+    sku_filter = st.text_input("Filter by SKU (optional)")
+    hub_filter = st.selectbox("Filter by Hub", ["All"] + df["Hub"].unique().tolist())
+    filtered = df.copy()
+    if sku_filter:
+        filtered = filtered[filtered["SKU"].str.contains(sku_filter.upper())]
+    if hub_filter != "All":
+        filtered = filtered[filtered["Hub"] == hub_filter]
+    st.dataframe(filtered, use_container_width=True)
 
-    with tabs[0]:
-        st.subheader("📦 Inventory by Hub")
-        sku_filter = st.text_input("Filter by SKU (optional)")
-        hub_filter = st.selectbox("Filter by Hub", ["All"] + df["Hub"].unique().tolist())
-        filtered = df.copy()
+    with st.expander("🌐 Network totals by SKU"):
+        totals_df = pd.DataFrame(db.get_sku_totals(), columns=["SKU", "Total Quantity"])
         if sku_filter:
-            filtered = filtered[filtered["SKU"].str.contains(sku_filter.upper())]
-        if hub_filter != "All":
-            filtered = filtered[filtered["Hub"] == hub_filter]
-        st.dataframe(filtered, use_container_width=True)
-
-    with tabs[1]:
-        st.subheader("📋 Full Inventory Log")
-        st.dataframe(log_df, use_container_width=True)
-        st.download_button(
-            label="📅 Download Log CSV",
-            data=log_df.to_csv(index=False).encode("utf-8"),
-            file_name="admin_log.csv",
-            mime="text/csv"
-        )
-
-    with tabs[2]:
-        st.subheader("📊 Activity Chart")
-        if not log_df.empty:
-            chart = alt.Chart(log_df).mark_bar().encode(
-                x="timestamp:T",
-                y="qty:Q",
-                color="action:N",
-                tooltip=["sku", "hub", "qty", "action"]
-            ).properties(height=300)
-            st.altair_chart(chart, use_container_width=True)
-        else:
-            st.info("No chart data available.")
-
-    with tabs[3]:
-        st.subheader(f"📢 Messages from Hubs {'🔴' if unread_count else ''}")
-        messages = [log for log in logs if log[4] == "MESSAGE"]
-        if messages:
-            msg_df = pd.DataFrame(messages, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-            st.dataframe(msg_df[["timestamp", "username", "hub", "comment"]], use_container_width=True)
-
-            st.markdown("### ✏️ Reply to a Hub")
-            selected_msg = st.selectbox("Select a message to reply to", msg_df["comment"])
-            match_row = msg_df[msg_df["comment"] == selected_msg].iloc[0]
-            selected_hub = match_row["hub"]
-            selected_user = match_row["username"]
-            reply_subject = f"RE: {selected_msg.split('//')[0].replace('SUBJECT:', '').strip()}"
-            st.text_input("Subject", value=reply_subject, disabled=True)
-            reply_message = st.text_area("Reply Message")
-            if st.button("Send Reply"):
-                full_msg = f"REPLY TO {selected_user} @ {selected_hub} // {reply_message}"
-                db.log_action(user["username"], "N/A", selected_hub, "REPLY", 0, full_msg)
-                st.success("📤 Reply sent.")
+            totals_df = totals_df[totals_df["SKU"].str.contains(sku_filter.upper())]
+        st.dataframe(totals_df, use_container_width=True)
+
+def _demand_section(user):
+    st.subheader("📈 Demand and Days of Cover")
+    db.refresh_velocity()
+    df = pd.DataFrame(db.get_velocity(), columns=db.VELOCITY_COLUMNS)
+    df["days_of_cover"] = pd.to_numeric(df["days_of_cover"])
+    if df.empty:
+        st.info("No OUT movements in the last 90 days.")
+        return
+    col1, col2 = st.columns(2)
+    hub_filter = col1.selectbox("Hub", ["All"] + sorted(df["hub"].unique().tolist()), key="admin_demand_hub")
+    top_n = col2.number_input("Show", min_value=10, max_value=1000, value=50, step=10, key="admin_demand_top")
+    if hub_filter != "All":
+        df = df[df["hub"] == hub_filter]
+    st.caption(f"Ranked by days of cover at the {db.COVER_WINDOW_DAYS}-day OUT rate; "
+               "SKUs with no sales in that window come last.")
+    st.dataframe(df.head(int(top_n)).rename(columns={
+        "sku": "SKU", "hub": "Hub", "quantity": "Quantity", "out_7d": "OUT 7d", "out_30d": "OUT 30d",
+        "out_90d": "OUT 90d", "per_day": "Per day", "days_of_cover": "Days of cover",
+    }), use_container_width=True)
+
+    by_hub = df.groupby("hub").agg(skus=("sku", "size"), under_7_days=("days_of_cover", lambda c: int((c < 7).sum())),
+                                   out_30d=("out_30d", "sum"))
+    st.markdown("### By hub")
+    st.dataframe(by_hub, use_container_width=True)
+
+def _logs_section(user):
+    st.subheader("🔴 Live Activity")
+    live_log_feed("admin_feed")
+    st.subheader("📋 Full Inventory Log")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    log_hub = col1.selectbox("Hub", ["All", "HUB1", "HUB2", "HUB3", "RETAIL"], key="admin_log_hub")
+    log_user = col2.text_input("User", key="admin_log_user").strip()
+    log_action = col3.selectbox("Action", ["All"] + db.get_log_actions(), key="admin_log_action")
+    log_start = col4.date_input("From", value=None, key="admin_log_start")
+    log_end = col5.date_input("To", value=None, key="admin_log_end")
+    log_filters = {
+        "hub": None if log_hub == "All" else log_hub,
+        "username": log_user or None,
+        "action": None if log_action == "All" else log_action,
+        "start_date": log_start,
+        "end_date": log_end,
+    }
+    log_pager("admin_logs", **log_filters)
+    export_download("admin_log_export", "Log", export.export_logs, "admin_log", **log_filters)
+
+def _chart_section(user):
+    st.subheader("📊 Activity Chart")
+    chart_hub = st.selectbox("Hub", ["All", "HUB1", "HUB2", "HUB3", "RETAIL"], key="admin_chart_hub")
+    activity_chart("admin_chart", hub=None if chart_hub == "All" else chart_hub)
+
+def _messages_section(user):
+    unread_count = db.count_unread_messages(db.TO_ADMIN)
+    st.subheader(f"📢 Messages from Hubs {'🔴' if unread_count else ''}")
+    messages = db.get_admin_inbox()
+    if messages:
+        msg_df = pd.DataFrame(messages, columns=db.MESSAGE_COLUMNS)
+        st.dataframe(msg_df[["timestamp", "sender", "hub", "subject", "body", "is_read"]], use_container_width=True)
+        if unread_count and st.button(f"Mark all {unread_count} unread as read"):
+            db.mark_all_read(db.TO_ADMIN)
+            st.rerun()
+
+        st.markdown("### ✏️ Reply to a Hub")
+        msg_labels = {row.id: f"#{row.id} {row.hub} / {row.sender}: {row.subject or row.body[:40]}" for row in msg_df.itertuples()}
+        selected_id = st.selectbox("Select a message to reply to", list(msg_labels), format_func=msg_labels.get)
+        match_row = msg_df[msg_df["id"] == selected_id].iloc[0]
+        thread_id = int(match_row["thread_id"])
+        reply_subject = f"RE: {match_row['subject']}"
+        st.text_input("Subject", value=reply_subject, disabled=True)
+        reply_message = st.text_area("Reply Message")
+        if st.button("Send Reply"):
+            db.send_message(user["username"], match_row["hub"], db.TO_HUB, reply_subject, reply_message,
+                            thread_id=thread_id, recipient=match_row["sender"])
+            db.mark_thread_read(thread_id, db.TO_ADMIN)
+            st.success("📤 Reply sent.")
+    else:
+        st.info("No messages from hubs.")
+
+def _manage_skus_section(user):
+    st.subheader("⚖️ Add or Remove SKUs")
+    hubs = ["HUB1", "HUB2", "HUB3", "RETAIL"]
+    action = st.radio("Action", ["Add", "Remove"], horizontal=True)
+    hub = st.selectbox("Select Hub", hubs)
+
+    sku_rows = db.get_all_sku_info()
+    sku_options = [f"{row[0]} — {row[1]} — {row[2]}" for row in sku_rows]
+    sku_map = {display: row[0] for display, row in zip(sku_options, sku_rows)}
+
+    selected_sku_display = st.selectbox("SKU", sku_options)
+
+    sku = sku_map.get(selected_sku_display)
+    if not sku:
+        st.error("❌ SKU not found. Please make sure your SKU info table is correctly populated.")
+        st.stop()
+
+    qty = st.number_input("Quantity", min_value=1, step=1)
+    if st.button("Apply Change"):
+        if action == "Add":
+            db.record_movement(user["username"], sku, hub, "ADMIN-ADD", qty, "Manual add by admin")
+            st.success(f"Added {qty} units of {sku} to {hub}")
         else:
-            st.info("No messages from hubs.")
-
-    with tabs[4]:
-        st.subheader("⚖️ Add or Remove SKUs")
-        hubs = ["HUB1", "HUB2", "HUB3", "RETAIL"]
-        action = st.radio("Action", ["Add", "Remove"], horizontal=True)
-        hub = st.selectbox("Select Hub", hubs)
-
-        sku_rows = db.get_all_sku_info()
-        sku_options = [f"{row[0]} — {row[1]} — {row[2]}" for row in sku_rows]
-        sku_map = {display: row[0] for display, row in zip(sku_options, sku_rows)}
-
-        selected_sku_display = st.selectbox("SKU", sku_options)
-
-        sku = sku_map.get(selected_sku_display)
-        if not sku:
-            st.error("❌ SKU not found. Please make sure your SKU info table is correctly populated.")
-            st.stop()
-
-        qty = st.number_input("Quantity", min_value=1, step=1)
-        if st.button("Apply Change"):
-            if action == "Add":
-                db.update_inventory(sku, hub, qty, "IN")
-                db.log_action(user["username"], sku, hub, "ADMIN-ADD", qty, "Manual add by admin")
-                st.success(f"Added {qty} units of {sku} to {hub}")
-            else:
-                db.update_inventory(sku, hub, qty, "OUT")
-                db.log_action(user["username"], sku, hub, "ADMIN-REMOVE", qty, "Manual remove by admin")
+            try:
+                db.record_movement(user["username"], sku, hub, "ADMIN-REMOVE", qty, "Manual remove by admin", allow_negative=False)
                 st.success(f"Removed {qty} units of {sku} from {hub}")
+            except db.InsufficientStockError as e:
+                st.error(f"❌ {e}")
 
-    with tabs[5]:
-        st.subheader("🔐 Manage Users")
-        users = db.get_all_users()
-        user_df = pd.DataFrame(users, columns=["Username", "Role", "Hubs"])
-        st.dataframe(user_df, use_container_width=True)
-
-        st.markdown("### ➕ Add New User")
-        new_username = st.text_input("Username")
-        new_password = st.text_input("Password", type="password")
-        new_role = st.selectbox("Role", ["admin", "manager", "supplier", "retail"])
-        new_hubs = st.multiselect("Hubs", ["HUB1", "HUB2", "HUB3", "RETAIL"])
-        if st.button("Create User"):
-            if new_username and new_password and new_role:
-                hashed = hashlib.sha256(new_password.encode()).hexdigest()
-                db.add_user(new_username, hashed, new_role, ",".join(new_hubs))
-                st.success(f"✅ User '{new_username}' created.")
-                st.rerun()
-            else:
-                st.error("All fields are required.")
-
-        st.markdown("### ❌ Remove User")
-        user_to_delete = st.selectbox("Select user to delete", [u[0] for u in users if u[0] != user["username"]])
-        if st.button("Delete User"):
-            db.delete_user(user_to_delete)
-            st.success(f"User '{user_to_delete}' deleted.")
+def _transfers_section(user):
+    st.subheader("🔁 Hub-to-Hub Transfers")
+    transfer_form("admin_transfer", user, [code for code, *_ in db.get_all_warehouses()])
+    st.markdown("### Recent transfers")
+    transfer_history("admin_transfers")
+
+def _user_access_section(user):
+    st.subheader("🔐 Manage Users")
+    users = db.get_all_users()
+    user_df = pd.DataFrame(users, columns=["Username", "Role", "Hubs"])
+    st.dataframe(user_df, use_container_width=True)
+
+    st.markdown("### ➕ Add New User")
+    new_username = st.text_input("Username")
+    new_password = st.text_input("Password", type="password")
+    new_role = st.selectbox("Role", ["admin", "manager", "supplier", "retail"])
+    new_hubs = st.multiselect("Hubs", ["HUB1", "HUB2", "HUB3", "RETAIL"])
+    if st.button("Create User"):
+        if new_username and new_password and new_role:
+            hashed = hashlib.sha256(new_password.encode()).hexdigest()
+            db.add_user(new_username, hashed, new_role, ",".join(new_hubs))
+            st.success(f"✅ User '{new_username}' created.")
             st.rerun()
+        else:
+            st.error("All fields are required.")
 
-        st.markdown("### 🔁 Reset Password")
-        reset_user = st.selectbox("Select user to reset password", [u[0] for u in users])
-        new_pw = st.text_input("New Password", type="password")
-        if st.button("Reset Password"):
-            if reset_user and new_pw:
-                new_hash = hashlib.sha256(new_pw.encode()).hexdigest()
-                db.reset_password(reset_user, new_hash)
-                st.success(f"Password for '{reset_user}' reset.")
-
-    with tabs[6]:
-        st.subheader("🏢 Manage Warehouses")
-        hubs = db.get_all_warehouses()
-        hub_df = pd.DataFrame(hubs, columns=["Code", "Name", "Address", "Contact", "Status", "Region"])
-        st.dataframe(hub_df, use_container_width=True)
-
-        if not hub_df.empty:
-            st.markdown("### ✏️ Edit Hub Info")
-            selected_code = st.selectbox("Select Hub Code", hub_df["Code"])
-            selected_hub_row = hub_df[hub_df["Code"] == selected_code]
-
-            if not selected_hub_row.empty:
-                selected_hub = selected_hub_row.iloc[0]
-
-                new_address = st.text_input("Address", selected_hub["Address"])
-                new_contact = st.text_input("Contact", selected_hub["Contact"])
-                new_status = st.selectbox("Status", ["Open", "Closed"], index=0 if selected_hub["Status"] == "Open" else 1)
-                new_region = st.text_input("Region", selected_hub["Region"])
-
-                if st.button("Save Changes to Hub"):
-                    with db.get_conn() as conn:
-                        conn.execute("""
-                            UPDATE warehouses
-                            SET address=?, contact=?, status=?, region=?
-                            WHERE code=?
-                        """, (new_address, new_contact, new_status, new_region, selected_code))
-                    st.success(f"✅ Hub '{selected_code}' updated.")
-                    st.rerun()
-            else:
-                st.warning("⚠️ Selected hub not found.")
+    st.markdown("### ❌ Remove User")
+    user_to_delete = st.selectbox("Select user to delete", [u[0] for u in users if u[0] != user["username"]])
+    if st.button("Delete User"):
+        db.delete_user(user_to_delete)
+        st.success(f"User '{user_to_delete}' deleted.")
+        st.rerun()
+
+    st.markdown("### 🔁 Reset Password")
+    reset_user = st.selectbox("Select user to reset password", [u[0] for u in users])
+    new_pw = st.text_input("New Password", type="password")
+    if st.button("Reset Password"):
+        if reset_user and new_pw:
+            new_hash = hashlib.sha256(new_pw.encode()).hexdigest()
+            db.reset_password(reset_user, new_hash)
+            st.success(f"Password for '{reset_user}' reset.")
+
+def _manage_hubs_section(user):
+    st.subheader("🏢 Manage Warehouses")
+    hubs = db.get_all_warehouses()
+    hub_df = pd.DataFrame(hubs, columns=["Code", "Name", "Address", "Contact", "Status", "Region"])
+    st.dataframe(hub_df, use_container_width=True)
+
+    if not hub_df.empty:
+        st.markdown("### ✏️ Edit Hub Info")
+        selected_code = st.selectbox("Select Hub Code", hub_df["Code"])
+        selected_hub_row = hub_df[hub_df["Code"] == selected_code]
+
+        if not selected_hub_row.empty:
+            selected_hub = selected_hub_row.iloc[0]
+
+            new_address = st.text_input("Address", selected_hub["Address"])
+            new_contact = st.text_input("Contact", selected_hub["Contact"])
+            new_status = st.selectbox("Status", ["Open", "Closed"], index=0 if selected_hub["Status"] == "Open" else 1)
+            new_region = st.text_input("Region", selected_hub["Region"])
+
+            if st.button("Save Changes to Hub"):
+                db.update_warehouse(selected_code, new_address, new_contact, new_status, new_region)
+                st.success(f"✅ Hub '{selected_code}' updated.")
+                st.rerun()
         else:
-            st.info("No hubs available.")
+            st.warning("⚠️ Selected hub not found.")
+    else:
+        st.info("No hubs available.")
 
-    with tabs[7]:
-        st.subheader("📥 Upload & Seed SKUs from CSV")
-        st.info("Upload a CSV with columns: `SKU`, `Product Name`, and `Barcode Number`.")
-        uploaded_file = st.file_uploader("Upload SKU CSV", type="csv")
+def _upload_skus_section(user):
+    st.subheader("📥 Upload & Seed SKUs from CSV")
+    st.info("Upload a CSV with columns: `SKU`, `Product Name`, and `Barcode` (or `Barcode Number`).")
+    uploaded_file = st.file_uploader("Upload SKU CSV", type="csv")
 
-        if uploaded_file:
-            try:
-                df = pd.read_csv(uploaded_file)
-                st.dataframe(df.head(), use_container_width=True)
-
-                if st.button("Seed SKUs into Database"):
-                    with db.get_conn() as conn:
-                        conn.execute("""
-                            CREATE TABLE IF NOT EXISTS sku_info (
-                                sku TEXT PRIMARY KEY,
-                                name TEXT NOT NULL,
-                                barcode TEXT
-                            )
-                        """)
-                        inserted = 0
-                        for _, row in df.iterrows():
-                            sku = str(row.get("SKU", "")).strip()
-                            name = str(row.get("Product Name", "")).strip()
-                            barcode = str(row.get("Barcode Number", "")).strip()
-
-                            if not sku or not name:
-                                continue
-
-                            conn.execute("INSERT OR IGNORE INTO sku_info (sku, name, barcode) VALUES (?, ?, ?)", (sku, name, barcode))
-                            inserted += 1
-
-                    st.success(f"✅ Seeded {inserted} SKUs into `sku_info` table.")
-            except Exception as e:
-                st.error(f"❌ Failed to process file: {e}")
+    if uploaded_file:
+        try:
+            # The dry run is cached per file so widget reruns don't re-diff the whole catalog.
+            file_key = (uploaded_file.name, uploaded_file.size)
+            cached_preview = st.session_state.get("sku_import_preview")
+            if not cached_preview or cached_preview[0] != file_key:
+                cached_preview = (file_key, db.import_sku_catalog(uploaded_file, dry_run=True))
+                st.session_state["sku_import_preview"] = cached_preview
+            preview = cached_preview[1]
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("New", preview["new"])
+            col2.metric("Changed", preview["changed"])
+            col3.metric("Unchanged", preview["unchanged"])
+            col4.metric("Rejected", preview["rejected"])
+            if preview["samples"]:
+                st.dataframe(pd.DataFrame(preview["samples"], columns=db.SKU_IMPORT_SAMPLE_COLUMNS), use_container_width=True)
+            if preview["barcode_conflicts"]:
+                st.error(f"❌ Barcodes used by more than one SKU: {', '.join(preview['barcode_conflicts'])}")
+
+            can_seed = (preview["new"] or preview["changed"]) and not preview["barcode_conflicts"]
+            if st.button("Seed SKUs into Database", disabled=not can_seed):
+                summary = db.import_sku_catalog(uploaded_file)
+                st.session_state.pop("sku_import_preview", None)
+                st.success(f"✅ Seeded {summary['new']} new and updated {summary['changed']} SKUs in `sku_info`.")
+        except Exception as e:
+            st.error(f"❌ Failed to process file: {e}")
+
+def _performance_section(user):
+    st.subheader("⏱️ Performance")
+    if db.DB_SETTINGS["trace_queries"]:
+        st.caption(f"Query tracing on · slow-query threshold {db.query_tracer.slow_ms} ms · "
+                   f"log: `{db.DB_SETTINGS['slow_query_log'] or 'off'}`")
+    else:
+        st.warning("Query tracing is off (`database.trace_queries` in config.yaml); only render times are shown.")
+    if st.button("Reset performance stats"):
+        db.reset_query_stats()
+        reset_section_timings()
+        st.rerun()
+
+    st.markdown("### Render time per page section")
+    timing_df = pd.DataFrame(section_timings(), columns=["Page", "Section", "Renders", "p50 ms", "p95 ms", "SQL p50 ms"])
+    st.dataframe(timing_df, use_container_width=True)
+
+    st.markdown("### Top queries by total time")
+    query_df = pd.DataFrame(db.top_queries(25), columns=["Caller", "Statement", "Calls", "Rows", "Total ms", "Avg ms", "Max ms"])
+    st.dataframe(query_df, use_container_width=True)
+
+    st.markdown("### Recent slow queries")
+    slow = db.slow_queries()
+    if slow:
+        st.dataframe(pd.DataFrame(slow, columns=["Time", "Caller", "Statement", "ms", "Rows"]), use_container_width=True)
+    else:
+        st.info("No statements over the threshold yet.")
+
+    st.markdown("### Connection pools")
+    st.dataframe(pd.DataFrame(db.pool_stats()), use_container_width=True)
+
+    st.markdown("### Write queue")
+    if db.DB_SETTINGS["write_queue"]:
+        st.dataframe(pd.DataFrame(db.write_queue_stats()), use_container_width=True)
+    else:
+        st.caption("Off (`database.write_queue` in config.yaml); each write commits on its own.")
+
+# Only the selected section runs on a rerun, so each one loads its own data.
+ADMIN_SECTIONS = {
+    "🏦 Inventory": _inventory_section,
+    "📋 Logs": _logs_section,
+    "📊 Chart": _chart_section,
+    "📈 Demand": _demand_section,
+    "📢 Messages": _messages_section,
+    "⚖️ Manage SKUs": _manage_skus_section,
+    "🔁 Transfers": _transfers_section,
+    "🔐 User Access": _user_access_section,
+    "🏢 Manage Hubs": _manage_hubs_section,
+    "📥 Upload SKUs": _upload_skus_section,
+    "⏱️ Performance": _performance_section,
+}
+
+def admin_dashboard(user):
+    require_login()
+    st.title("Admin Dashboard 🌚")
+
+    with st.sidebar.expander("⚙️ Query cache"):
+        stats = db.cache_stats()
+        st.metric("Hit rate", f"{stats['hit_rate']:.0%}")
+        st.caption(f"{stats['hits']} hits · {stats['misses']} misses · {stats['entries']}/{stats['max_entries']} entries")
+        st.caption(f"{stats['evictions']} evicted · {stats['invalidations']} invalidated")
+        if st.button("Clear cache"):
+            db.clear_cache()
+
+    section_router("admin", ADMIN_SECTIONS, user)
 
 __all__ = ["admin_dashboard"]
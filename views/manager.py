@@ -1,23 +1,88 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
 import db
-from utils import require_login
-
-def manager_dashboard(user):
-    require_login()
-    st.title("Hub Manager Dashboard")
-
-    hub = user["hubs"][0] if len(user["hubs"]) == 1 else st.selectbox("Select Hub", user["hubs"])
-
-    tabs = st.tabs(["🔄 IN/OUT", "📜 Log", "📊 Chart", "🛫 Shipments", "⚠️ Low Stock", "✉️ Messages"])
-
-    with tabs[0]:
-        if "last_action" not in st.session_state:
-            st.session_state["last_action"] = None
-        if "selected_sku" not in st.session_state:
-            st.session_state["selected_sku"] = None
-
+from utils import require_login, live_log_feed, log_pager, activity_chart, export_download, section_router, transfer_form, transfer_history
+import export
+
+def _on_scan(hub):
+    """Resolve the scanned barcode into the hub's scan buffer and clear the field for the next scan."""
+    barcode = st.session_state.get(f"scan_input_{hub}", "").strip()
+    st.session_state[f"scan_input_{hub}"] = ""
+    if not barcode:
+        return
+    match = db.get_sku_by_barcode(barcode)
+    if match is None:
+        st.session_state[f"scan_error_{hub}"] = f"Unknown barcode: {barcode}"
+        return
+    sku, name = match
+    buffer = st.session_state.setdefault(f"scan_buffer_{hub}", {})
+    entry = buffer.setdefault(sku, {"name": name, "count": 0})
+    entry["count"] += 1
+    st.session_state.setdefault(f"scan_history_{hub}", []).append(sku)
+    st.session_state[f"scan_error_{hub}"] = None
+
+def _undo_last_scan(hub):
+    history = st.session_state.get(f"scan_history_{hub}", [])
+    if not history:
+        return
+    buffer = st.session_state[f"scan_buffer_{hub}"]
+    sku = history.pop()
+    buffer[sku]["count"] -= 1
+    if buffer[sku]["count"] == 0:
+        del buffer[sku]
+
+def _clear_scans(hub):
+    st.session_state[f"scan_buffer_{hub}"] = {}
+    st.session_state[f"scan_history_{hub}"] = []
+
+def _scan_session(user, hub):
+    """Scan-to-buffer receiving: each scan only updates session state; Commit writes one batch."""
+    action = st.radio("Action", ["IN", "OUT"], horizontal=True, key=f"scan_action_{hub}")
+    st.text_input("Scan barcode", key=f"scan_input_{hub}", on_change=_on_scan, args=(hub,))
+    if st.session_state.get(f"scan_error_{hub}"):
+        st.error(f"❌ {st.session_state[f'scan_error_{hub}']}")
+
+    buffer = st.session_state.get(f"scan_buffer_{hub}", {})
+    if not buffer:
+        st.info("Scan a barcode to start a batch.")
+        return
+
+    buffer_df = pd.DataFrame(
+        [(sku, entry["name"], entry["count"]) for sku, entry in buffer.items()],
+        columns=["SKU", "Name", "Scanned"],
+    )
+    st.dataframe(buffer_df, use_container_width=True)
+    total = int(buffer_df["Scanned"].sum())
+    st.caption(f"{total} units across {len(buffer_df)} SKUs in this batch")
+    comment = st.text_input("Comment (optional)", key=f"scan_comment_{hub}")
+
+    col1, col2, col3 = st.columns(3)
+    if col1.button(f"✅ Commit {action} {total} units", key=f"scan_commit_{hub}"):
+        movements = [
+            (user["username"], sku, hub, action, entry["count"], comment or "Scan session")
+            for sku, entry in buffer.items()
+        ]
+        try:
+            db.record_movements(movements, allow_negative=False)
+            _clear_scans(hub)
+            st.session_state["last_action"] = f"{action} {total} scanned units"
+            st.success(f"✅ {action} {total} units across {len(movements)} SKUs recorded for {hub}")
+        except db.InsufficientStockError as e:
+            st.error(f"❌ {e}. Nothing was recorded.")
+    col2.button("↩️ Undo last scan", key=f"scan_undo_{hub}", on_click=_undo_last_scan, args=(hub,))
+    col3.button("🗑️ Clear batch", key=f"scan_clear_{hub}", on_click=_clear_scans, args=(hub,))
+
+def _in_out_section(user, hub):
+    if "last_action" not in st.session_state:
+        st.session_state["last_action"] = None
+    if "selected_sku" not in st.session_state:
+        st.session_state["selected_sku"] = None
+
+    mode = st.radio("Mode", ["Pick SKU", "Scan barcodes"], horizontal=True, key="inout_mode")
+
+    if mode == "Scan barcodes":
+        _scan_session(user, hub)
+    else:
         sku_data = db.get_skus_for_hub(hub)
         sku_info = db.get_all_sku_info()
         info_dict = {row[0]: (row[1], row[2]) for row in sku_info}
@@ -40,79 +105,122 @@ def manager_dashboard(user):
             comment = st.text_input("Comment (optional)")
 
             if st.button("Submit"):
-                db.update_inventory(selected_sku, hub, qty, action)
-                db.log_action(user["username"], selected_sku, hub, action, qty, comment)
-                st.session_state["last_action"] = f"{action} {qty} of {selected_sku}"
-                st.success(f"✅ {action} {qty} units of {selected_sku} recorded for {hub}")
+                try:
+                    db.record_movement(user["username"], selected_sku, hub, action, qty, comment, allow_negative=False)
+                    st.session_state["last_action"] = f"{action} {qty} of {selected_sku}"
+                    st.success(f"✅ {action} {qty} units of {selected_sku} recorded for {hub}")
+                except db.InsufficientStockError as e:
+                    st.error(f"❌ {e}")
 
             if st.session_state["last_action"]:
                 st.caption(f"Last action: {st.session_state['last_action']}")
         else:
             st.warning("⚠️ No SKUs available for this hub.")
 
-    with tabs[1]:
-        raw_logs = db.get_logs_for_hub(hub)
-        if raw_logs:
-            log_df = pd.DataFrame(raw_logs, columns=["timestamp", "username", "sku", "action", "qty", "comment"])
-            st.dataframe(log_df, use_container_width=True)
-            st.download_button("📅 Download Log CSV", log_df.to_csv(index=False).encode("utf-8"), f"log_{hub}.csv", "text/csv")
-        else:
-            st.info("No logs yet.")
-
-    with tabs[2]:
-        if raw_logs:
-            chart = alt.Chart(pd.DataFrame(raw_logs, columns=["timestamp", "username", "sku", "action", "qty", "comment"])).mark_bar().encode(
-                x="timestamp:T",
-                y="qty:Q",
-                color="action:N",
-                tooltip=["sku", "qty", "action", "timestamp"]
-            ).properties(height=300)
-            st.altair_chart(chart, use_container_width=True)
+def _log_section(user, hub):
+    st.subheader("🔴 Live Activity")
+    live_log_feed(f"manager_feed_{hub}", hub=hub)
+    st.subheader("📜 Log History")
+    col1, col2, col3 = st.columns(3)
+    log_action = col1.selectbox("Action", ["All"] + db.get_log_actions(), key="manager_log_action")
+    log_start = col2.date_input("From", value=None, key="manager_log_start")
+    log_end = col3.date_input("To", value=None, key="manager_log_end")
+    log_filters = {
+        "hub": hub,
+        "action": None if log_action == "All" else log_action,
+        "start_date": log_start,
+        "end_date": log_end,
+    }
+    page_df = log_pager(f"manager_logs_{hub}", **log_filters)
+    if page_df.empty:
+        st.info("No logs yet.")
+    else:
+        export_download(f"manager_log_export_{hub}", "Log", export.export_logs, f"log_{hub}", **log_filters)
+
+def _chart_section(user, hub):
+    activity_chart(f"manager_chart_{hub}", hub=hub)
+
+def _shipments_section(user, hub):
+    shipments = db.get_shipments_for_hub(hub)
+    if shipments:
+        df = pd.DataFrame(shipments, columns=["timestamp", "supplier", "tracking", "carrier", "ship_date", "sku", "qty"])
+        st.dataframe(df, use_container_width=True)
+        export_download(f"manager_shipment_export_{hub}", "Shipments", export.export_shipments, f"shipments_{hub}", hub=hub)
+    else:
+        st.info("No incoming shipments logged.")
+
+def _transfers_section(user, hub):
+    transfer_form(f"manager_transfer_{hub}", user, [hub])
+    st.markdown("### Transfers into or out of this hub")
+    transfer_history(f"manager_transfers_{hub}", hub)
+
+def _low_stock_section(user, hub):
+    db.refresh_velocity()
+    col1, col2 = st.columns(2)
+    cover_days = col1.slider("Alert when days of cover is under", min_value=1, max_value=90, value=14)
+    low_stock_threshold = col2.slider("Or quantity is under", min_value=1, max_value=50, value=10)
+
+    velocity = pd.DataFrame(db.get_velocity(hub), columns=db.VELOCITY_COLUMNS)
+    stock = pd.DataFrame(db.get_skus_for_hub(hub), columns=["sku", "quantity"])
+    df = stock.merge(velocity.drop(columns=["hub", "quantity"]), on="sku", how="outer")
+    df["quantity"] = df["quantity"].fillna(0).astype(int)
+    df["days_of_cover"] = pd.to_numeric(df["days_of_cover"])
+    low = df[(df["days_of_cover"] < cover_days) | (df["quantity"] < low_stock_threshold)]
+    low = low.sort_values(["days_of_cover", "quantity"], na_position="last")
+
+    if low.empty:
+        st.success("✅ No SKUs are below the alert thresholds.")
+        return
+    st.warning(f"⚠️ {len(low)} SKUs under {cover_days} days of cover or {low_stock_threshold} units")
+    st.caption(f"Per day is the {db.COVER_WINDOW_DAYS}-day OUT rate; blank cover means no sales in that window.")
+    low = low.rename(columns={"sku": "SKU", "quantity": "Quantity", "out_7d": "OUT 7d", "out_30d": "OUT 30d",
+                              "out_90d": "OUT 90d", "per_day": "Per day", "days_of_cover": "Days of cover"})
+    st.dataframe(low, use_container_width=True)
+    st.download_button("📉 Download Low Stock CSV", low.to_csv(index=False).encode("utf-8"), f"low_stock_{hub}.csv", "text/csv")
+
+def _messages_section(user, hub):
+    st.subheader("✉️ Send Message to Admin/HQ")
+    subject = st.text_input("Subject")
+    message = st.text_area("Message")
+    if st.button("Send Message"):
+        db.send_message(user["username"], hub, db.TO_ADMIN, subject, message)
+        st.success("📨 Message sent to admin!")
+
+    unread_replies = db.count_unread_messages(db.TO_HUB, hub)
+    with st.expander(f"📬 Admin Replies to Your Hub {'🔴' if unread_replies else ''}"):
+        replies = db.get_hub_inbox(hub)
+        if replies:
+            df = pd.DataFrame(replies, columns=db.MESSAGE_COLUMNS)
+            st.dataframe(df[["timestamp", "sender", "subject", "body", "is_read"]], use_container_width=True)
+
+            st.markdown("### ✏️ Reply to Admin")
+            reply_labels = {row.id: f"#{row.id} {row.subject or row.body[:40]}" for row in df.itertuples()}
+            selected_id = st.selectbox("Select a reply to respond to", list(reply_labels), format_func=reply_labels.get)
+            selected_reply = df[df["id"] == selected_id].iloc[0]
+            reply_msg = st.text_area("Your Response")
+            if st.button("Send Response"):
+                thread_id = int(selected_reply["thread_id"])
+                db.send_message(user["username"], hub, db.TO_ADMIN, f"RE: {selected_reply['subject']}", reply_msg, thread_id=thread_id)
+                db.mark_thread_read(thread_id, db.TO_HUB)
+                st.success("📤 Response sent to admin.")
         else:
-            st.info("No chart data available.")
-
-    with tabs[3]:
-        shipments = db.get_shipments_for_hub(hub)
-        if shipments:
-            df = pd.DataFrame(shipments, columns=["timestamp", "supplier", "tracking", "carrier", "ship_date", "sku", "qty"])
-            st.dataframe(df, use_container_width=True)
-            st.download_button("📦 Download Shipments CSV", df.to_csv(index=False).encode("utf-8"), f"shipments_{hub}.csv", "text/csv")
-        else:
-            st.info("No incoming shipments logged.")
+            st.info("No replies from admin yet.")
+
+MANAGER_SECTIONS = {
+    "🔄 IN/OUT": _in_out_section,
+    "📜 Log": _log_section,
+    "📊 Chart": _chart_section,
+    "🛫 Shipments": _shipments_section,
+    "🔁 Transfers": _transfers_section,
+    "⚠️ Low Stock": _low_stock_section,
+    "✉️ Messages": _messages_section,
+}
 
-    with tabs[4]:
-        low_stock_threshold = st.slider("Alert threshold", min_value=1, max_value=50, value=10)
-        low_stock = [(sku, qty) for sku, qty in sku_data if isinstance(qty, int) and qty < low_stock_threshold]
+def manager_dashboard(user):
+    require_login()
+    st.title("Hub Manager Dashboard")
 
-        if low_stock:
-            df = pd.DataFrame(low_stock, columns=["SKU", "Quantity"])
-            st.warning(f"⚠️ {len(low_stock)} SKUs below threshold ({low_stock_threshold})")
-            st.dataframe(df, use_container_width=True)
-            st.download_button("📉 Download Low Stock CSV", df.to_csv(index=False).encode("utf-8"), f"low_stock_{hub}.csv", "text/csv")
-        else:
-            st.success("✅ No SKUs are below the alert threshold.")
-
-    with tabs[5]:
-        st.subheader("✉️ Send Message to Admin/HQ")
-        subject = st.text_input("Subject")
-        message = st.text_area("Message")
-        if st.button("Send Message"):
-            db.log_action(user["username"], st.session_state.get("selected_sku", "N/A"), hub, "MESSAGE", 0, f"SUBJECT: {subject} // {message}")
-            st.success("📨 Message sent to admin!")
-
-        with st.expander("📬 Admin Replies to Your Hub"):
-            replies = [log for log in db.get_all_logs() if log[4] == "REPLY" and log[3] == hub]
-            if replies:
-                df = pd.DataFrame(replies, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-                st.dataframe(df[["timestamp", "username", "comment"]], use_container_width=True)
-
-                st.markdown("### ✏️ Reply to Admin")
-                selected_reply = st.selectbox("Select a reply to respond to", df["comment"])
-                reply_msg = st.text_area("Your Response")
-                if st.button("Send Response"):
-                    db.log_action(user["username"], "N/A", hub, "MESSAGE", 0, f"RE: {selected_reply} // {reply_msg}")
-                    st.success("📤 Response sent to admin.")
-            else:
-                st.info("No replies from admin yet.")
+    hub = user["hubs"][0] if len(user["hubs"]) == 1 else st.selectbox("Select Hub", user["hubs"])
+    section_router("manager", MANAGER_SECTIONS, user, hub)
 
 __all__ = ["manager_dashboard"]
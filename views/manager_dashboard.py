@@ -32,12 +32,14 @@ def manager_dashboard(user):
         comment = st.text_input("Comment (optional)")
 
         if st.button("Submit"):
-            db.update_inventory(selected_sku, hub, qty, action)
-            db.log_action(user["username"], selected_sku, hub, action, qty, comment)
-            st.session_state["last_action"] = f"{action} {qty} of {selected_sku}"
-            st.success(f"✅ {action} {qty} units of {selected_sku} recorded for {hub}")
-            skus = db.get_skus_for_hub(hub)
-            sku_dict = {sku: qty for sku, qty in skus}
+            try:
+                db.record_movement(user["username"], selected_sku, hub, action, qty, comment, allow_negative=False)
+                st.session_state["last_action"] = f"{action} {qty} of {selected_sku}"
+                st.success(f"✅ {action} {qty} units of {selected_sku} recorded for {hub}")
+                skus = db.get_skus_for_hub(hub)
+                sku_dict = {sku: qty for sku, qty in skus}
+            except db.InsufficientStockError as e:
+                st.error(f"❌ {e}")
 
         if st.session_state["last_action"]:
             st.caption(f"Last action: {st.session_state['last_action']}")
@@ -89,13 +91,13 @@ def manager_dashboard(user):
         subject = st.text_input("Subject")
         message = st.text_area("Message")
         if st.button("Send Message"):
-            db.log_action(user["username"], selected_sku, hub, "MESSAGE", 0, f"SUBJECT: {subject} // {message}")
+            db.send_message(user["username"], hub, db.TO_ADMIN, subject, message)
             st.success("📨 Message sent to admin!")
 
         with st.expander("📬 Admin Replies to Your Hub"):
-            replies = [log for log in db.get_all_logs() if log[4] == "REPLY" and log[3] == hub]
+            replies = db.get_hub_inbox(hub)
             if replies:
-                df = pd.DataFrame(replies, columns=["timestamp", "username", "sku", "hub", "action", "qty", "comment"])
-                st.dataframe(df[["timestamp", "username", "comment"]], use_container_width=True)
+                df = pd.DataFrame(replies, columns=db.MESSAGE_COLUMNS)
+                st.dataframe(df[["timestamp", "sender", "subject", "body"]], use_container_width=True)
             else:
                 st.info("No replies from admin yet.")
@@ -1,7 +1,30 @@
 import streamlit as st
 import pandas as pd
 import db
-from utils import require_login
+import export
+from utils import require_login, export_download, shipment_manifest_upload
+
+def _single_sku_form(user, hub):
+    # Get clean SKU dropdown
+    sku_rows = db.get_all_sku_info()
+    sku_options = [f"{row[1]} ({row[0]}) - {row[2]}" for row in sku_rows]
+    sku_map = {opt: row[0] for opt, row in zip(sku_options, sku_rows)}
+
+    if sku_options:
+        selected_sku_display = st.selectbox("Select SKU", sku_options)
+        selected_sku = sku_map[selected_sku_display]
+    else:
+        st.warning("No SKUs available. Contact admin to upload SKUs.")
+        return
+
+    qty = st.number_input("Quantity", min_value=1, step=1)
+    tracking = st.text_input("Tracking Number")
+    carrier = st.text_input("Carrier")
+    ship_date = st.date_input("Shipment Date", pd.to_datetime("today"))
+
+    if st.button("Submit Shipment"):
+        db.record_shipment(user["username"], tracking, carrier, str(ship_date), hub, selected_sku, qty)
+        st.success(f"✅ Shipment of {qty} units of {selected_sku} recorded for {hub}")
 
 def supplier_dashboard(user):
     require_login()
@@ -15,36 +38,24 @@ def supplier_dashboard(user):
         hubs = ["HUB1", "HUB2", "HUB3"]
         hub = st.selectbox("Destination Hub", hubs)
 
-        # Get clean SKU dropdown
-        sku_rows = db.get_all_sku_info()
-        sku_options = [f"{row[1]} ({row[0]}) - {row[2]}" for row in sku_rows]
-        sku_map = {opt: row[0] for opt, row in zip(sku_options, sku_rows)}
-
-        if sku_options:
-            selected_sku_display = st.selectbox("Select SKU", sku_options)
-            selected_sku = sku_map[selected_sku_display]
+        mode = st.radio("Entry mode", ["Single SKU", "Manifest CSV"], horizontal=True)
+        if mode == "Manifest CSV":
+            tracking = st.text_input("Tracking Number", key="manifest_tracking")
+            carrier = st.text_input("Carrier", key="manifest_carrier")
+            ship_date = st.date_input("Shipment Date", pd.to_datetime("today"), key="manifest_date")
+            shipment_manifest_upload("supplier_manifest", user["username"], hub, tracking, carrier, ship_date, receive=False)
         else:
-            st.warning("No SKUs available. Contact admin to upload SKUs.")
-            return
-
-        qty = st.number_input("Quantity", min_value=1, step=1)
-        tracking = st.text_input("Tracking Number")
-        carrier = st.text_input("Carrier")
-        ship_date = st.date_input("Shipment Date", pd.to_datetime("today"))
-
-        if st.button("Submit Shipment"):
-            db.record_shipment(user["username"], tracking, carrier, str(ship_date), hub, selected_sku, qty)
-            st.success(f"✅ Shipment of {qty} units of {selected_sku} recorded for {hub}")
+            _single_sku_form(user, hub)
 
     with tabs[1]:
         st.subheader("📜 Your Shipment Log")
-        shipments = db.get_all_shipments()
-        supplier_logs = [s for s in shipments if s[1] == user["username"]]
+        supplier_logs = db.get_all_shipments(supplier=user["username"])
 
         if supplier_logs:
             df = pd.DataFrame(supplier_logs, columns=["timestamp", "supplier", "tracking", "carrier", "ship_date", "sku", "qty"])
             st.dataframe(df, use_container_width=True)
-            st.download_button("📥 Download CSV", df.to_csv(index=False).encode("utf-8"), f"shipments_{user['username']}.csv", "text/csv")
+            export_download("supplier_shipment_export", "Shipments", export.export_shipments,
+                            f"shipments_{user['username']}", supplier=user["username"])
         else:
             st.info("No shipments recorded yet.")
 